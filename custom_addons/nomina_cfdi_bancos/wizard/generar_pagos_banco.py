@@ -4,9 +4,58 @@ from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 from datetime import datetime, date
 import base64
+import csv
+import io
+import zipfile
 import logging
 _logger = logging.getLogger(__name__)
 
+# Tablas de traducción precompiladas para normalizar los nombres de los empleados.
+# BBVA: quita '/-.:?&!', acentos y ñ.
+NOMBRE_BBVA = str.maketrans('áéíóúüÁÉÍÓÚÜñÑ', 'aeiouuAEIOUunN', '/-.:?&!')
+# Banamex, HSBC y Scotiabank: quita '-.:?&!' y acentos, ñ se reemplaza por @.
+NOMBRE_BANAMEX = str.maketrans('áéíóúÁÉÍÓÚñÑ', 'aeiouAEIOU@@', '-.:?&!')
+
+# Layout de cada banco de dispersión: métodos del wizard que generan el encabezado
+# (antes del detalle), el registro de detalle por empleado y el sumario (que puede
+# agregar encabezados con los totales), y los campos del wizard que el layout
+# necesita. 'por_banco' indica que el banco no acepta en un mismo archivo empleados
+# del mismo banco y de otros bancos. Para agregar un banco basta con registrar su
+# layout aquí y sus métodos en el wizard.
+LAYOUTS = {
+    'BBA830831LJ2': {'detalle': '_detalle_bbva_mixto', 'sumario': '_sumario_bbva_mixto',
+                     'campos': ['bbva_referencia', 'bbva_no_contrato', 'fecha_dispersion']},
+    'BBA830831LJ2_2': {'detalle': '_detalle_bbva', 'sumario': '_sumario_bbva'},
+    'BMN930209927': {'detalle': '_detalle_banorte', 'sumario': '_sumario_banorte', 'archivo': '_archivo_banorte',
+                     'campos': ['banorte_numero', 'fecha_dispersion']},
+    'BSM970519DU8': {'encabezado': '_encabezado_santander', 'detalle': '_detalle_santander', 'sumario': '_sumario_santander',
+                     'campos': ['fecha_dispersion']},
+    'BSM970519DU8_2': {'encabezado': '_encabezado_santander', 'detalle': '_detalle_santander_mixto', 'sumario': '_sumario_santander',
+                       'campos': ['fecha_dispersion']},
+    'BNM840515VB1': {'encabezado': '_encabezado_banamex_c', 'detalle': '_detalle_banamex_c', 'sumario': '_sumario_banamex_c',
+                     'campos': ['banamex_no_cliente', 'banamex_secuencia', 'banamex_descripcion', 'fecha_dispersion']},
+    'BNM840515VB1_2': {'encabezado': '_encabezado_banamex_d', 'detalle': '_detalle_banamex_d', 'sumario': '_sumario_banamex_d',
+                       'campos': ['banamex_no_cliente', 'banamex_descripcion', 'fecha_dispersion']},
+    'BRM940216EQ6': {'detalle': '_detalle_banregio'},
+    'HMI950125KG8': {'detalle': '_detalle_hsbc', 'sumario': '_sumario_hsbc', 'campos': ['fecha_dispersion']},
+    'SIN9412025I4': {'encabezado': '_encabezado_scotiabank', 'detalle': '_detalle_scotiabank', 'sumario': '_sumario_scotiabank',
+                     'campos': ['scotia_numero', 'scotia_cuenta', 'scotia_referencia', 'fecha_dispersion']},
+    'BII931004P61': {'detalle': '_detalle_inbursa', 'sumario': '_sumario_inbursa', 'extension': 'csv',
+                     'campos': ['inbursa_cuenta', 'fecha_dispersion'], 'por_banco': True},
+    'BBA940707IE1': {'encabezado': '_encabezado_banbajio', 'detalle': '_detalle_banbajio', 'sumario': '_sumario_banbajio',
+                     'campos': ['bajio_afinidad', 'fecha_dispersion']},
+}
+
+# archivos de los layouts por_banco cuando se dispersa a todos los empleados
+ARCHIVOS_POR_BANCO = [('02', 'mismo_banco'), ('03', 'otros_bancos')]
+
+
+def _importe(monto, ancho, sep=''):
+    """ Parte entera rellena con ceros a la izquierda y dos decimales. """
+    entero, decimales = str(round(monto, 2)).split('.')
+    return entero.rjust(ancho, '0') + sep + (decimales.ljust(2, '0') if monto > 0 else '00')
+
+
 class GenerarPagosBanco(models.TransientModel):
     _name='generar.pagos.banco'
     _description = 'GenerarPagosBanco'
@@ -52,670 +101,562 @@ class GenerarPagosBanco(models.TransientModel):
                    ('03', 'Empleados con diferente banco que la cuenta de dispersión'),],
         string=_('Empleados a dispersar'), default='01'
     )
+    todos_bancos = fields.Boolean("Todos los bancos",
+        help="Genera en un ZIP los archivos de todos los bancos de la nómina con el layout principal de cada banco "
+             "(BBVA mixto, Santander solo Santander y Banamex \"C\") y un resumen por banco.")
 
     def action_print_generar_pagos(self):
-        file_text = []
         ctx = self._context.copy()
         active_id = ctx.get('active_id')
         active_model = ctx.get('active_model')
-        str_encabezado = []
-        str_sumario = []
-        num_registro = 1
-        num_empleados = 0
-        monto_total = 0
-        if active_id and active_model=='hr.payslip.run':
-            record = self.env[active_model].browse(active_id)
-              ##################################################################################
-              ###################################################################################
-              #encabezados 
-              ###################################################################################
-              ###################################################################################
-            if self.banco_rfc == 'BSM970519DU8' or self.banco_rfc == 'BSM970519DU8_2': # Santander
-                  enc1 = '1'+ str(num_registro).rjust(5, '0') + 'E'
-                  enc2 = datetime.now().strftime("%m%d%Y")
-                  if self.diario_pago.bank_account_id.acc_number:
-                     enc3 = self.diario_pago.bank_account_id.acc_number.ljust(16)
-                  else:
-                     enc3 = '                '
-                  enc4 = self.fecha_dispersion.strftime("%m%d%Y")
-                  str_encabezado.append((enc1)+(enc2)+(enc3)+(enc4))
-                  num_registro += 1
-            elif self.banco_rfc == 'BNM840515VB1': # Banamex "C"
-                  #primer encabezado
-                  enc11 = '1' #FIJO
-                  if not self.banamex_no_cliente:
-                     raise UserError(_('Falta el número de cliente Banamex.'))
-                  enc12 = self.banamex_no_cliente.rjust(12, '0')
-                  enc13 = self.fecha_dispersion.strftime('%d%m%y')
-                  enc14 = self.banamex_secuencia.rjust(4, '0') #no. consecutivo del 1-99
-                  enc15 = self.diario_pago.company_id.nombre_fiscal[0:36].ljust(36, ' ') # RAZON SOCIAL
-                  enc16 = self.banamex_descripcion.ljust(20, ' ') #DESCRIPCION
-                  enc17 = '05' if self.employee_type == '02' else '07' # Pago de nomina (Pagomatico) a cuentas Banamex
-                  enc18 = '                                        ' # solo para ordenes de pago
-                  enc19 = 'C' # version
-                  enc20 = '00' #fijo
-                  str_encabezado.append((enc11)+(enc12)+(enc13)+(enc14)+(enc15)+(enc16)+(enc17)+(enc18)+(enc19)+(enc20))
-            elif self.banco_rfc == 'BNM840515VB1_2': # Banamex "D"
-                  #primer encabezado
-                  enc11 = '1' #FIJO
-                  if not self.banamex_no_cliente:
-                     raise UserError(_('Falta el número de cliente Banamex.'))
-                  enc12 = self.banamex_no_cliente.rjust(12, '0')
-                  enc13 = self.fecha_dispersion.strftime('%y%m%d')
-                  enc14 = '0001' #no. consecutivo del 1-99
-                  enc15 = self.diario_pago.company_id.nombre_fiscal[0:36].ljust(36, ' ') # RAZON SOCIAL
-                  enc16 = self.banamex_descripcion.ljust(20, ' ') #DESCRIPCION
-                  enc17 = '15' # FIJO
-                  enc18 = 'D' # version de layout
-                  enc19 = '01' #fijo              123456789012345678    12345678901234567890
-                  str_encabezado.append((enc11)+(enc12)+(enc13)+(enc14)+(enc15)+(enc16)+(enc17)+(enc18)+(enc19))
-            elif self.banco_rfc == 'SIN9412025I4': # Scotia bank
-                  #primer encabezado
-                  enc11 = 'EEHA' #FIJO
-                  if not self.scotia_numero:
-                     raise UserError(_('Falta el número de cliente Scotiabank.'))
-                  enc12 = self.scotia_numero.rjust(5, '0')
-                  enc13 = "01000000000000000000000000000"
-                  enc14 = '                                                                                                                                                                                                                                                                                                                                            '
-                  enc16 = 'EEHB'
-                  if not self.scotia_cuenta:
-                     raise UserError(_('Falta el número de cuenta de cargo Scotiabank.'))
-                  enc17 = self.scotia_cuenta.rjust(17, '0')
-                  enc18 = "0000000001000"
-                  enc19 = '                                                                                                                                                                                                                                                                                                                                                '
-                  str_encabezado.append((enc11)+(enc12)+(enc13)+(enc14))
-                  str_encabezado.append((enc16)+(enc17)+(enc18)+(enc19))
-            elif self.banco_rfc == 'BBA940707IE1': # Banbajio
-                  enc1 = '010000001030S900'
-                  if not self.bajio_afinidad:
-                     raise UserError(_('Falta el grupo afinidad.'))
-                  enc2 = self.bajio_afinidad.rjust(7,'0')
-                  enc3 = datetime.now().strftime("%Y%m%d")
-                  if self.diario_pago.bank_account_id.acc_number:
-                     enc4 = self.diario_pago.bank_account_id.acc_number.rjust(20,'0')
-                  else:
-                     enc4 = '                    '
-                  enc5 = '                                                                                                                                  '
-                  num_registro += 1
-                  str_encabezado.append((enc1)+(enc2)+(enc3)+(enc4)+(enc5))
-
-              ##################################################################################
-              ###################################################################################
-              #registos de detalle
-              ###################################################################################
-              ###################################################################################
-            for payslip in record.slip_ids.filtered(lambda x: x.state!='cancel'):
-                    employee = payslip.employee_id
-
-                    if employee.tipo_pago=='transferencia' and employee.diario_pago.bank_id.bic == str(self.banco_rfc).replace('_2',''):
-                        net_total = sum(payslip.line_ids.filtered(lambda x:x.code=='EFECT').mapped('total'))
-                        if net_total == 0:
-                            continue
-                        if self.employee_type == '02' and employee.diario_pago.bank_id.bic != employee.banco.bic:
-                            continue
-                        if self.employee_type == '03' and employee.diario_pago.bank_id.bic == employee.banco.bic:
-                            continue
-                        _logger.info('empleado %s --- banco %s', employee.name, self.banco_rfc)
-                        if self.banco_rfc == 'BBA830831LJ2': # Bancomer Mixto
-                           data1 = '3' # identificador
-                           data2 = self.bbva_referencia[:7]
-                           if not employee.rfc:
-                               raise UserError(_('Falta RFC para el empleado %s.') % (employee.name))
-                           data3 = employee.rfc and employee.rfc.ljust(18,' ')
-                           if employee.tipo_cuenta == 'c_ahorro':
-                               data4 = '40'
-                               if len(employee.no_cuenta) != 18:
-                                  raise UserError(_('En la cuenta del empleado debe colocar la CLABE interbancaria (18 digitos) para el empleado %s') % (employee.name))
-                           elif employee.tipo_cuenta == 'cheques':
-                               data4 = '01'
-                               if len(employee.no_cuenta) != 10:
-                                  raise UserError(_('En la cuenta del empleado debe colocar la cuenta BBVA Bancomer (10 digitos) para el empleado %s') % (employee.name))
-                           else:
-                               raise UserError(_('Los tipos de cuenta permitidos son "Cuenta de Ahorro" o "Cheques" para el empleado %s') % (employee.name))
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
-                           if employee.tipo_cuenta == 'c_ahorro':
-                              data5 = employee.no_cuenta[:3] #posiciones 1, 2 y 3 de la cuenta CLABE
-                              data6 = employee.no_cuenta[3:6] # posiciones 4, 5 y 6 de la cuenta CLABE.
-                              data7 = employee.no_cuenta[6:].rjust(16,'0') #12 posiciones.
-                           elif employee.tipo_cuenta == 'cheques':
-                              data5 = '001' # posiciones 1, 2 y 3 de la cuenta CLABE
-                              data6 = '001' # posiciones 4, 5 y 6 de la cuenta CLABE.
-                              data7 = employee.no_cuenta.rjust(16,'0') #10 posiciones cuenta
-                           data8 =  str(round(net_total,2)).split('.')[0].rjust(13, '0')
-                           if net_total > 0:
-                              data8b =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data8b =  '00'
-                           data9 = '0000000' # fillers
-                           data10 = '                                                                                ' # fillers
-                           nombre_empleado = employee.name.replace('/','').replace('-','').replace('.','').replace(':','').replace('?','').replace('&','').replace('!','')
-                           nombre_empleado = nombre_empleado.replace('á','a').replace('é','e').replace('í','i').replace('ó','o').replace('ú','u').replace('ü','u')
-                           nombre_empleado = nombre_empleado.replace('Á','A').replace('É','E').replace('Í','I').replace('Ó','O').replace('Ú','U').replace('Ü','u')
-                           nombre_empleado = nombre_empleado.replace('ñ','n').replace('Ñ','N')
-                           data11 = nombre_empleado[0:40].ljust(40, ' ') # nombre del empleado
-                           data12 = 'PAGO POR CONCEPTO DE NOMINA'.ljust(40, ' ')
-                           file_text.append(data1 + data2 + data3 + data4 + data5 + data6 + data7 + data8 + data8b + data9 + data10 + data11 + data12 +'\r')
-                        elif self.banco_rfc == 'BBA830831LJ2_2': # Dispersión de Bancomer solo cuentas BBVA
-                           data1 = str(num_registro).zfill(9) # número consecutivo del registro
-                           if not employee.rfc:
-                               raise UserError(_('Falta RFC para el empleado %s.') % (employee.name))
-                           data2 = employee.rfc and employee.rfc.ljust(16)[:16] or '                '  #rfc
-                           if employee.tipo_cuenta == 'c_ahorro':
-                               data3 = '40'
-                               if len(employee.no_cuenta) != 18:
-                                  raise UserError(_('En la cuenta del empleado debe colocar la CLABE interbancaria (18 digitos) para el empleado %s') % (employee.name))
-                           elif employee.tipo_cuenta == 'cheques':
-                               data3 = '99'
-                               if len(employee.no_cuenta) != 10:
-                                  raise UserError(_('En la cuenta del empleado debe colocar la cuenta BBVA Bancomer (10 digitos) para el empleado %s') % (employee.name))
-                           else:
-                               raise UserError(_('Los tipos de cuenta permitidos son "Cuenta de Ahorro" o "Cheques" para el empleado %s') % (employee.name))
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
-                           if employee.tipo_cuenta == 'c_ahorro':
-                              data4 = employee.no_cuenta.ljust(20) #CLABE
-                           elif employee.tipo_cuenta == 'cheques':
-                              data4 = employee.no_cuenta.ljust(20) #NUMERO DE CUENTA 10 DIGITOS BANCOMER
-                           data5 =  str(round(net_total,2)).split('.')[0].rjust(13, '0')
-                           if net_total > 0:
-                              data5b =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data5b =  '00'
-                           nombre_empleado = employee.name.replace('/','').replace('-','').replace('.','').replace(':','').replace('?','').replace('&','').replace('!','')
-                           nombre_empleado = nombre_empleado.replace('á','a').replace('é','e').replace('í','i').replace('ó','o').replace('ú','u').replace('ü','u')
-                           nombre_empleado = nombre_empleado.replace('Á','A').replace('É','E').replace('Í','I').replace('Ó','O').replace('Ú','U').replace('Ü','u')
-                           nombre_empleado = nombre_empleado.replace('ñ','n').replace('Ñ','N')
-                           data6 = nombre_empleado[0:40].ljust(40, ' ') # nombre del empleado
-                           if employee.tipo_cuenta == 'c_ahorro':
-                              data7 = employee.no_cuenta[:3] #posiciones 1, 2 y 3 de la cuenta CLABE
-                              data8 = employee.no_cuenta[3:6] # posiciones 4, 5 y 6 de la cuenta CLABE.
-                           elif employee.tipo_cuenta == 'cheques':
-                              data7 = '001' # posiciones 1, 2 y 3 de la cuenta CLABE
-                              data8 = '001' # posiciones 4, 5 y 6 de la cuenta CLABE.
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data5b)+(data6)+(data7)+(data8)+'\r')
-                           num_registro += 1
-                        elif self.banco_rfc == 'BSM970519DU8': # Dispersión de Santander - solo cuentas santander
-                           data1 = '2'
-                           data2 = str(num_registro).zfill(5)
-                           data3 = str(employee.no_empleado).ljust(7)
-                           data4 = employee.empleado_paterno.ljust(30)[:30]
-                           data5 = employee.empleado_materno.ljust(20)[:20]
-                           data6 = employee.empleado_nombre.ljust(30)[:30]
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
-                           data7 = employee.no_cuenta.ljust(16)[:16]
-                           data8 = str(round(net_total,2)).split('.')[0].rjust(16, '0')
-                           if net_total > 0:
-                              data8b =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data8b =  '00'
-                           #for var in data8b:
-                           #   _logger.info('total %s', var)
-                           data9 = self.dato1 or '' #'01'
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data6)+(data7)+(data8)+(data8b)+(data9))
-                           num_registro += 1
-                        elif self.banco_rfc == 'BSM970519DU8_2': # Dispersión de Santander - distintos bancos
-                           data1 = '2'
-                           data2 = str(num_registro).zfill(5)
-                           data3 = employee.name[0:50].ljust(50, ' ')
-                           if employee.tipo_cuenta == 't_debido':
-                              data4 = '   02'
-                           elif employee.tipo_cuenta == 'cheques':
-                              data4 = '   01'
-                           elif employee.tipo_cuenta == 'c_ahorro':
-                              data4 = '   40'
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
-                           data5 = employee.no_cuenta.ljust(20, ' ')
-                           data6 = str(round(net_total,2)).replace('.','').rjust(18, '0')
-                           data7 = employee.clave_santander_banco and employee.clave_santander_banco.rjust(5, '0') or '00000'
-                           data8 = employee.plaza_santander_banco and employee.plaza_santander_banco.rjust(5, '0') or '00000'
-                          # data9 = self.dato1
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data6)+(data7)+(data8))
-                           num_registro += 1
-                        elif self.banco_rfc == 'BNM840515VB1': # Banamex "C"
-                           #3 0 001 01 001 000000000000242964 03 00005256781834028297 TRANSFER11      SALBADOR,SANTIAGO/     000000
-                           data1 = '3'
-                           data2 = '0'
-                           data3 = '001'
-                           data6 =  str(round(net_total,2)).split('.')[0].rjust(16, '0')
-                           if net_total > 0:
-                              data6a =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data6a =  '00'
-                           data7 = '01' # tipo de cuenta de abono 
-                                        # 01: Cheques / CLABE
-                                        # 03=Plásticos
-                                        # 04=Orden de pago
-                                        # 15=Cuenta concentradora
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
-                           data8 = employee.no_cuenta.rjust(20, '0')
-                           if self.employee_type == '02':
-                              data9 = (str(num_registro)).rjust(10, '0')
-                              data9a = '                              '
-                           else:
-                              data9 = '000000000000000000000000000000'
-                              data9a = (str(num_registro)).rjust(10, '0')
-                           if not employee.empleado_nombre or not employee.empleado_paterno:
-                               raise UserError(_('Falta nombre y/o apellido paterno para el empleado %s.') % (employee.name))
-                           if employee.empleado_materno:
-                              nombre_empleado = employee.empleado_nombre + ',' + employee.empleado_paterno + '/' + employee.empleado_materno
-                           else:
-                              nombre_empleado = employee.empleado_nombre + ',' + employee.empleado_paterno + '/'
-                           nombre_empleado = nombre_empleado.replace('-','').replace('.','').replace(':','').replace('?','').replace('&','').replace('!','')
-                           nombre_empleado = nombre_empleado.replace('á','a').replace('é','e').replace('í','i').replace('ó','o').replace('ú','u')
-                           nombre_empleado = nombre_empleado.replace('Á','A').replace('É','E').replace('Í','I').replace('Ó','O').replace('Ú','U')
-                           nombre_empleado = nombre_empleado.replace('ñ','@').replace('Ñ','@')
-                           data10 = nombre_empleado[0:55].ljust(55, ' ')
-                           data11 = 'TRANSFERENCIA                           '
-                           data12 = '                        '
-                           data15 = '    ' if self.employee_type == '02' else '0' + employee.no_cuenta[0:3] # clave del banco, depende de opciones  # 0012
-                           data16 = '       ' if self.employee_type == '02' else str(num_registro).rjust(7, '0') # Referencia bajo valor
-                           data17 = '  '
-                           file_text.append((data1)+(data2)+(data3)+(data6)+(data6a)+(data7)+(data8)+(data9)+(data9a)+(data10)+(data11)+(data12)+(data15)+(data16)+(data17))
-                           num_registro += 1
-                        elif self.banco_rfc == 'BNM840515VB1_2': # Banamex "D"
-                           #3 0 001 01 001 000000000000242964 03 00005256781834028297 TRANSFER11      SALBADOR,SANTIAGO/     000000
-                           data1 = '3'
-                           data2 = '0'
-                           data3 = '001' # metodo pago  001: Cuentas Banamex 
-                                                       #002: Interbancario 
-                                                       #003: Orden de Pago.
-                           data4 = '01'  #tipo de pago 01 nominna -- hay varios
-                           data5 = '001'
-                           data6 =  str(round(net_total,2)).split('.')[0].rjust(16, '0')
-                           if net_total > 0:
-                              data6a =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data6a =  '00'
-                           data7 = '03' # tipo de cuenta de abono 
-                                        #01: Cheques, sólo válido para Pago Banamex.
-                                        #03: Plásticos, válido para Pago Interbancario y Banamex.
-                                        #04: Orden de Pago.
-                                        #40: CLABE.
-                           data8 = '0000'
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
-                           data8a = employee.no_cuenta.ljust(16)
-                           data9 = ('TRANSFER'+ str(num_registro)).ljust(16, ' ')
-                           if not employee.empleado_nombre or not employee.empleado_paterno:
-                               raise UserError(_('Falta nombre y/o apellido paterno para el empleado %s.') % (employee.name))
-                           if employee.empleado_materno:
-                              nombre_empleado = employee.empleado_nombre + ',' + employee.empleado_paterno + '/' + employee.empleado_materno
-                           else:
-                              nombre_empleado = employee.empleado_nombre + ',' + employee.empleado_paterno + '/'
-                           nombre_empleado = nombre_empleado.replace('-','').replace('.','').replace(':','').replace('?','').replace('&','').replace('!','')
-                           nombre_empleado = nombre_empleado.replace('á','a').replace('é','e').replace('í','i').replace('ó','o').replace('ú','u')
-                           nombre_empleado = nombre_empleado.replace('Á','A').replace('É','E').replace('Í','I').replace('Ó','O').replace('Ú','U')
-                           nombre_empleado = nombre_empleado.replace('ñ','@').replace('Ñ','@')
-                           data10 = nombre_empleado[0:55].ljust(55, ' ')
-                           data11 = '                                   '
-                           data12 = '                                   '
-                           data13 = '                                   '
-                           data14 = '                                   '
-                           data15 = '0000' # clave del banco, depende de opciones
-                           data16 = '00'
-                           data17 = '                                                                            '
-                           data18 = '                                                                            '
-                           #data19 = '                                                                           '
-                           #data20 = '                                                  '
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data6)+(data6a)+(data7)+(data8)+(data8a)+(data9)+(data10)+(data11)+(data12)+(data13)+(data14)+(data15)+(data16)+(data17)+(data18))
-                           num_registro += 1
-                        elif self.banco_rfc == 'BMN930209927': # Banorte
-                           data1 = 'D'
-                           data2 = self.fecha_dispersion.strftime('%Y%m%d')
-                           if not employee.no_empleado:
-                               raise UserError(_('Falta número de empleado %s.') % (employee.name))
-                           data3 = str(employee.no_empleado).rjust(10,'0') #numero de empleado
-                           data4 = '                                        ' #espacios en blanco
-                           data5 = '                                        ' #espacios en blanco
-                           data6 =  str(round(net_total,2)).split('.')[0].rjust(13, '0')
-                           if net_total > 0:
-                              data6a =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data6a =  '00'
-                           if not employee.banco.c_banco:
-                               raise UserError(_('El banco seleccionado no tiene clave configurada %s.') % (employee.name))
-                           data7 = employee.banco.c_banco # numero del banco receptor
-                           if employee.tipo_cuenta == 't_debito' or employee.tipo_cuenta == 't_credito':
-                               data8 = '03'
-                           elif employee.tipo_cuenta == 'cheques':
-                               data8 = '01'
-                           else:
-                               data8 = '40'
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
-                           data8a = employee.no_cuenta.rjust(18, '0')
-                           data9 = '0'
-                           data10 = ' '
-                           data11 = '00000000'
-                           data12 = '                  '
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data6)+(data6a)+(data7)+(data8)+(data8a)+(data9)+(data10)+(data11)+(data12))
-                           num_registro += 1
-                        elif self.banco_rfc == 'BRM940216EQ6': # Banregio
-                           data1 = str(num_empleados + 1).rjust(5, '0') + ',' #secuencia
-                           data2 = 'S' + ','
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
-                           data3 = employee.no_cuenta.rjust(20, '0') + ','
-                           data4 =  str(round(net_total,2)).split('.')[0].rjust(13, '0') + ','
-                           if net_total > 0:
-                              data5 =  str(round(net_total,2)).split('.')[1].ljust(2, '0') + ','
-                           else:
-                              data5 =  '00' + ','
-                           data6 = '0000000000000,00' + ',' #espacios en blanco
-                           data7 = 'TRANSFERENCIA SPEI                      ' + ',' #espacios en blanco
-                           data8 = '               '
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data6)+(data7)+(data8))
-                           num_registro += 1
-                        elif self.banco_rfc == 'HMI950125KG8': # HSBC
-
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
-                           data1 = employee.no_cuenta.rjust(10, '0') + ','
-                           data2 =  str(round(net_total,2)).split('.')[0].rjust(12, '0')
-                           if net_total > 0:
-                              data3 =  str(round(net_total,2)).split('.')[1].ljust(2, '0') + ','
-                           else:
-                              data3 =  '00' + ','
-
-                           data4 = 'ABONO POR PAGO DE NOMINA          ' + ','
-
-                           if not employee.empleado_nombre or not employee.empleado_paterno:
-                               raise UserError(_('Falta nombre y/o apellido paterno para el empleado %s.') % (employee.name))
-                           if employee.empleado_materno:
-                              nombre_empleado = employee.empleado_nombre + ' ' + employee.empleado_paterno + ' ' + employee.empleado_materno
-                           else:
-                              nombre_empleado = employee.empleado_nombre + ' ' + employee.empleado_paterno
-                           nombre_empleado = nombre_empleado.replace('-','').replace('.','').replace(':','').replace('?','').replace('&','').replace('!','')
-                           nombre_empleado = nombre_empleado.replace('á','a').replace('é','e').replace('í','i').replace('ó','o').replace('ú','u')
-                           nombre_empleado = nombre_empleado.replace('Á','A').replace('É','E').replace('Í','I').replace('Ó','O').replace('Ú','U')
-                           nombre_empleado = nombre_empleado.replace('ñ','@').replace('Ñ','@')
-                           data5 = nombre_empleado[0:35].ljust(35, ' ')
-
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5))
-                           num_registro += 1
-                        elif self.banco_rfc == 'SIN9412025I4': # Scotiabank
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
-                           data1 = 'EEDA'
-                           data2 = '04' #01 - Efectivo en ventanilla,  02 - Cheque de caja en ventanilla, 03 - Cheque de caja central y 04 - Abono en cuenta.
-                           data3 =  str(round(net_total,2)).split('.')[0].rjust(15, '0')
-                           if net_total > 0:
-                              data4 =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data4 =  '00'
-
-                           data5 = self.fecha_dispersion.strftime('%Y%m%d')
-                           data6 = '01'
-                           data7 = str(employee.no_empleado).ljust(2)
-
-                           if not employee.empleado_nombre or not employee.empleado_paterno:
-                               raise UserError(_('Falta nombre y/o apellido paterno para el empleado %s.') % (employee.name))
-                           if employee.empleado_materno:
-                              nombre_empleado = employee.empleado_nombre + ' ' + employee.empleado_paterno + ' ' + employee.empleado_materno
-                           else:
-                              nombre_empleado = employee.empleado_nombre + ' ' + employee.empleado_paterno
-                           nombre_empleado = nombre_empleado.replace('-','').replace('.','').replace(':','').replace('?','').replace('&','').replace('!','')
-                           nombre_empleado = nombre_empleado.replace('á','a').replace('é','e').replace('í','i').replace('ó','o').replace('ú','u')
-                           nombre_empleado = nombre_empleado.replace('Á','A').replace('É','E').replace('Í','I').replace('Ó','O').replace('Ú','U')
-                           nombre_empleado = nombre_empleado.replace('ñ','@').replace('Ñ','@')
-                           data8 = nombre_empleado[0:35].rjust(59, ' ')
-
-                           data9 = '            '
-                           data10 = self.scotia_referencia.rjust(16, '0')
-                           data11 = employee.no_cuenta.rjust(30, '0')
-                           data12 = '00000'
-                           data13 = '                                        '
-                           data14 = '1 '
-                           data15 = '00000044044001' 
-                           data16 = '01'
-                           data17 = payslip.payslip_run_id.name.ljust(142, ' ')
-                           data18 = '0000000000000000000000000'
-                           data19 = '                      '
-
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5) + data6 + data7 + data8 + data9 + data10 + data11 + data12 + data13 + data14 + data15 + data16 + data17 + data18 + data19)
-                        elif self.banco_rfc == 'BII931004P61': # Inbursa
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
-                           if self.employee_type == '01':
-                               raise UserError(_('No se puede dispersar a todos los empledos, cambiar la opción en "Empleados a dispersar".'))
-                           if self.employee_type == '02':
-                              data1 = self.fecha_dispersion.strftime('%Y%m%d') + ','
-                              data2 = self.inbursa_cuenta + ','
-                              data3 = str(employee.no_cuenta) + ','
-                              data4 = str(round(net_total,2)) + ','
-                              data5 = payslip.number
-                              file_text.append((data1)+(data2)+(data3)+(data4)+(data5))
-                           if self.employee_type == '03':
-                              data1 = self.fecha_dispersion.strftime('%Y%m%d') + ','
-                              data2 = self.inbursa_cuenta + ','
-                              data3 = employee.no_cuenta + ','
-                              data4 = str(round(net_total,2)) + ',' + ','
-                              data5 = payslip.number + ',' + ',' + ','
-                              data6 = '2'
-                              file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data6))
-                           num_registro += 1
-                        elif self.banco_rfc == 'BBA940707IE1': # Banbajio
-                           if not employee.no_cuenta:
-                               raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
-                           data1 = '02'
-                           data2 = (str(num_registro)).rjust(7, '0') 
-                           data3 = '90'
-                           data4 = self.fecha_dispersion.strftime('%Y%m%d')
-                           data5 = '000030'
-                           data6 =  str(round(net_total,2)).split('.')[0].rjust(13, '0')
-                           if net_total > 0:
-                              data7 =  str(round(net_total,2)).split('.')[1].ljust(2, '0')
-                           else:
-                              data7 =  '00'
-                           data8 = self.fecha_dispersion.strftime('%Y%m%d')
-                           data9 = '00'
-                           data10 = self.diario_pago.bank_account_id.acc_number.rjust(20,'0') + ' '
-                           data11 = employee.no_cuenta.rjust(22, '0') + ' '
-                           data12 = (str(num_registro)).rjust(7, '0')
-                           data13 = 'DEPOSITO DE NOMINA                      '
-                           data14 = '0000000000000000000000000000000000000000'
-                           file_text.append((data1)+(data2)+(data3)+(data4)+(data5)+(data6)+(data7)+(data8)+(data9)+(data10)+(data11)+(data12)+(data13)+(data14))
-                           num_registro += 1
-
-                        num_empleados += 1
-                        monto_total += round(net_total,2)
-
-              ##################################################################################
-              ###################################################################################
-              #sumario
-              ###################################################################################
-              ###################################################################################
-            if self.banco_rfc == 'BBA830831LJ2': # Bancomer Mixto
-                  enc1 = '1' 
-                  enc2 = str(num_empleados).rjust(7, '0')
-                  enc3 = str(round(monto_total,2)).split('.')[0].rjust(13, '0')
-                  if monto_total > 0:
-                      enc3a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                      enc3a =  '00'
-                  enc4 = '0000000'
-                  enc5 = '000000000000000'
-                  enc6 = '000000000000'
-                  enc7 = self.bbva_no_contrato[:10]
-                  enc8 = 'R05'
-                  enc9 = '101'
-                  enc10 = '1'
-                  enc11 = datetime.now().strftime("%Y%m%d")
-                  enc12 = self.fecha_dispersion.strftime('%Y%m%d')
-                  enc13 = '                                                                                                                                              '
-                  str_encabezado.append(enc1 + enc2 + enc3 + enc3a + enc4 + enc5 + enc6 + enc7 + enc8 + enc9+ enc10+ enc11+ enc12+ enc13 + '\r')
-                  str_sumario.append('')
-            elif self.banco_rfc == 'BBA830831LJ2_2': # Bancomer solo cuentas BBVA
-                  str_sumario.append('')
-            elif self.banco_rfc == 'BSM970519DU8' or self.banco_rfc == 'BSM970519DU8_2': # Santander
-                   sum1 = '3'
-                   sum2 = str(num_registro).rjust(5, '0')
-                   sum3 = str(num_empleados).rjust(5, '0')
-                   #sum4 = str(round(monto_total,2)).replace('.','').rjust(18, '0')
-                   sum4 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                   if monto_total > 0:
-                      sum5 =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                   else:
-                      sum5 =  '00'
-                   str_sumario.append((sum1)+(sum2)+(sum3)+(sum4)+(sum5))
-            elif self.banco_rfc == 'BNM840515VB1': # Banamex "C"
-                  ### segundo encabezado  2 1 001 000000000037870848 01 00000000070020012747 000258
-                  enc21 = '2' #FIJO
-                  enc22 = '1' #FIJO
-                  enc23 = '001' #Moneda nacional
-                  enc24 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                  if monto_total > 0:
-                     enc24a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     enc24a =  '00'
-                  enc25 = '01' #fijo cuenta de cheques
-                  if self.diario_pago.bank_account_id.acc_number:
-                     enc26 = self.diario_pago.bank_account_id.acc_number[0:4] + self.diario_pago.bank_account_id.acc_number[4:].rjust(20, '0')
-                  else:
-                     enc26 = '                  '
-                  enc27 = '                    '
-                  str_encabezado.append((enc21)+(enc22)+(enc23)+(enc24)+(enc24a)+(enc25)+(enc26)+(enc27))
-                  #sumario
-                  #4 001 000258 000000000037870848 000001 000000000037870848
-                  sum1 = '4' #FIJO
-                  sum2 = '001' #Moneda nacional
-                  sum3 = str(num_empleados).rjust(6, '0')
-                  sum4 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                  if monto_total > 0:
-                     sum4a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     sum4a =  '00'
-                  sum5 = '000001'
-                  sum6 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                  if monto_total > 0:
-                     sum6a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     sum6a =  '00'
-                  str_sumario.append((sum1)+(sum2)+(sum3)+(sum4)+(sum4a)+(sum5)+(sum6)+(sum6a))
-            elif self.banco_rfc == 'BNM840515VB1_2': # Banamex "D"
-                  ### segundo encabezado  2 1 001 000000000037870848 01 00000000070020012747 000258
-                  enc21 = '2' #FIJO
-                  enc22 = '1' #FIJO
-                  enc23 = '001' #Moneda nacional
-                  enc24 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                  if monto_total > 0:
-                     enc24a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     enc24a =  '00'
-                  enc25 = '01' #fijo cuenta de cheques
-                  if self.diario_pago.bank_account_id.acc_number:
-                     enc26 = self.diario_pago.bank_account_id.acc_number.rjust(20, '0')
-                  else:
-                     enc26 = '                  '
-                  enc27 = str(num_empleados).rjust(6, '0')
-                  str_encabezado.append((enc21)+(enc22)+(enc23)+(enc24)+(enc24a)+(enc25)+(enc26)+(enc27))
-                  #sumario
-                  #4 001 000258 000000000037870848 000001 000000000037870848
-                  sum1 = '4' #FIJO
-                  sum2 = '001' #Moneda nacional
-                  sum3 = str(num_empleados).rjust(6, '0')
-                  sum4 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                  if monto_total > 0:
-                     sum4a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     sum4a =  '00'
-                  sum5 = '000001'
-                  sum6 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                  if monto_total > 0:
-                     sum6a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     sum6a =  '00'
-                  str_sumario.append((sum1)+(sum2)+(sum3)+(sum4)+(sum4a)+(sum5)+(sum6)+(sum6a))
-            elif self.banco_rfc == 'BMN930209927': # Banorte
-                  #primer encabezado
-                  enc11 = 'H' #FIJO
-                  enc12 = 'NE' #Nomina Banorte
-                  enc13 = self.banorte_numero #numero de emisor asignado
-                  enc14 = self.fecha_dispersion.strftime('%Y%m%d')
-                  enc15 = '01' #no. consecutivo del 1-99
-                  enc16 = str(num_empleados).rjust(6, '0') # numero de empleados
-                  enc17 = str(round(monto_total,2)).split('.')[0].rjust(13, '0')
-                  if monto_total > 0:
-                     sum17a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     sum17a =  '00'
-                  enc18 = '000000' # numero de altas
-                  enc19 = '000000000000000' #impote total altas
-                  enc20 = '000000' # numero de bajas
-                  enc21 = '000000000000000' #impote total bajas
-                  enc22 = '000000' # cuentas a veririfcar
-                  enc23 = '0' #accion
-                  enc24 = '00000000000000000000000000000000000000000000000000000000000000000000000000000' #filler 
-                  str_encabezado.append(enc11+enc12+enc13+enc14+enc15+enc16+enc17+sum17a +enc18 + enc19+ enc20+ enc21+ enc22+ enc23+ enc24)
-            elif self.banco_rfc == 'HMI950125KG8': # HSBC
-                  #primer encabezado
-                  enc11 = 'MXPRLF,' #FIJO
-                  enc12 = 'F,' #fijo
-                  if self.diario_pago.bank_account_id.acc_number:
-                     enc13 = self.diario_pago.bank_account_id.acc_number.rjust(10, '0') + ','
-
-                  enc14 = str(round(monto_total,2)).split('.')[0].rjust(12, '0')
-                  if monto_total > 0:
-                     enc15 =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')  + ','
-                  else:
-                     enc15 =  '00' + ','
-
-                  enc16 = str(num_empleados).rjust(7, '0') + ','
-                  enc17 = self.fecha_dispersion.strftime('%d%m%Y') + ','
-
-                  enc18 = ',' # horario de programacion
-                  enc19 = record.name
-
-                  str_encabezado.append(enc11+enc12+enc13+enc14+enc15+enc16+enc17+enc18 + enc19)
-            elif self.banco_rfc == 'SIN9412025I4': # Scotiabank
-                  sum1 = 'EETB' #FIJO
-                  sum2 = 'EETA' #Moneda nacional
-                  sum3 = '0000006'
-                  sum4 = str(round(monto_total,2)).split('.')[0].rjust(15, '0')
-                  if monto_total > 0:
-                     sum5a =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     sum5a =  '00'
-                  sum6 = '000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000'
-                  sum7 = '                                                                                                                           '
-
-                  str_sumario.append((sum1)+(sum3)+(sum4)+(sum5a)+(sum6)+(sum7))
-            elif self.banco_rfc == 'BII931004P61': # Inbursa
-                  enc21 = str(num_empleados) + ','
-                  enc22 = str(round(monto_total,2))
-                  str_encabezado.append((enc21)+(enc22))
-            elif self.banco_rfc == 'BBA940707IE1': # Banbajio
-                  sum1 = '09' #FIJO
-                  sum2 = str(num_registro).rjust(7, '0')
-                  sum3 = '90' #FIJO
-                  sum4 = str(num_empleados).rjust(7, '0')
-                  sum5 = str(round(monto_total,2)).split('.')[0].rjust(16, '0')
-                  if monto_total > 0:
-                     sum6 =  str(round(monto_total,2)).split('.')[1].ljust(2, '0')
-                  else:
-                     sum6 =  '00'
-                  sum7 = '                                                                                                                                                 '
-                  str_sumario.append((sum1)+(sum2)+(sum3)+(sum4)+(sum5)+(sum6)+(sum7))
-#            else:
-#               raise Warning("Banco no compatible con la dispersión.")
-        if not file_text:
+        if not active_id or active_model != 'hr.payslip.run':
             raise UserError(_('No hay información para generar el archivo de dispersión'))
-        file_text = str_encabezado + file_text + str_sumario
-        file_text = '\n'.join(file_text)
-        file_text = file_text.encode()
-        if self.banco_rfc == 'BMN930209927':
-            filename = 'NI' + self.banorte_numero + '01.pag'
-        elif self.banco_rfc == 'BII931004P61':
-            filename = datetime.now().strftime("%y%m-%d%H%M%S")+'.csv'
-        else:
-            filename = datetime.now().strftime("%y%m-%d%H%M%S")+'.txt'
-        self.write({'file_content':base64.b64encode(file_text)})
+        record = self.env[active_model].browse(active_id)
+        if self.todos_bancos:
+            return self._action_dispersion_todos_bancos(record)
+        layout = LAYOUTS.get(self.banco_rfc)
+        if not layout:
+            raise UserError(_('No hay información para generar el archivo de dispersión'))
+        self._check_campos(layout)
+        contenido, estado = self._generar_archivo(record, layout, self._get_nominas_banco(record))
+        if not contenido:
+            raise UserError(_('No hay información para generar el archivo de dispersión'))
+        filename = self._get_nombre_archivo(layout)
+        self.write({'file_content':base64.b64encode(contenido.encode())})
         return {
                 'type' : 'ir.actions.act_url',
                 'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_content&download=true&filename="+filename+'&mimetype=text/plain',
                 'target':'self',
                 }
+
+    def _action_dispersion_todos_bancos(self, record):
+        """ Genera en una sola pasada los archivos de todos los diarios de pago con layout y
+            los regresa en un ZIP junto con un resumen de empleados e importe por diario.
+            Cada diario se valida por separado: el que no tiene layout o le faltan datos se
+            omite con el motivo en el resumen sin detener a los demás. Los empleados sin
+            banco en su diario de pago se listan en sin_banco.csv. """
+        nominas_por_diario = self._get_nominas_por_diario(record)
+        sin_banco = self.env['hr.payslip'].browse(nominas_por_diario.pop(False, []))
+        efectivo = self._get_efectivo_por_nomina(self.env['hr.payslip'].browse(
+            [slip_id for slip_ids in nominas_por_diario.values() for slip_id in slip_ids]))
+        layouts = dict(self._fields['banco_rfc'].selection)
+        resumen = []
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, 'w') as zfile:
+            for diario_id, slip_ids in nominas_por_diario.items():
+                payslips = self.env['hr.payslip'].browse(slip_ids)
+                diario = self.env['account.journal'].browse(diario_id)
+                bic = diario.bank_id.bic
+                layout = LAYOUTS.get(bic)
+                if not layout:
+                    resumen.append([diario.bank_id.name, diario.name, '', '', len(payslips), '', _('Sin layout')])
+                    continue
+                tipos = [(self.employee_type, '')]
+                if layout.get('por_banco') and self.employee_type == '01':
+                    tipos = ARCHIVOS_POR_BANCO
+                for employee_type, prefijo in tipos:
+                    try:
+                        self._check_campos(layout)
+                        contenido, estado = self._generar_archivo(record, layout, payslips, efectivo=efectivo,
+                                                                  diario=diario, employee_type=employee_type)
+                    except UserError as e:
+                        resumen.append([diario.bank_id.name, diario.name, layouts[bic], '', len(payslips), '',
+                                        _('Omitido: %s') % e.args[0]])
+                        break
+                    if not contenido:
+                        continue
+                    filename = '%s/%s/%s' % (diario.bank_id.name, diario.name,
+                                             (prefijo and prefijo + '_') + self._get_nombre_archivo(layout))
+                    zfile.writestr(filename, contenido.encode(), compress_type=zipfile.ZIP_DEFLATED)
+                    resumen.append([diario.bank_id.name, diario.name, layouts[bic], filename,
+                                    estado['num_empleados'], round(estado['monto_total'], 2), ''])
+            if not resumen and not sin_banco:
+                raise UserError(_('No hay información para generar el archivo de dispersión'))
+            zfile.writestr('resumen.csv', self._get_csv(
+                ['Banco', 'Diario', 'Layout', 'Archivo', 'Empleados', 'Importe', 'Observaciones'], resumen))
+            if sin_banco:
+                zfile.writestr('sin_banco.csv', self._get_csv(['Empleado', 'Diario de pago'], [
+                    [payslip.employee_id.name, payslip.employee_id.diario_pago.name or ''] for payslip in sin_banco]))
+        filename = 'dispersion_%s.zip' % datetime.now().strftime("%y%m-%d%H%M%S")
+        self.write({'file_content': base64.b64encode(stream.getvalue())})
+        return {
+                'type' : 'ir.actions.act_url',
+                'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_content&download=true&filename="+filename+'&mimetype=application/zip',
+                'target':'self',
+                }
+
+    def _get_csv(self, encabezado, rows):
+        """ Contenido CSV con el módulo csv (nombres con comas o comillas). """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(encabezado)
+        writer.writerows(rows)
+        return buffer.getvalue().encode()
+
+    def _check_campos(self, layout):
+        """ Valida que el wizard tenga los datos que necesita el layout. """
+        faltantes = [self._fields[fname].string for fname in layout.get('campos', []) if not self[fname]]
+        if faltantes:
+            raise UserError(_('Faltan datos para el layout: %s.') % ', '.join(faltantes))
+
+    def _get_nominas_banco(self, record):
+        """ Nóminas de la lista a pagar por transferencia desde el banco seleccionado. """
+        bic = str(self.banco_rfc).replace('_2', '')
+        nominas = self._get_nominas_por_diario(record)
+        nominas.pop(False, None)
+        diarios = self.env['account.journal'].browse(list(nominas)).filtered(lambda x: x.bank_id.bic == bic)
+        return self.env['hr.payslip'].browse([slip_id for diario in diarios for slip_id in nominas[diario.id]])
+
+    def _get_nominas_por_diario(self, record):
+        """ Agrupa en una sola pasada las nóminas a pagar por transferencia según el
+            diario de pago del empleado: {diario_id: [ids de nómina]}. Las nóminas de
+            empleados sin diario de pago o con diario sin banco quedan en la llave False. """
+        nominas = {}
+        for payslip in record.slip_ids:
+            employee = payslip.employee_id
+            if payslip.state == 'cancel' or employee.tipo_pago != 'transferencia':
+                continue
+            diario = employee.diario_pago
+            nominas.setdefault(diario.bank_id and diario.id, []).append(payslip.id)
+        return nominas
+
+    def _get_efectivo_por_nomina(self, payslips):
+        """ Total de la regla EFECT por nómina en una sola consulta agrupada. """
+        if not payslips:
+            return {}
+        self.env['hr.payslip.line'].flush_model(['slip_id', 'code', 'quantity', 'amount', 'rate'])
+        self.env.cr.execute("""
+            SELECT slip_id, SUM(quantity * amount * rate / 100)
+              FROM hr_payslip_line
+             WHERE code = 'EFECT' AND slip_id IN %s
+             GROUP BY slip_id
+        """, (tuple(payslips.ids),))
+        return {slip_id: float(total or 0.0) for slip_id, total in self.env.cr.fetchall()}
+
+    def _generar_archivo(self, record, layout, payslips, efectivo=None, diario=None, employee_type=None):
+        """ Genera el contenido del archivo con el layout del banco. employee_type reemplaza
+            a 'Empleados a dispersar' del wizard. Regresa el contenido ('' si no hay
+            registros de detalle) y el estado con los totales. """
+        employee_type = employee_type or self.employee_type
+        estado = {
+            'record': record,
+            'diario': diario or self.diario_pago,
+            'employee_type': employee_type,
+            'num_registro': 1,
+            'num_empleados': 0,
+            'monto_total': 0,
+            'encabezado': [],
+            'sumario': [],
+        }
+        if layout.get('encabezado'):
+            getattr(self, layout['encabezado'])(estado)
+
+        detalle = getattr(self, layout['detalle'])
+        if efectivo is None:
+            efectivo = self._get_efectivo_por_nomina(payslips)
+        buffer = io.StringIO()
+        for payslip in payslips:
+            net_total = efectivo.get(payslip.id, 0.0)
+            if net_total == 0:
+                continue
+            employee = payslip.employee_id
+            if employee_type == '02' and employee.diario_pago.bank_id.bic != employee.banco.bic:
+                continue
+            if employee_type == '03' and employee.diario_pago.bank_id.bic == employee.banco.bic:
+                continue
+            linea = detalle(payslip, employee, net_total, estado)
+            if estado['num_empleados']:
+                buffer.write('\n')
+            buffer.write(linea)
+            estado['num_empleados'] += 1
+            estado['monto_total'] += round(net_total,2)
+
+        if not estado['num_empleados']:
+            return '', estado
+        if layout.get('sumario'):
+            getattr(self, layout['sumario'])(estado)
+        return '\n'.join(estado['encabezado'] + [buffer.getvalue()] + estado['sumario']), estado
+
+    def _get_nombre_archivo(self, layout):
+        if layout.get('archivo'):
+            return getattr(self, layout['archivo'])()
+        return datetime.now().strftime("%y%m-%d%H%M%S") + '.' + layout.get('extension', 'txt')
+
+    def _archivo_banorte(self):
+        return 'NI' + self.banorte_numero + '01.pag'
+
+    def _get_nombre_banamex(self, employee, sep):
+        """ Nombre para Banamex ("nombre,paterno/materno"), HSBC y Scotiabank ("nombre paterno materno"). """
+        if not employee.empleado_nombre or not employee.empleado_paterno:
+            raise UserError(_('Falta nombre y/o apellido paterno para el empleado %s.') % (employee.name))
+        if sep == ',':
+            nombre_empleado = employee.empleado_nombre + ',' + employee.empleado_paterno + '/' + (employee.empleado_materno or '')
+        elif employee.empleado_materno:
+            nombre_empleado = employee.empleado_nombre + ' ' + employee.empleado_paterno + ' ' + employee.empleado_materno
+        else:
+            nombre_empleado = employee.empleado_nombre + ' ' + employee.empleado_paterno
+        return nombre_empleado.translate(NOMBRE_BANAMEX)
+
+    def _check_cuenta_bbva(self, employee):
+        if not employee.rfc:
+            raise UserError(_('Falta RFC para el empleado %s.') % (employee.name))
+        if employee.tipo_cuenta == 'c_ahorro':
+            if len(employee.no_cuenta) != 18:
+                raise UserError(_('En la cuenta del empleado debe colocar la CLABE interbancaria (18 digitos) para el empleado %s') % (employee.name))
+        elif employee.tipo_cuenta == 'cheques':
+            if len(employee.no_cuenta) != 10:
+                raise UserError(_('En la cuenta del empleado debe colocar la cuenta BBVA Bancomer (10 digitos) para el empleado %s') % (employee.name))
+        else:
+            raise UserError(_('Los tipos de cuenta permitidos son "Cuenta de Ahorro" o "Cheques" para el empleado %s') % (employee.name))
+        if not employee.no_cuenta:
+            raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
+
+    ###################################################################################
+    #encabezados
+    ###################################################################################
+    def _encabezado_santander(self, estado):
+        enc1 = '1'+ str(estado['num_registro']).rjust(5, '0') + 'E'
+        enc2 = datetime.now().strftime("%m%d%Y")
+        if estado['diario'].bank_account_id.acc_number:
+            enc3 = estado['diario'].bank_account_id.acc_number.ljust(16)
+        else:
+            enc3 = ' ' * 16
+        enc4 = self.fecha_dispersion.strftime("%m%d%Y")
+        estado['encabezado'].append(enc1 + enc2 + enc3 + enc4)
+        estado['num_registro'] += 1
+
+    def _encabezado_banamex_c(self, estado):
+        if not self.banamex_no_cliente:
+            raise UserError(_('Falta el número de cliente Banamex.'))
+        if not estado['diario'].company_id.nombre_fiscal:
+            raise UserError(_('Falta la razón social de la compañía %s.') % estado['diario'].company_id.name)
+        estado['encabezado'].append(
+            '1' #FIJO
+            + self.banamex_no_cliente.rjust(12, '0')
+            + self.fecha_dispersion.strftime('%d%m%y')
+            + self.banamex_secuencia.rjust(4, '0') #no. consecutivo del 1-99
+            + estado['diario'].company_id.nombre_fiscal[0:36].ljust(36, ' ') # RAZON SOCIAL
+            + self.banamex_descripcion.ljust(20, ' ') #DESCRIPCION
+            + ('05' if estado['employee_type'] == '02' else '07') # Pago de nomina (Pagomatico) a cuentas Banamex
+            + ' ' * 40 # solo para ordenes de pago
+            + 'C' # version
+            + '00') #fijo
+
+    def _encabezado_banamex_d(self, estado):
+        if not self.banamex_no_cliente:
+            raise UserError(_('Falta el número de cliente Banamex.'))
+        if not estado['diario'].company_id.nombre_fiscal:
+            raise UserError(_('Falta la razón social de la compañía %s.') % estado['diario'].company_id.name)
+        estado['encabezado'].append(
+            '1' #FIJO
+            + self.banamex_no_cliente.rjust(12, '0')
+            + self.fecha_dispersion.strftime('%y%m%d')
+            + '0001' #no. consecutivo del 1-99
+            + estado['diario'].company_id.nombre_fiscal[0:36].ljust(36, ' ') # RAZON SOCIAL
+            + self.banamex_descripcion.ljust(20, ' ') #DESCRIPCION
+            + '15' # FIJO
+            + 'D' # version de layout
+            + '01') #fijo
+
+    def _encabezado_scotiabank(self, estado):
+        if not self.scotia_numero:
+            raise UserError(_('Falta el número de cliente Scotiabank.'))
+        enc1 = 'EEHA' + self.scotia_numero.rjust(5, '0') + '01000000000000000000000000000' + ' ' * 332
+        if not self.scotia_cuenta:
+            raise UserError(_('Falta el número de cuenta de cargo Scotiabank.'))
+        enc2 = 'EEHB' + self.scotia_cuenta.rjust(17, '0') + '0000000001000' + ' ' * 336
+        estado['encabezado'] += [enc1, enc2]
+
+    def _encabezado_banbajio(self, estado):
+        if not self.bajio_afinidad:
+            raise UserError(_('Falta el grupo afinidad.'))
+        enc2 = self.bajio_afinidad.rjust(7,'0')
+        enc3 = datetime.now().strftime("%Y%m%d")
+        if estado['diario'].bank_account_id.acc_number:
+            enc4 = estado['diario'].bank_account_id.acc_number.rjust(20,'0')
+        else:
+            enc4 = ' ' * 20
+        estado['num_registro'] += 1
+        estado['encabezado'].append('010000001030S900' + enc2 + enc3 + enc4 + ' ' * 130)
+
+    ###################################################################################
+    #registos de detalle
+    ###################################################################################
+    def _detalle_bbva_mixto(self, payslip, employee, net_total, estado):
+        self._check_cuenta_bbva(employee)
+        if employee.tipo_cuenta == 'c_ahorro':
+            tipo = '40'
+            # posiciones 1-3 y 4-6 de la cuenta CLABE, resto a 16 posiciones
+            cuenta = employee.no_cuenta[:3] + employee.no_cuenta[3:6] + employee.no_cuenta[6:].rjust(16,'0')
+        else:
+            tipo = '01'
+            cuenta = '001' + '001' + employee.no_cuenta.rjust(16,'0') #10 posiciones cuenta
+        nombre_empleado = employee.name.translate(NOMBRE_BBVA)
+        return ('3' # identificador
+                + self.bbva_referencia[:7]
+                + employee.rfc.ljust(18,' ')
+                + tipo + cuenta
+                + _importe(net_total, 13)
+                + '0000000' + ' ' * 80 # fillers
+                + nombre_empleado[0:40].ljust(40, ' ')
+                + 'PAGO POR CONCEPTO DE NOMINA'.ljust(40, ' ') + '\r')
+
+    def _detalle_bbva(self, payslip, employee, net_total, estado):
+        self._check_cuenta_bbva(employee)
+        if employee.tipo_cuenta == 'c_ahorro':
+            tipo = '40'
+            banco = employee.no_cuenta[:3] + employee.no_cuenta[3:6]
+        else:
+            tipo = '99'
+            banco = '001' + '001'
+        nombre_empleado = employee.name.translate(NOMBRE_BBVA)
+        linea = (str(estado['num_registro']).zfill(9) # número consecutivo del registro
+                 + employee.rfc.ljust(16)[:16]
+                 + tipo
+                 + employee.no_cuenta.ljust(20) # CLABE o cuenta de 10 digitos
+                 + _importe(net_total, 13)
+                 + nombre_empleado[0:40].ljust(40, ' ')
+                 + banco + '\r')
+        estado['num_registro'] += 1
+        return linea
+
+    def _detalle_santander(self, payslip, employee, net_total, estado):
+        data1 = '2' + str(estado['num_registro']).zfill(5) + str(employee.no_empleado).ljust(7)
+        data2 = employee.empleado_paterno.ljust(30)[:30] + employee.empleado_materno.ljust(20)[:20] + employee.empleado_nombre.ljust(30)[:30]
+        if not employee.no_cuenta:
+            raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
+        estado['num_registro'] += 1
+        return data1 + data2 + employee.no_cuenta.ljust(16)[:16] + _importe(net_total, 16) + (self.dato1 or '')
+
+    def _detalle_santander_mixto(self, payslip, employee, net_total, estado):
+        data1 = '2' + str(estado['num_registro']).zfill(5) + employee.name[0:50].ljust(50, ' ')
+        if employee.tipo_cuenta == 't_debido':
+            data4 = '   02'
+        elif employee.tipo_cuenta == 'cheques':
+            data4 = '   01'
+        elif employee.tipo_cuenta == 'c_ahorro':
+            data4 = '   40'
+        if not employee.no_cuenta:
+            raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
+        data5 = employee.no_cuenta.ljust(20, ' ')
+        data6 = str(round(net_total,2)).replace('.','').rjust(18, '0')
+        data7 = employee.clave_santander_banco and employee.clave_santander_banco.rjust(5, '0') or '00000'
+        data8 = employee.plaza_santander_banco and employee.plaza_santander_banco.rjust(5, '0') or '00000'
+        estado['num_registro'] += 1
+        return data1 + data4 + data5 + data6 + data7 + data8
+
+    def _detalle_banamex_c(self, payslip, employee, net_total, estado):
+        #3 0 001 01 001 000000000000242964 03 00005256781834028297 TRANSFER11      SALBADOR,SANTIAGO/     000000
+        num_registro = estado['num_registro']
+        if not employee.no_cuenta:
+            raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
+        if estado['employee_type'] == '02':
+            referencia = str(num_registro).rjust(10, '0') + ' ' * 30
+        else:
+            referencia = '0' * 30 + str(num_registro).rjust(10, '0')
+        nombre_empleado = self._get_nombre_banamex(employee, ',')
+        linea = ('3' + '0' + '001'
+                 + _importe(net_total, 16)
+                 + '01' # tipo de cuenta de abono 01: Cheques / CLABE, 03=Plásticos, 04=Orden de pago, 15=Cuenta concentradora
+                 + employee.no_cuenta.rjust(20, '0')
+                 + referencia
+                 + nombre_empleado[0:55].ljust(55, ' ')
+                 + 'TRANSFERENCIA'.ljust(40) + ' ' * 24
+                 + ('    ' if estado['employee_type'] == '02' else '0' + employee.no_cuenta[0:3]) # clave del banco
+                 + ('       ' if estado['employee_type'] == '02' else str(num_registro).rjust(7, '0')) # Referencia bajo valor
+                 + '  ')
+        estado['num_registro'] += 1
+        return linea
+
+    def _detalle_banamex_d(self, payslip, employee, net_total, estado):
+        if not employee.no_cuenta:
+            raise UserError(_('Falta número de cuenta para el empleado %s.') % (employee.name))
+        nombre_empleado = self._get_nombre_banamex(employee, ',')
+        linea = ('3' + '0'
+                 + '001' # metodo pago 001: Cuentas Banamex, 002: Interbancario, 003: Orden de Pago.
+                 + '01' #tipo de pago 01 nominna -- hay varios
+                 + '001'
+                 + _importe(net_total, 16)
+                 + '03' # tipo de cuenta de abono 01: Cheques, 03: Plásticos, 04: Orden de Pago, 40: CLABE.
+                 + '0000' + employee.no_cuenta.ljust(16)
+                 + ('TRANSFER'+ str(estado['num_registro'])).ljust(16, ' ')
+                 + nombre_empleado[0:55].ljust(55, ' ')
+                 + ' ' * 140
+                 + '0000' # clave del banco, depende de opciones
+                 + '00'
+                 + ' ' * 152)
+        estado['num_registro'] += 1
+        return linea
+
+    def _detalle_banorte(self, payslip, employee, net_total, estado):
+        if not employee.no_empleado:
+            raise UserError(_('Falta número de empleado %s.') % (employee.name))
+        if not employee.banco.c_banco:
+            raise UserError(_('El banco seleccionado no tiene clave configurada %s.') % (employee.name))
+        if employee.tipo_cuenta == 't_debito' or employee.tipo_cuenta == 't_credito':
+            tipo = '03'
+        elif employee.tipo_cuenta == 'cheques':
+            tipo = '01'
+        else:
+            tipo = '40'
+        if not employee.no_cuenta:
+            raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
+        estado['num_registro'] += 1
+        return ('D' + self.fecha_dispersion.strftime('%Y%m%d')
+                + str(employee.no_empleado).rjust(10,'0') #numero de empleado
+                + ' ' * 80 #espacios en blanco
+                + _importe(net_total, 13)
+                + employee.banco.c_banco # numero del banco receptor
+                + tipo + employee.no_cuenta.rjust(18, '0')
+                + '0' + ' ' + '00000000' + ' ' * 18)
+
+    def _detalle_banregio(self, payslip, employee, net_total, estado):
+        if not employee.no_cuenta:
+            raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
+        estado['num_registro'] += 1
+        return (str(estado['num_empleados'] + 1).rjust(5, '0') + ',' #secuencia
+                + 'S' + ','
+                + employee.no_cuenta.rjust(20, '0') + ','
+                + _importe(net_total, 13, ',') + ','
+                + '0000000000000,00' + ','
+                + 'TRANSFERENCIA SPEI'.ljust(40) + ','
+                + ' ' * 15)
+
+    def _detalle_hsbc(self, payslip, employee, net_total, estado):
+        if not employee.no_cuenta:
+            raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
+        nombre_empleado = self._get_nombre_banamex(employee, ' ')
+        estado['num_registro'] += 1
+        return (employee.no_cuenta.rjust(10, '0') + ','
+                + _importe(net_total, 12) + ','
+                + 'ABONO POR PAGO DE NOMINA'.ljust(34) + ','
+                + nombre_empleado[0:35].ljust(35, ' '))
+
+    def _detalle_scotiabank(self, payslip, employee, net_total, estado):
+        if not employee.no_cuenta:
+            raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
+        nombre_empleado = self._get_nombre_banamex(employee, ' ')
+        return ('EEDA'
+                + '04' #01 - Efectivo en ventanilla,  02 - Cheque de caja en ventanilla, 03 - Cheque de caja central y 04 - Abono en cuenta.
+                + _importe(net_total, 15)
+                + self.fecha_dispersion.strftime('%Y%m%d')
+                + '01'
+                + str(employee.no_empleado).ljust(2)
+                + nombre_empleado[0:35].rjust(59, ' ')
+                + ' ' * 12
+                + self.scotia_referencia.rjust(16, '0')
+                + employee.no_cuenta.rjust(30, '0')
+                + '00000' + ' ' * 40 + '1 ' + '00000044044001' + '01'
+                + payslip.payslip_run_id.name.ljust(142, ' ')
+                + '0' * 25 + ' ' * 22)
+
+    def _detalle_inbursa(self, payslip, employee, net_total, estado):
+        if not employee.no_cuenta:
+            raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
+        if estado['employee_type'] == '01':
+            raise UserError(_('No se puede dispersar a todos los empledos, cambiar la opción en "Empleados a dispersar".'))
+        linea = self.fecha_dispersion.strftime('%Y%m%d') + ',' + self.inbursa_cuenta + ','
+        if estado['employee_type'] == '02':
+            linea += str(employee.no_cuenta) + ',' + str(round(net_total,2)) + ',' + payslip.number
+        else:
+            linea += employee.no_cuenta + ',' + str(round(net_total,2)) + ',,' + payslip.number + ',,,' + '2'
+        estado['num_registro'] += 1
+        return linea
+
+    def _detalle_banbajio(self, payslip, employee, net_total, estado):
+        if not employee.no_cuenta:
+            raise UserError(_('Falta configurar número de cuenta %s.') % (employee.name))
+        num_registro = str(estado['num_registro']).rjust(7, '0')
+        fecha = self.fecha_dispersion.strftime('%Y%m%d')
+        estado['num_registro'] += 1
+        return ('02' + num_registro + '90' + fecha + '000030'
+                + _importe(net_total, 13)
+                + fecha + '00'
+                + estado['diario'].bank_account_id.acc_number.rjust(20,'0') + ' '
+                + employee.no_cuenta.rjust(22, '0') + ' '
+                + num_registro
+                + 'DEPOSITO DE NOMINA'.ljust(40)
+                + '0' * 40)
+
+    ###################################################################################
+    #sumario
+    ###################################################################################
+    def _sumario_bbva_mixto(self, estado):
+        estado['encabezado'].append(
+            '1'
+            + str(estado['num_empleados']).rjust(7, '0')
+            + _importe(estado['monto_total'], 13)
+            + '0000000' + '0' * 15 + '0' * 12
+            + self.bbva_no_contrato[:10]
+            + 'R05' + '101' + '1'
+            + datetime.now().strftime("%Y%m%d")
+            + self.fecha_dispersion.strftime('%Y%m%d')
+            + ' ' * 142 + '\r')
+        estado['sumario'].append('')
+
+    def _sumario_bbva(self, estado):
+        estado['sumario'].append('')
+
+    def _sumario_santander(self, estado):
+        estado['sumario'].append('3'
+                                 + str(estado['num_registro']).rjust(5, '0')
+                                 + str(estado['num_empleados']).rjust(5, '0')
+                                 + _importe(estado['monto_total'], 16))
+
+    def _sumario_banamex(self, estado, cuenta, enc27):
+        ### segundo encabezado  2 1 001 000000000037870848 01 00000000070020012747 000258
+        importe = _importe(estado['monto_total'], 16)
+        estado['encabezado'].append('2' + '1' + '001' + importe + '01' + cuenta + enc27)
+        #4 001 000258 000000000037870848 000001 000000000037870848
+        estado['sumario'].append('4' + '001' + str(estado['num_empleados']).rjust(6, '0') + importe + '000001' + importe)
+
+    def _sumario_banamex_c(self, estado):
+        acc_number = estado['diario'].bank_account_id.acc_number
+        cuenta = acc_number[0:4] + acc_number[4:].rjust(20, '0') if acc_number else ' ' * 18
+        self._sumario_banamex(estado, cuenta, ' ' * 20)
+
+    def _sumario_banamex_d(self, estado):
+        acc_number = estado['diario'].bank_account_id.acc_number
+        cuenta = acc_number.rjust(20, '0') if acc_number else ' ' * 18
+        self._sumario_banamex(estado, cuenta, str(estado['num_empleados']).rjust(6, '0'))
+
+    def _sumario_banorte(self, estado):
+        estado['encabezado'].append(
+            'H' #FIJO
+            + 'NE' #Nomina Banorte
+            + self.banorte_numero #numero de emisor asignado
+            + self.fecha_dispersion.strftime('%Y%m%d')
+            + '01' #no. consecutivo del 1-99
+            + str(estado['num_empleados']).rjust(6, '0') # numero de empleados
+            + _importe(estado['monto_total'], 13)
+            + '000000' + '0' * 15 # numero e importe de altas
+            + '000000' + '0' * 15 # numero e importe de bajas
+            + '000000' # cuentas a veririfcar
+            + '0' #accion
+            + '0' * 77) #filler
+
+    def _sumario_hsbc(self, estado):
+        if not estado['diario'].bank_account_id.acc_number:
+            raise UserError(_('Falta el número de cuenta de la cuenta de pago.'))
+        estado['encabezado'].append(
+            'MXPRLF,' + 'F,'
+            + estado['diario'].bank_account_id.acc_number.rjust(10, '0') + ','
+            + _importe(estado['monto_total'], 12) + ','
+            + str(estado['num_empleados']).rjust(7, '0') + ','
+            + self.fecha_dispersion.strftime('%d%m%Y') + ','
+            + ',' # horario de programacion
+            + estado['record'].name)
+
+    def _sumario_scotiabank(self, estado):
+        estado['sumario'].append('EETB' + '0000006' + _importe(estado['monto_total'], 15) + '0' * 219 + ' ' * 123)
+
+    def _sumario_inbursa(self, estado):
+        estado['encabezado'].append(str(estado['num_empleados']) + ',' + str(round(estado['monto_total'],2)))
+
+    def _sumario_banbajio(self, estado):
+        estado['sumario'].append('09'
+                                 + str(estado['num_registro']).rjust(7, '0')
+                                 + '90'
+                                 + str(estado['num_empleados']).rjust(7, '0')
+                                 + _importe(estado['monto_total'], 16)
+                                 + ' ' * 145)
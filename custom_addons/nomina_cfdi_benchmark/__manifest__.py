@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+{
+    'name': 'Nomina CFDI Benchmark',
+    'summary': 'Genera una empresa sintética y mide tiempos y consultas de las etapas de la nómina.',
+    'description': '''
+    Nomina CFDI Benchmark
+
+    Usar únicamente en una base de datos desechable. Desde odoo-bin shell:
+
+        env['nomina.benchmark'].run_benchmark(employees=500, output='/tmp/nomina_bench.json')
+        env.cr.rollback()
+
+    El resultado es un JSON con el tiempo (segundos) y número de consultas SQL por etapa
+    para poder comparar entre commits.
+    ''',
+    'author': 'IT Admin',
+    'version': '18.01',
+    'category': 'Employees',
+    'depends': [
+        'nomina_cfdi_ee', 'nomina_cfdi_extras_ee', 'nomina_cfdi_bancos',
+    ],
+    'data': [
+    ],
+    'installable': True,
+    'application': False,
+    'license': 'AGPL-3',
+}
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+
+import json
+import random
+import subprocess
+import time
+from datetime import date, timedelta
+
+from odoo import api, fields, models, release, _
+from odoo.exceptions import UserError
+from odoo.modules.module import get_module_path
+import logging
+_logger = logging.getLogger(__name__)
+
+# Etapas medidas, en el orden en que se ejecutan
+STAGES = [
+    'slip_generation',
+    'compute_sheet',
+    'accumulators',
+    'imss',
+    'to_json',
+    'journal_entries',
+    'bank_file',
+    'report_control_xlsx',
+    'report_imss_xlsx',
+    'report_listado_xls',
+    'report_total_empleado_xls',
+    'report_total_departamento_xls',
+    'report_nominas_xls',
+    'zip_download',
+]
+
+NOMBRES = ['José', 'María', 'Juan', 'Ana', 'Luis', 'Sofía', 'Jesús', 'Lucía', 'Ángel', 'Verónica',
+           'Ramón', 'Mónica', 'Iñaki', 'Begoña', 'Raúl', 'Inés']
+APELLIDOS = ['Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez',
+             'Ramírez', 'Cruz', 'Gómez', 'Muñoz', 'Núñez', 'Ibáñez', 'Peña', 'Ordóñez']
+DEPARTAMENTOS = ['Administración', 'Producción', 'Ventas', 'Almacén', 'Logística', 'Mantenimiento']
+# (bic, proporción de empleados con cuenta de pago en ese banco)
+BANCOS = [('BBA830831LJ2', 0.6), ('BMN930209927', 0.4)]
+
+# Tarifa ISR quincenal: límite inferior, cuota fija, % sobre excedente
+ISR_PERIODO = [(0.01, 0.0, 1.92), (368.11, 7.05, 6.40), (3124.36, 183.45, 10.88), (5490.76, 441.0, 16.0),
+               (6382.81, 583.65, 17.92), (7641.91, 809.25, 21.36), (15412.81, 2469.15, 23.52),
+               (24292.66, 4557.75, 30.0), (46378.51, 11183.40, 32.0), (61838.11, 16130.55, 34.0),
+               (185514.31, 58180.35, 35.0)]
+ISR_MENSUAL = [(0.01, 0.0, 1.92), (746.05, 14.32, 6.40), (6332.06, 371.83, 10.88), (11128.02, 893.63, 16.0),
+               (12935.83, 1182.88, 17.92), (15487.72, 1640.18, 21.36), (31236.50, 5004.12, 23.52),
+               (49233.01, 9236.89, 30.0), (93993.91, 22665.17, 32.0), (125325.21, 32691.18, 34.0),
+               (375975.62, 117912.32, 35.0)]
+ISR_ANUAL = [(0.01, 0.0, 1.92), (8952.50, 171.88, 6.40), (75984.56, 4461.94, 10.88), (133536.08, 10723.55, 16.0),
+             (155229.81, 14194.54, 17.92), (185852.58, 19682.13, 21.36), (374837.89, 60049.40, 23.52),
+             (590795.0, 110842.74, 30.0), (1127926.85, 271981.99, 32.0), (1503902.47, 392294.17, 34.0),
+             (4511707.38, 1414947.85, 35.0)]
+
+ISR_PYTHON = '''base = categories.BASIC + categories.ALW
+result = 0
+tarifa = False
+for line in contract.tablas_cfdi_id.tabla_ISR_periodo:
+    if line.lim_inf <= base and (not tarifa or line.lim_inf > tarifa.lim_inf):
+        tarifa = line
+if tarifa:
+    result = (base - tarifa.lim_inf) * tarifa.s_excedente / 100 + tarifa.c_fija'''
+
+# code, nombre, secuencia, categoría, clave SAT (percepción/deducción/otro pago), fórmula
+REGLAS = [
+    ('P001', 'Sueldo', 10, 'BASIC', ('percepcion', '001'),
+     'result = contract.sueldo_diario * (worked_days.WORK100 and worked_days.WORK100.number_of_days or 0)'),
+    ('P022', 'Retiro fondo de ahorro', 20, 'ALW', ('percepcion', '005'),
+     'result = inputs.RET_CAJA and inputs.RET_CAJA.amount or 0'),
+    ('O001', 'Subsidio para el empleo', 30, 'ALW3', ('otropago', '002'), 'result = 0.0'),
+    ('TPER', 'Total percepciones', 100, 'AUX', False, 'result = categories.BASIC + categories.ALW'),
+    ('TPERG', 'Total percepciones gravadas', 101, 'AUX', False, 'result = categories.BASIC + categories.ALW'),
+    ('ISR', 'ISR antes de subsidio', 110, 'AUX', False, ISR_PYTHON),
+    ('SUB', 'Subsidio aplicado', 111, 'AUX', False, 'result = 0.0'),
+    ('ISR2', 'ISR', 120, 'DED', ('deduccion', '002'), 'result = ISR - SUB'),
+    ('D001', 'IMSS', 130, 'DED', ('deduccion', '001'), 'result = payslip.emp_total or 0'),
+    ('D011', 'Fondo de ahorro', 140, 'DED', ('deduccion', '004'),
+     'result = contract.caja_ahorro and contract.caja_ahorro_amount or 0'),
+    ('390', 'Préstamo', 390, 'DED', ('deduccion', '004'), 'result = (payslip.installment_amount or 0)'),
+    ('TDED', 'Total deducciones', 400, 'AUX', False, 'result = categories.DED'),
+    ('NET', 'Neto', 500, 'NET', False, 'result = categories.BASIC + categories.ALW + categories.ALW3 - categories.DED'),
+    ('EFECT', 'Efectivo', 510, 'NET', False, 'result = NET'),
+]
+
+
+class NominaBenchmark(models.AbstractModel):
+    _name = 'nomina.benchmark'
+    _description = 'Benchmark de nómina'
+
+    @api.model
+    def run_benchmark(self, employees=100, seed=42, date_start='2025-03-01', history=2,
+                      struct_code='BENCH', stages=None, output=None, label=None):
+        """ Genera una empresa sintética y mide cada etapa de la nómina.
+
+        Trabaja en la transacción actual y no hace commit; usar en una base desechable
+        y hacer rollback al terminar. Regresa el resultado y, si se indica ``output``,
+        lo escribe como JSON.
+        """
+        stages = stages or STAGES
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise UserError(_('Etapas desconocidas: %s') % ', '.join(sorted(unknown)))
+
+        start = time.perf_counter()
+        data = self._generate_company(employees, seed, fields.Date.to_date(date_start), history, struct_code)
+        generation = round(time.perf_counter() - start, 4)
+
+        run = data['run']
+        results = {}
+        for stage in STAGES:
+            if stage in stages:
+                results[stage] = self._measure(getattr(self, '_stage_%s' % stage), run, data)
+
+        slips = run.slip_ids
+        report = {
+            'meta': {
+                'label': label,
+                'revision': self._get_revision(),
+                'odoo_version': release.version,
+                'database': self.env.cr.dbname,
+                'timestamp': fields.Datetime.to_string(fields.Datetime.now()),
+                'seed': seed,
+                'employees': employees,
+                'history_runs': history,
+                'payslips': len(slips),
+                'payslip_lines': self.env['hr.payslip.line'].search_count([('slip_id', 'in', slips.ids)]),
+                'generation_seconds': generation,
+            },
+            'stages': results,
+        }
+        if output:
+            with open(output, 'w') as fp:
+                json.dump(report, fp, indent=2, sort_keys=True)
+        return report
+
+    def _measure(self, func, run, data):
+        cr = self.env.cr
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = cr.sql_log_count
+        start = time.perf_counter()
+        error = False
+        try:
+            with cr.savepoint():
+                records = func(run, data)
+                self.env.flush_all()
+        except Exception as e:
+            _logger.exception('Error en la etapa %s', func.__name__)
+            error = str(e)
+            records = 0
+        return {
+            'seconds': round(time.perf_counter() - start, 4),
+            'queries': cr.sql_log_count - queries,
+            'records': records or 0,
+            'error': error,
+        }
+
+    def _get_revision(self):
+        try:
+            res = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=get_module_path('nomina_cfdi_benchmark'),
+                                 capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return False
+        return res.returncode == 0 and res.stdout.strip() or False
+
+    ############ Generador de datos ###################
+
+    def _generate_company(self, employees, seed, date_start, history, struct_code):
+        rnd = random.Random(seed)
+        company = self.env.company
+        if not company.company_cfdi:
+            company.company_cfdi = True
+
+        tablas = self._get_tablas(date_start.year)
+        structure = self.env['hr.payroll.structure'].search([('code', '=', struct_code), ('company_id', '=', company.id)], limit=1)
+        if not structure:
+            structure = self._create_structure(struct_code, tablas)
+        journals = self._get_bank_journals(company)
+        departments = self._get_departments(company)
+        employee_ids = self._create_employees(rnd, employees, company, journals, departments, structure, tablas, date_start)
+        loan_type = self._get_loan_type(company)
+        self._create_loans(rnd, employee_ids, loan_type, date_start)
+
+        periods = self._get_periods(date_start, history + 1)
+        for date_from, date_to in periods[:-1]:
+            run = self._create_run(structure, date_from, date_to)
+            self._stage_slip_generation(run, {'employees': employee_ids})
+            # las nóminas anteriores solo alimentan los acumulados
+            try:
+                with self.env.cr.savepoint():
+                    run.action_confirmar_nomina()
+            except Exception as e:
+                _logger.warning('No se pudo confirmar %s (%s), se marca como hecha.', run.name, e)
+                run.slip_ids.write({'state': 'done'})
+
+        date_from, date_to = periods[-1]
+        return {
+            'employees': employee_ids,
+            'structure': structure,
+            'tablas': tablas,
+            'journals': journals,
+            'run': self._create_run(structure, date_from, date_to),
+        }
+
+    def _get_periods(self, date_start, count):
+        """ Quincenas que terminan con la que inicia en date_start. """
+        periods = []
+        date_from = date_start
+        while len(periods) < count:
+            if date_from.day == 1:
+                date_to = date_from.replace(day=15)
+            else:
+                date_to = (date_from.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+            periods.insert(0, (date_from, date_to))
+            if date_from.day == 1:
+                date_from = (date_from - timedelta(days=1)).replace(day=16)
+            else:
+                date_from = date_from.replace(day=1)
+        return periods
+
+    def _get_tablas(self, year):
+        name = 'Benchmark %s' % year
+        tablas = self.env['tablas.cfdi'].search([('name', '=', name)], limit=1)
+        if tablas:
+            return tablas
+        uma = 113.14
+        salario_minimo = 278.80
+        cesantia = [(0.01, 3.150), (salario_minimo + 0.01, 3.544), (1.51 * uma, 4.426), (2.01 * uma, 4.954),
+                    (2.51 * uma, 5.307), (3.01 * uma, 5.559), (3.51 * uma, 5.747), (4.01 * uma, 6.422)]
+        mensual = []
+        bimestral = []
+        for month in range(1, 13):
+            dia_inicio = date(year, month, 1)
+            dia_fin = (dia_inicio.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+            mensual.append((0, 0, {'mes': '%02d' % month, 'dia_inicio': dia_inicio, 'dia_fin': dia_fin,
+                                   'no_dias': (dia_fin - dia_inicio).days + 1}))
+            if month % 2 == 0:
+                inicio_bimestre = date(year, month - 1, 1)
+                bimestral.append((0, 0, {'dia_inicio': inicio_bimestre, 'dia_fin': dia_fin,
+                                         'no_dias': (dia_fin - inicio_bimestre).days + 1}))
+        return self.env['tablas.cfdi'].create({
+            'name': name,
+            'uma': uma,
+            'salario_minimo': salario_minimo,
+            'tabla_ISR_periodo': [(0, 0, {'lim_inf': l, 'c_fija': c, 's_excedente': s}) for l, c, s in ISR_PERIODO],
+            'tabla_LISR': [(0, 0, {'lim_inf': l, 'c_fija': c, 's_excedente': s}) for l, c, s in ISR_MENSUAL],
+            'tabla_ISR_anual': [(0, 0, {'lim_inf': l, 'c_fija': c, 's_excedente': s}) for l, c, s in ISR_ANUAL],
+            'tabla_subem': [(0, 0, {'lim_inf': 0.01, 's_mensual': 474.64})],
+            'tabla_cesantia': [(0, 0, {'lim_inf': l, 'cuota': c}) for l, c in cesantia],
+            'tabla_antiguedades': [(0, 0, {'antiguedad': a, 'vacaciones': v, 'prima_vac': 25, 'aguinaldo': 15})
+                                   for a, v in [(1, 12), (2, 14), (3, 16), (4, 18), (5, 20)]],
+            'tabla_mensual': mensual,
+            'tabla_bimestral': bimestral,
+        })
+
+    def _get_category(self, code):
+        category = self.env['hr.salary.rule.category'].search([('code', '=', code)], limit=1)
+        if not category:
+            category = self.env['hr.salary.rule.category'].create({'name': code, 'code': code})
+        return category
+
+    def _create_structure(self, struct_code, tablas):
+        catalogs = {'percepcion': 'nomina.percepcion', 'deduccion': 'nomina.deduccion', 'otropago': 'nomina.otropago'}
+        fields_sat = {'percepcion': 'tipo_cpercepcion', 'deduccion': 'tipo_cdeduccion', 'otropago': 'tipo_cotro_pago'}
+        vals_list = []
+        for code, name, sequence, category, sat, formula in REGLAS:
+            vals = {
+                'name': name,
+                'code': code,
+                'sequence': sequence,
+                'category_id': self._get_category(category).id,
+                'condition_select': 'none',
+                'amount_select': 'code',
+                'amount_python_compute': formula,
+            }
+            if sat:
+                catalog = self.env[catalogs[sat[0]]].search([('clave', '=', sat[1])], limit=1)
+                vals[fields_sat[sat[0]]] = catalog.id
+            vals_list.append(vals)
+        rules = self.env['hr.salary.rule'].create(vals_list)
+        by_code = {rule.code: rule for rule in rules}
+        tablas.write({'caja_ahorro_abono': by_code['D011'].id, 'caja_ahorro_retiro': by_code['P022'].id})
+        return self.env['hr.payroll.structure'].create({
+            'name': 'Benchmark',
+            'code': struct_code,
+            'rule_ids': [(6, 0, rules.ids)],
+        })
+
+    def _get_bank_journals(self, company):
+        journals = []
+        for count, (bic, ratio) in enumerate(BANCOS, start=1):
+            bank = self.env['res.bank'].search([('bic', '=', bic)], limit=1)
+            if not bank:
+                raise UserError(_('No se encontró el banco con RFC %s.') % bic)
+            journal = self.env['account.journal'].search([('type', '=', 'bank'), ('bank_id', '=', bank.id),
+                                                          ('company_id', '=', company.id)], limit=1)
+            if not journal:
+                journal = self.env['account.journal'].create({
+                    'name': 'Nómina %s' % bank.name,
+                    'code': 'BNM%s' % count,
+                    'type': 'bank',
+                    'company_id': company.id,
+                    'bank_id': bank.id,
+                    'bank_acc_number': '0%09d' % count,
+                })
+            journals.append((journal, ratio))
+        return journals
+
+    def _get_departments(self, company):
+        departments = self.env['hr.department'].search([('name', 'in', DEPARTAMENTOS), ('company_id', '=', company.id)])
+        missing = [name for name in DEPARTAMENTOS if name not in departments.mapped('name')]
+        if missing:
+            departments |= self.env['hr.department'].create([{'name': name, 'company_id': company.id} for name in missing])
+        return departments
+
+    def _create_employees(self, rnd, count, company, journals, departments, structure, tablas, date_start):
+        banks = self.env['res.bank'].search([('bic', '!=', False), ('c_banco', '!=', False)])
+        if not banks:
+            raise UserError(_('No hay bancos con RFC y clave de banco (c_banco) para las cuentas de los empleados.'))
+        employee_vals = []
+        for i in range(1, count + 1):
+            nombre = rnd.choice(NOMBRES)
+            paterno = rnd.choice(APELLIDOS)
+            materno = rnd.choice(APELLIDOS)
+            journal = rnd.choices([j for j, r in journals], weights=[r for j, r in journals])[0]
+            banco = journal.bank_id if rnd.random() < 0.8 else rnd.choice(banks)
+            employee_vals.append({
+                'name': '%s %s %s' % (nombre, paterno, materno),
+                'empleado_nombre': nombre,
+                'empleado_paterno': paterno,
+                'empleado_materno': materno,
+                'no_empleado': str(i),
+                'rfc': 'XAXX%06d%s' % (rnd.randint(0, 999999), 'A%02d' % (i % 100)),
+                'curp': 'XEXX%06dHDFXXX%02d' % (rnd.randint(0, 999999), i % 100),
+                'segurosocial': '%011d' % rnd.randint(0, 10 ** 11 - 1),
+                'tipo_pago': 'transferencia',
+                'diario_pago': journal.id,
+                'banco': banco.id,
+                'tipo_cuenta': banco == journal.bank_id and rnd.choice(['t_debido', 'cheques', 'c_ahorro']) or 'cheques',
+                'no_cuenta': banco == journal.bank_id and '%010d' % rnd.randint(0, 10 ** 10 - 1) or '%018d' % rnd.randint(0, 10 ** 18 - 1),
+                'regimen': '02',
+                'contrato': '01',
+                'jornada': '01',
+                'department_id': rnd.choice(departments).id,
+                'company_id': company.id,
+            })
+        employees = self.env['hr.employee'].create(employee_vals)
+
+        contract_vals = []
+        for employee in employees:
+            sueldo_diario = round(rnd.uniform(tablas.salario_minimo, 2500), 2)
+            sdi = round(sueldo_diario * 1.0493, 2)
+            caja_ahorro = rnd.random() < 0.3
+            contract_vals.append({
+                'name': 'Contrato %s' % employee.no_empleado,
+                'employee_id': employee.id,
+                'company_id': company.id,
+                'struct_id': structure.id,
+                'tablas_cfdi_id': tablas.id,
+                'resource_calendar_id': company.resource_calendar_id.id,
+                'date_start': date_start - timedelta(days=rnd.randint(60, 3650)),
+                'wage': round(sueldo_diario * 30, 2),
+                'sueldo_diario': sueldo_diario,
+                'sueldo_diario_integrado': sdi,
+                'sueldo_base_cotizacion': sdi,
+                'periodicidad_pago': '04',
+                'riesgo_puesto': rnd.choice(['1', '2', '3']),
+                'caja_ahorro': caja_ahorro,
+                'caja_ahorro_amount': caja_ahorro and round(sueldo_diario * 0.5, 2) or 0,
+                'state': 'open',
+            })
+        self.env['hr.contract'].create(contract_vals)
+        return employees
+
+    def _get_loan_type(self, company):
+        loan_type = self.env['employee.loan.type'].search([('name', '=', 'Préstamo benchmark'), ('company_id', '=', company.id)], limit=1)
+        if not loan_type:
+            loan_type = self.env['employee.loan.type'].create({
+                'name': 'Préstamo benchmark',
+                'loan_limit': 50000,
+                'loan_term': 12,
+                'periodo_de_pago': 'Quincenal',
+                'tipo_deduccion': '1',
+                'company_id': company.id,
+            })
+        return loan_type
+
+    def _create_loans(self, rnd, employees, loan_type, date_start):
+        loan_vals = []
+        for employee in employees:
+            if rnd.random() < 0.2:
+                loan_vals.append({
+                    'employee_id': employee.id,
+                    'department_id': employee.department_id.id,
+                    'loan_type_id': loan_type.id,
+                    'loan_amount': rnd.randrange(1000, 20000, 500),
+                    'term': loan_type.loan_term,
+                    'start_date': date_start - timedelta(days=60),
+                    'date': date_start - timedelta(days=60),
+                    'notes': 'Benchmark',
+                })
+        loans = self.env['employee.loan'].create(loan_vals)
+        loans.compute_installment()
+        loans.write({'state': 'done'})
+        return loans
+
+    def _create_run(self, structure, date_from, date_to):
+        return self.env['hr.payslip.run'].create({
+            'name': 'Benchmark %s' % fields.Date.to_string(date_from),
+            'date_start': date_from,
+            'date_end': date_to,
+            'estructura': structure.id,
+            'tipo_nomina': 'O',
+            'periodicidad_pago': '04',
+            'dias_pagar': 15,
+            'imss_dias': 15,
+            'imss_mes': 30.4,
+            'fecha_pago': date_to,
+            'mes': '%02d' % date_to.month,
+            'isr_anual': True,
+            'ultima_nomina': date_to.day != 15,
+        })
+
+    ############ Etapas ###################
+
+    def _stage_slip_generation(self, run, data):
+        wizard = self.env['hr.payslip.employees'].create({'employee_ids': [(6, 0, data['employees'].ids)]})
+        wizard.with_context(active_id=run.id).compute_sheet()
+        return len(run.slip_ids)
+
+    def _stage_compute_sheet(self, run, data):
+        run.slip_ids.compute_sheet()
+        return len(run.slip_ids)
+
+    def _stage_accumulators(self, run, data):
+        for slip in run.slip_ids:
+            slip._get_acumulados_mensual()
+            slip._get_acumulados_anual()
+            slip._get_acumulado_prima_vac()
+        return len(run.slip_ids)
+
+    def _stage_imss(self, run, data):
+        for slip in run.slip_ids:
+            slip.calculo_imss()
+        return len(run.slip_ids)
+
+    def _stage_to_json(self, run, data):
+        for slip in run.slip_ids:
+            slip.to_json()
+        return len(run.slip_ids)
+
+    def _stage_journal_entries(self, run, data):
+        run.action_confirmar_nomina()
+        return len(run.slip_ids.filtered(lambda x: x.state == 'done'))
+
+    def _stage_bank_file(self, run, data):
+        wizard_obj = self.env['generar.pagos.banco']
+        selection = [key for key, value in wizard_obj._fields['banco_rfc'].selection]
+        for journal, ratio in data['journals']:
+            banco_rfc = [key for key in selection if key.replace('_2', '') == journal.bank_id.bic][0]
+            wizard = wizard_obj.create({
+                'banco_rfc': banco_rfc,
+                'employee_type': '01',
+                'diario_pago': journal.id,
+                'fecha_dispersion': run.date_end,
+                'banorte_numero': '12345',
+                'bbva_referencia': 'NOMINA',
+            })
+            wizard.with_context(active_id=run.id).action_print_generar_pagos()
+        return len(data['journals'])
+
+    def _stage_report_control_xlsx(self, run, data):
+        self.env['ir.actions.report']._render_xlsx('nomina_cfdi_extras_ee.action_report_de_control_payslip_batch', run.ids, {})
+        return len(run.slip_ids)
+
+    def _stage_report_imss_xlsx(self, run, data):
+        self.env['ir.actions.report']._render_xlsx('nomina_cfdi_extras_ee.action_report_imss_payslip_batch', run.ids, {})
+        return len(run.slip_ids)
+
+    def _stage_report_listado_xls(self, run, data):
+        self.env['ir.actions.report']._render_xlsx('nomina_cfdi_extras_ee.action_listado_nomina_xlsx', run.ids, {})
+        return len(run.slip_ids)
+
+    def _stage_report_total_empleado_xls(self, run, data):
+        wizard = self.env['total.por.empleado'].create({'hr_payslip_run_ids': [(6, 0, run.ids)]})
+        self.env['ir.actions.report']._render_xlsx('nomina_cfdi_extras_ee.action_total_por_empleado_xlsx', wizard.ids, {})
+        return len(run.slip_ids)
+
+    def _stage_report_total_departamento_xls(self, run, data):
+        wizard = self.env['total.por.departamento'].create({'hr_payslip_run_ids': [(6, 0, run.ids)]})
+        self.env['ir.actions.report']._render_xlsx('nomina_cfdi_extras_ee.action_total_por_departamento_xlsx', wizard.ids, {})
+        return len(run.slip_ids)
+
+    def _stage_report_nominas_xls(self, run, data):
+        wizard = self.env['wizard.reporte.nomina'].create({'date_from': run.date_start, 'date_to': run.date_end})
+        self.env['ir.actions.report']._render_xlsx('nomina_cfdi_extras_ee.action_reporte_nominas_xlsx', wizard.ids, {})
+        return len(run.slip_ids)
+
+    def _stage_zip_download(self, run, data):
+        run._get_documents_zip()
+        return len(run.slip_ids)
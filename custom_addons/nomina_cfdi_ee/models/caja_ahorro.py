@@ -4,6 +4,7 @@ import pytz
 from odoo.exceptions import UserError
 from datetime import datetime, date
 from odoo import tools
+from odoo.tools import SQL
 import logging
 _logger = logging.getLogger(__name__)
 
@@ -51,46 +52,13 @@ class CajaAhorro(models.Model):
 
     @api.onchange('employee_id')
     def _compute_saldo(self):
+        saldos = self.env['caja.ahorro.saldo'].get_saldos(self.employee_id)
         for record in self:
           if record.employee_id and len(record.employee_id.contract_ids) > 0:
             contract = record.employee_id.contract_ids[0]
             if contract and record.state == 'draft':
                if contract.tablas_cfdi_id:
-                   abono = 0
-                   retiro = 0
-                   domain=[('state','=', 'done')]
-                   domain.append(('employee_id','=',record.employee_id.id))
-                   if contract.tablas_cfdi_id.caja_ahorro_abono:
-                        rules = record.env['hr.salary.rule'].search([('code', '=', contract.tablas_cfdi_id.caja_ahorro_abono.code)])
-                        payslips = record.env['hr.payslip'].search(domain)
-                        payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id in rules.ids)
-                        employees = {}
-                        for line in payslip_lines:
-                           if line.slip_id.employee_id not in employees:
-                              employees[line.slip_id.employee_id] = {line.slip_id: []}
-                           if line.slip_id not in employees[line.slip_id.employee_id]:
-                              employees[line.slip_id.employee_id].update({line.slip_id: []})
-                           employees[line.slip_id.employee_id][line.slip_id].append(line)
-                        for employee, payslips in employees.items():
-                            for payslip2,lines in payslips.items():
-                               for line in lines:
-                                  abono += line.total
-                   if contract.tablas_cfdi_id.caja_ahorro_retiro:
-                        rules = record.env['hr.salary.rule'].search([('code', '=', contract.tablas_cfdi_id.caja_ahorro_retiro.code)])
-                        payslips = record.env['hr.payslip'].search(domain)
-                        payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id in rules.ids)
-                        employees = {}
-                        for line in payslip_lines:
-                           if line.slip_id.employee_id not in employees:
-                              employees[line.slip_id.employee_id] = {line.slip_id: []}
-                           if line.slip_id not in employees[line.slip_id.employee_id]:
-                              employees[line.slip_id.employee_id].update({line.slip_id: []})
-                           employees[line.slip_id.employee_id][line.slip_id].append(line)
-                        for employee, payslips in employees.items():
-                            for payslip2,lines in payslips.items():
-                               for line in lines:
-                                  retiro += line.total
-                   record.saldo = abono - retiro
+                   record.saldo = saldos.get(record.employee_id.id, 0.0)
             else:
                return
           else:
@@ -103,7 +71,12 @@ class CajaAhorro(models.Model):
                 raise UserError(_("El importe a retirar debe ser menor o igual al saldo."))
     
     def action_validar(self):
-        self.write({'state':'done'})
+        # el retiro no se registra en el libro al validar: entra como entrada de la nómina
+        # y se descuenta con la regla de retiro de la tabla CFDI cuando la nómina pasa a
+        # hecha. Aquí solo queda fijo el saldo del libro al momento de validar.
+        saldos = self.env['caja.ahorro.saldo'].get_saldos(self.employee_id)
+        for record in self:
+            record.write({'state': 'done', 'saldo': saldos.get(record.employee_id.id, 0.0)})
         return
 
     def action_cancelar(self):
@@ -126,3 +99,128 @@ class CajaAhorro(models.Model):
         for record in self:
             if record.state == 'draft':
                 record.action_validar()
+
+
+class CajaAhorroSaldo(models.Model):
+    """ Libro de la caja / fondo de ahorro por empleado y ejercicio.
+
+        Se actualiza en forma incremental cuando una nómina pasa a hecha o deja de estarlo
+        (ver HrPayslip.write), con las reglas de abono y retiro de la tabla CFDI del contrato
+        de la nómina. El saldo de un empleado es la suma de sus ejercicios. Si cambia la
+        tabla CFDI de un contrato o las reglas de abono / retiro de una tabla, el libro de
+        los empleados afectados se rehace desde sus nóminas hechas (_reconstruir).
+    """
+    _name = 'caja.ahorro.saldo'
+    _description = 'Saldo caja de ahorro'
+    _order = 'employee_id, ejercicio'
+
+    employee_id = fields.Many2one('hr.employee', string='Empleado', required=True, index=True, ondelete='cascade')
+    ejercicio = fields.Integer('Ejercicio', required=True)
+    abono = fields.Float('Abono', readonly=True)
+    retiro = fields.Float('Retiro', readonly=True)
+    saldo = fields.Float('Saldo', readonly=True)
+
+    _sql_constraints = [
+        ('employee_ejercicio_uniq', 'unique(employee_id, ejercicio)', 'Solo puede haber un saldo por empleado y ejercicio.'),
+    ]
+
+    def init(self):
+        # primer llenado con las nóminas hechas existentes
+        self.env.cr.execute("SELECT 1 FROM caja_ahorro_saldo LIMIT 1")
+        if not self.env.cr.fetchone():
+            self.env.cr.execute("SELECT id FROM hr_payslip WHERE state = 'done'")
+            slip_ids = [row[0] for row in self.env.cr.fetchall()]
+            if slip_ids:
+                self._registrar_nominas(self.env['hr.payslip'].browse(slip_ids))
+
+    def _get_movimientos_query(self, payslip_condition):
+        """ Líneas de abono / retiro de caja de las nóminas, según la tabla CFDI del contrato. """
+        return SQL("""
+            SELECT p.employee_id, p.id AS slip_id, p.date_from, p.date_to,
+                   CASE WHEN l.code = ra.code THEN 'abono' ELSE 'retiro' END AS tipo,
+                   l.quantity * l.amount * l.rate / 100 AS total
+              FROM hr_payslip p
+              JOIN hr_contract c ON c.id = p.contract_id
+              JOIN tablas_cfdi t ON t.id = c.tablas_cfdi_id
+              LEFT JOIN hr_salary_rule ra ON ra.id = t.caja_ahorro_abono
+              LEFT JOIN hr_salary_rule rr ON rr.id = t.caja_ahorro_retiro
+              JOIN hr_payslip_line l ON l.slip_id = p.id AND l.code IN (ra.code, rr.code)
+             WHERE %s
+        """, payslip_condition)
+
+    def _flush_nominas(self):
+        self.env['hr.payslip.line'].flush_model(['slip_id', 'code', 'quantity', 'amount', 'rate'])
+        self.env['hr.payslip'].flush_model(['employee_id', 'contract_id', 'date_from', 'date_to', 'state'])
+        self.env['hr.contract'].flush_model(['tablas_cfdi_id'])
+        self.env['tablas.cfdi'].flush_model(['caja_ahorro_abono', 'caja_ahorro_retiro'])
+        self.env['hr.salary.rule'].flush_model(['code'])
+
+    @api.model
+    def _registrar_nominas(self, payslips, signo=1):
+        """ Suma (signo=1) o resta (signo=-1) al libro los abonos y retiros de las nóminas
+            con un solo INSERT ... ON CONFLICT. """
+        if not payslips:
+            return
+        self._flush_nominas()
+        self.flush_model()
+        self.env.cr.execute(SQL("""
+            INSERT INTO caja_ahorro_saldo (employee_id, ejercicio, abono, retiro, saldo,
+                                           create_uid, create_date, write_uid, write_date)
+            SELECT employee_id, EXTRACT(YEAR FROM date_to)::int,
+                   %(signo)s * SUM(CASE WHEN tipo = 'abono' THEN total ELSE 0 END),
+                   %(signo)s * SUM(CASE WHEN tipo = 'retiro' THEN total ELSE 0 END),
+                   %(signo)s * SUM(CASE WHEN tipo = 'abono' THEN total ELSE -total END),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM (%(movimientos)s) movimientos
+             GROUP BY 1, 2
+            ON CONFLICT (employee_id, ejercicio) DO UPDATE
+               SET abono = caja_ahorro_saldo.abono + EXCLUDED.abono,
+                   retiro = caja_ahorro_saldo.retiro + EXCLUDED.retiro,
+                   saldo = caja_ahorro_saldo.saldo + EXCLUDED.saldo,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, signo=signo, uid=self.env.uid,
+             movimientos=self._get_movimientos_query(SQL("p.id IN %s", tuple(payslips.ids)))))
+        self.invalidate_model(['abono', 'retiro', 'saldo', 'write_uid', 'write_date'])
+
+    @api.model
+    def _reconstruir(self, employees):
+        """ Rehace el libro de los empleados desde sus nóminas hechas. """
+        if not employees:
+            return
+        self.flush_model()
+        self.env.cr.execute(SQL("DELETE FROM caja_ahorro_saldo WHERE employee_id IN %s", tuple(employees.ids)))
+        self.invalidate_model()
+        self._registrar_nominas(self.env['hr.payslip'].search([('state', '=', 'done'),
+                                                               ('employee_id', 'in', employees.ids)]))
+
+    @api.model
+    def get_saldos(self, employees, ejercicio=None):
+        """ Saldo de la caja por empleado {employee_id: saldo}; con ejercicio solo el de ese año. """
+        domain = [('employee_id', 'in', employees.ids)]
+        if ejercicio:
+            domain.append(('ejercicio', '=', ejercicio))
+        return {employee.id: saldo for employee, saldo in self.sudo()._read_group(domain, ['employee_id'], ['saldo:sum'])}
+
+    @api.model
+    def get_movimientos(self, employees, date_from=None, date_to=None):
+        """ Abonos y retiros de nómina de varios empleados en una consulta:
+            {employee_id: [(nómina, 'abono' | 'retiro', total)]}, abonos primero. """
+        if not employees:
+            return {}
+        self._flush_nominas()
+        conditions = [SQL("p.state = 'done'"), SQL("p.employee_id IN %s", tuple(employees.ids))]
+        if date_from:
+            conditions.append(SQL("p.date_from >= %s", date_from))
+        if date_to:
+            conditions.append(SQL("p.date_to <= %s", date_to))
+        self.env.cr.execute(SQL("""
+            SELECT employee_id, slip_id, tipo, total
+              FROM (%s) movimientos
+             ORDER BY employee_id, tipo, date_from, slip_id
+        """, self._get_movimientos_query(SQL(" AND ").join(conditions))))
+        payslip_obj = self.env['hr.payslip']
+        result = {}
+        for employee_id, slip_id, tipo, total in self.env.cr.fetchall():
+            result.setdefault(employee_id, []).append((payslip_obj.browse(slip_id), tipo, total))
+        return result
@@ -67,6 +67,7 @@ class Contract(models.Model):
     deduccion_adicional_amount  = fields.Float('Monto deduccion adicional')
 
     antiguedad_anos = fields.Float('Años de antiguedad', compute='_compute_antiguedad_anos')
+    aniversario = fields.Char('Aniversario (MM-DD)', compute='_compute_aniversario', store=True, index=True)
 
     tabla_vacaciones = fields.One2many('tablas.vacaciones.line', 'form_id') 
     tipo_pago = fields.Selection(
@@ -108,6 +109,9 @@ class Contract(models.Model):
                                                 'sueldo_base_cotizacion' : contract.sueldo_base_cotizacion,
                                                 'contract_id' : contract.id, 
                                                 })
+        if 'tablas_cfdi_id' in vals:
+            # las reglas de abono / retiro de la caja salen de la tabla CFDI del contrato
+            self.env['caja.ahorro.saldo']._reconstruir(self.employee_id)
         return res
 
     @api.onchange('wage')
@@ -133,6 +137,11 @@ class Contract(models.Model):
            else:
                contract.antiguedad_anos = 0
 
+    @api.depends('date_start')
+    def _compute_aniversario(self):
+        for contract in self:
+            contract.aniversario = contract.date_start.strftime('%m-%d') if contract.date_start else False
+
     def antiguedad_to(self, contract_id, date_to):
         antiguedad = 0
         if contract_id.date_start: 
@@ -737,43 +737,20 @@ class HrPayslip(models.Model):
         return super(HrPayslip, self).copy(default=default)
 
     def _get_fondo_ahorro(self):
-        total = 0
         if self.employee_id and self.contract_id.tablas_cfdi_id:
-            abono = 0
-            retiro = 0
-            domain=[('state','=', 'done')]
-            domain.append(('employee_id','=',self.employee_id.id))
-            if self.contract_id.tablas_cfdi_id.caja_ahorro_abono:
-                        rules = self.env['hr.salary.rule'].search([('code', '=', self.contract_id.tablas_cfdi_id.caja_ahorro_abono.code)])
-                        payslips = self.env['hr.payslip'].search(domain)
-                        payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id in rules.ids)
-                        employees = {}
-                        for line in payslip_lines:
-                           if line.slip_id.employee_id not in employees:
-                              employees[line.slip_id.employee_id] = {line.slip_id: []}
-                           if line.slip_id not in employees[line.slip_id.employee_id]:
-                              employees[line.slip_id.employee_id].update({line.slip_id: []})
-                           employees[line.slip_id.employee_id][line.slip_id].append(line)
-                        for employee, payslips in employees.items():
-                            for payslip2,lines in payslips.items():
-                               for line in lines:
-                                  abono += line.total
-            if self.contract_id.tablas_cfdi_id.caja_ahorro_retiro:
-                        rules = self.env['hr.salary.rule'].search([('code', '=', self.contract_id.tablas_cfdi_id.caja_ahorro_retiro.code)])
-                        payslips = self.env['hr.payslip'].search(domain)
-                        payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id in rules.ids)
-                        employees = {}
-                        for line in payslip_lines:
-                           if line.slip_id.employee_id not in employees:
-                              employees[line.slip_id.employee_id] = {line.slip_id: []}
-                           if line.slip_id not in employees[line.slip_id.employee_id]:
-                              employees[line.slip_id.employee_id].update({line.slip_id: []})
-                           employees[line.slip_id.employee_id][line.slip_id].append(line)
-                        for employee, payslips in employees.items():
-                            for payslip2,lines in payslips.items():
-                               for line in lines:
-                                  retiro += line.total
-            self.acum_fondo_ahorro = abono - retiro
+            saldos = self.env['caja.ahorro.saldo'].get_saldos(self.employee_id)
+            self.acum_fondo_ahorro = saldos.get(self.employee_id.id, 0.0)
+
+    def write(self, vals):
+        if 'state' not in vals:
+            return super(HrPayslip, self).write(vals)
+        # libro de la caja de ahorro: entran las nóminas que pasan a hechas y salen las que dejan de estarlo
+        hechas = self.filtered(lambda x: x.state == 'done')
+        res = super(HrPayslip, self).write(vals)
+        caja = self.env['caja.ahorro.saldo']
+        caja._registrar_nominas(hechas.filtered(lambda x: x.state != 'done'), -1)
+        caja._registrar_nominas((self - hechas).filtered(lambda x: x.state == 'done'))
+        return res
 
     def acumulado_mes(self, codigo):
         total = 0
@@ -1708,7 +1685,7 @@ class HrPayslip(models.Model):
         dias_laborados =  dias_completos
         dias_falta =  dias_completos
 
-        dias_registrados = self.env['hr.payslip.worked_days'].search([('payslip_id','=',self.id)])
+        dias_registrados = self.worked_days_line_ids
         if dias_registrados:
             for dias in dias_registrados:
                 if dias.code == 'FI' or dias.code == 'FJS':
@@ -8,6 +8,7 @@ import logging
 _logger = logging.getLogger(__name__)
 from odoo.exceptions import UserError
 import io
+import zipfile
 import base64
 
 class HrPayslipRun(models.Model):
@@ -26,8 +27,12 @@ class HrPayslipRun(models.Model):
                 slip_id.action_payslip_cancel()
 
     tipo_configuracion = fields.Many2one('configuracion.nomina', string='Configuración')
-    all_payslip_generated = fields.Boolean("Payslip Generated",compute='_compute_payslip_cgdi_generated')
-    all_payslip_generated_draft = fields.Boolean("Payslip Generated draft",compute='_compute_payslip_cgdi_generated_draft')
+    all_payslip_generated = fields.Boolean("Payslip Generated", compute='_compute_slip_totals', store=True)
+    all_payslip_generated_draft = fields.Boolean("Payslip Generated draft", compute='_compute_slip_totals', store=True)
+    slip_count = fields.Integer('Nóminas', compute='_compute_slip_totals', store=True)
+    slip_draft_count = fields.Integer('Nóminas en borrador', compute='_compute_slip_totals', store=True)
+    slip_pendiente_count = fields.Integer('Nóminas sin timbrar', compute='_compute_slip_totals', store=True)
+    slip_timbrada_count = fields.Integer('Nóminas timbradas', compute='_compute_slip_totals', store=True)
     tipo_nomina = fields.Selection(
         selection=[('O', 'Nómina ordinaria'), ('E', 'Nómina extraordinaria'),], string=_('Tipo de nómina'), required=True, default='O')
     estructura = fields.Many2one('hr.payroll.structure', string='Estructura')
@@ -72,14 +77,38 @@ class HrPayslipRun(models.Model):
                    ],
         string=_('Mes / Periodo'),)
     company_cfdi = fields.Boolean(related="company_id.company_cfdi",store=True)
-    total_procesamiento = fields.Float(string='Total Nominas', compute='_compute_total_procesamiento')
-
-    def _compute_total_procesamiento(self):
+    total_procesamiento = fields.Float(string='Total Nominas', compute='_compute_slip_totals', store=True)
+
+    @api.depends('slip_ids.state', 'slip_ids.nomina_cfdi', 'slip_ids.estado_factura', 'slip_ids.total_nom')
+    def _compute_slip_totals(self):
+        # conteos y total de las nóminas de todos los procesamientos con un solo GROUP BY
+        totals = {}
+        runs = self.filtered('id')
+        if runs:
+            for run, state, estado_factura, nomina_cfdi, count, total_nom in self.env['hr.payslip']._read_group(
+                    [('payslip_run_id', 'in', runs.ids)],
+                    ['payslip_run_id', 'state', 'estado_factura', 'nomina_cfdi'],
+                    ['__count', 'total_nom:sum']):
+                vals = totals.setdefault(run.id, dict.fromkeys(
+                    ['slip_count', 'slip_draft_count', 'slip_pendiente_count', 'slip_timbrada_count', 'total_procesamiento'], 0))
+                vals['slip_count'] += count
+                if state == 'draft':
+                    vals['slip_draft_count'] += count
+                if state in ['draft', 'verify'] or not nomina_cfdi:
+                    vals['slip_pendiente_count'] += count
+                if state == 'done' and estado_factura == 'factura_correcta':
+                    vals['slip_timbrada_count'] += count
+                if state != 'cancel':
+                    vals['total_procesamiento'] += total_nom or 0.0
         for payslip_run in self:
-           payslip_run.total_procesamiento = 0
-           for payslip in payslip_run.slip_ids:
-               if payslip.state != 'cancel':
-                  payslip_run.total_procesamiento += payslip.total_nom
+            vals = totals.get(payslip_run.id, {})
+            payslip_run.slip_count = vals.get('slip_count', 0)
+            payslip_run.slip_draft_count = vals.get('slip_draft_count', 0)
+            payslip_run.slip_pendiente_count = vals.get('slip_pendiente_count', 0)
+            payslip_run.slip_timbrada_count = vals.get('slip_timbrada_count', 0)
+            payslip_run.total_procesamiento = vals.get('total_procesamiento', 0.0)
+            payslip_run.all_payslip_generated = not payslip_run.slip_pendiente_count
+            payslip_run.all_payslip_generated_draft = payslip_run.slip_draft_count == payslip_run.slip_count
 
     @api.onchange('tipo_configuracion')
     def _set_periodicidad(self):
@@ -210,25 +239,6 @@ class HrPayslipRun(models.Model):
                     payslip.compute_sheet()
         return True
      
-    @api.depends('slip_ids.state','slip_ids.nomina_cfdi')
-    def _compute_payslip_cgdi_generated(self):
-        cfdi_generated = True
-        for payslip in self.slip_ids:
-            if payslip.state in ['draft','verify'] or not payslip.nomina_cfdi:
-                cfdi_generated=False
-                break
-        self.all_payslip_generated = cfdi_generated 
-   
-    
-    @api.depends('slip_ids.state')
-    def _compute_payslip_cgdi_generated_draft(self):
-        cfdi_generated_draft = True
-        for payslip in self.slip_ids:
-            if payslip.state not in ['draft']:
-                cfdi_generated_draft=False
-                break
-        self.all_payslip_generated_draft = cfdi_generated_draft 
-       
 
     def enviar_nomina(self):
         self.ensure_one()
@@ -272,6 +282,39 @@ class HrPayslipRun(models.Model):
             'target': 'new',
         }
 
+    def _get_documents_zip(self):
+        """ Regresa el contenido del ZIP con los XML y PDF de las nóminas del procesamiento. """
+        self.ensure_one()
+        allowed_extension = ['.xml', '.pdf']
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, 'w') as zfile:
+            for slip in self.slip_ids:
+                docs = self.env['ir.attachment'].search(
+                    ['&', ('res_model', '=', 'hr.payslip'), ('res_id', '=', slip.id)])
+                pdf_create = True
+                for doc in docs:
+                    if doc.name.endswith('.pdf'):
+                       pdf_create = False
+                if pdf_create:
+                    report = self.env['ir.actions.report']._get_report_from_name('nomina_cfdi_ee.report_payslip')
+                    report_content, report_format = self.env['ir.actions.report']._render_qweb_pdf(report, [slip.id])
+                    number = slip.number.replace('/','_')
+                    factura_name = f'{number}.pdf'
+                    zfile.writestr(factura_name, report_content)
+                    self.env['ir.attachment'].sudo().create({
+                                        'name': factura_name,
+                                        'datas': base64.b64encode(report_content),
+                                        'res_model': slip._name,
+                                        'res_id': slip.id,
+                                        'type': 'binary'
+                                    })
+                for doc in docs:
+                    if any(doc.name.endswith(ext) for ext in allowed_extension):
+                        binary_stream = self.env['ir.binary']._get_stream_from(doc, 'raw')
+                        zfile.writestr(binary_stream.download_name, binary_stream.read(),
+                             compress_type=zipfile.ZIP_DEFLATED)
+        return stream.getvalue()
+
     def timbrar_nomina_wizard(self):
         self.ensure_one()
         #cr = self._cr
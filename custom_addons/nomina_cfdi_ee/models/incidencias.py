@@ -217,7 +217,7 @@ class IncidenciasNomina(models.Model):
          self.write({'state':'cancel'})
        else:
           if self.tipo_de_incidencia == 'Reingreso':
-              historial = self.env['contract.historial.salario'].search([('fecha_sueldo', '=', self.fecha)], limit=1)
+              historial = self.env['contract.historial.salario'].search([('fecha_sueldo', '=', self.fecha), ('contract_id', '=', self.contract_id.id)], limit=1)
               historial.unlink()
               employee.write({'active':False})
               if self.contract_id:
@@ -244,7 +244,7 @@ class IncidenciasNomina(models.Model):
                                          'sueldo_base_cotizacion' : self.sueldo_cotizacion_base_ant,
                                          'sueldo_hora': self.sueldo_por_horas_ant,
                                          })
-                 historial = self.env['contract.historial.salario'].search([('fecha_sueldo', '=', self.fecha)], limit=1)
+                 historial = self.env['contract.historial.salario'].search([('fecha_sueldo', '=', self.fecha), ('contract_id', '=', self.contract_id.id)], limit=1)
                  historial.unlink()
           self.write({'state':'cancel'})
 
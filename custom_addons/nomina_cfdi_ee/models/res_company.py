@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import base64
+import calendar
 import json
 import requests
 from odoo import fields, models,api, _
 from odoo.exceptions import UserError
-from datetime import datetime, timedelta
+from odoo.tools import html_escape
+from datetime import date, datetime, timedelta
 from dateutil import parser
 
 class ResCompany(models.Model):
@@ -73,113 +75,161 @@ class ResCompany(models.Model):
         self.update(values)
 
     @api.model
-    def contract_warning_mail_cron(self):
+    def _get_dias_aniversario(self, date_from, date_to):
+        """ Días 'MM-DD' del rango; en años no bisiestos el 29 de febrero va con el 28. """
+        dias = []
+        dia = date_from
+        while dia <= date_to:
+            dias.append(dia.strftime('%m-%d'))
+            if dia.month == 2 and dia.day == 28 and not calendar.isleap(dia.year):
+                dias.append('02-29')
+            dia += timedelta(days=1)
+        return dias
+
+    @api.model
+    def _get_fechas_aniversario(self, contracts, date_from, date_to):
+        """ Fecha del aniversario de cada contrato dentro del rango {contract_id: fecha};
+            en años no bisiestos el 29 de febrero va con el 28. Sólo contratos que cumplen
+            por lo menos un año en esa fecha. """
+        result = {}
+        for contract in contracts.filtered('date_start'):
+            for ano in {date_from.year, date_to.year}:
+                dia = contract.date_start.day
+                if contract.date_start.month == 2 and dia == 29 and not calendar.isleap(ano):
+                    dia = 28
+                fecha = date(ano, contract.date_start.month, dia)
+                if date_from <= fecha <= date_to and contract.date_start.year < ano:
+                    result[contract.id] = fecha
+        return result
+
+    @api.model
+    def contract_warning_mail_cron(self, fecha=None):
+        """ Aniversarios de la semana de fecha (hoy por omisión): vacaciones del año y cambio
+            de salario de todos los contratos en lote y un solo correo de resumen por
+            compañía. Los contratos se buscan por el campo indexado aniversario (MM-DD de la
+            fecha de inicio) y el año de cada uno es el de su aniversario, así en una semana
+            que cruza el año nuevo no se repiten las vacaciones. """
         companies = self.search([('nomina_mail','!=',False)])
-        cr = self._cr
-        dt = datetime.now()
-        start_week_day = (dt - timedelta(days=dt.weekday())).date()
+        if not companies:
+            return
+        today = fecha or datetime.today().date()
+        start_week_day = today - timedelta(days=today.weekday())
         end_week_day = start_week_day + timedelta(days=6)
+        contracts = self.env['hr.contract'].search([
+            ('aniversario', 'in', self._get_dias_aniversario(start_week_day, end_week_day)),
+            ('company_id', 'in', companies.ids), ('state', '=', 'open'),
+            ('date_start', '<', date(end_week_day.year, 1, 1))])
+        aniversarios = self._get_fechas_aniversario(contracts, start_week_day, end_week_day)
+        # contratos que ya tienen las vacaciones del año de su aniversario
+        otorgadas = {(line.form_id.id, line.ano) for line in self.env['tablas.vacaciones.line'].search([
+            ('form_id', 'in', list(aniversarios)),
+            ('ano', 'in', list({str(aniversario.year) for aniversario in aniversarios.values()}))])}
+        contracts = contracts.filtered(lambda x: x.id in aniversarios
+                                       and (x.id, str(aniversarios[x.id].year)) not in otorgadas)
+        if not contracts:
+            return
 
-        where_clause = []
-        while start_week_day<=end_week_day:
-            where_clause.append("TO_CHAR(date_start,'MM-DD')='%s-%s'"%("{0:0=2d}".format(start_week_day.month),"{0:0=2d}".format(start_week_day.day)))
-            start_week_day = start_week_day + timedelta(days=1) #.date()
-        where_clause = " OR ".join(where_clause)
-        
-        for company in companies:
-            cr.execute("select id from hr_contract where (%s) and company_id=%d"%(where_clause,company.id))
-            contract_ids = [r[0] for r in cr.fetchall()]
-            if not contract_ids:
-                continue
-            for contract in self.env['hr.contract'].browse(contract_ids):
-                if contract.state != 'open':
-                   continue
-                if contract.date_start.year == datetime.today().date().year:
-                   continue
-                change_done =  False
-                for vacation_line in contract.tabla_vacaciones:
-                    if str(vacation_line.ano) == str(start_week_day.year):
-                       change_done =  True
-                if not change_done:
-                   if company.nomina_mail:
-                         mail_values = {
-                         'email_to': company.nomina_mail,
-                         'subject': 'Aniversario de un empleado',
-                         'body_html': 'Esta semana es el aniversario de ' +  contract.employee_id.name + ' en la empresa, revisar ajuste en sueldo creado en incidencias.',
-                         'auto_delete': True,
-                         }
-                         mail = self.env['mail.mail'].create(mail_values)
-                         mail.send()
-                   self.calculate_contract_vacaciones(contract)
-                   self.create_cambio_salario(contract)
+        mail_values = []
+        for company, company_contracts in contracts.grouped('company_id').items():
+            empleados = ''.join('<li>%s</li>' % html_escape(contract.employee_id.name or '')
+                                for contract in company_contracts.sorted(lambda x: aniversarios[x.id]))
+            mail_values.append({
+                'email_to': company.nomina_mail,
+                'subject': 'Aniversario de empleados',
+                'body_html': '<p>Esta semana es el aniversario de los siguientes empleados en la empresa, '
+                             'revisar ajuste en sueldo creado en incidencias:</p><ul>%s</ul>' % empleados,
+                'auto_delete': True,
+            })
+        self.env['mail.mail'].create(mail_values)
+        self.calculate_contract_vacaciones(contracts, aniversarios)
+        self.create_cambio_salario(contracts, today)
         return
 
     @api.model
-    def calculate_contract_vacaciones(self, contract):
-        tablas_cfdi = contract.tablas_cfdi_id
-        if not tablas_cfdi:
-            tablas_cfdi = self.env['tablas.cfdi'].search([],limit=1)
-        if not tablas_cfdi:
-            return
-        if contract.date_start:
-            date_start = contract.date_start
-            today = datetime.today().date()
-            diff_date = today - date_start
-            years = diff_date.days /365.0
-            antiguedad_anos = round(years)
-        else:
-            antiguedad_anos = 0
-        if antiguedad_anos < 1.0:
-            tablas_cfdi_lines = tablas_cfdi.tabla_antiguedades.filtered(lambda x: x.antiguedad >= antiguedad_anos).sorted(key=lambda x:x.antiguedad)
-        else:
-            tablas_cfdi_lines = tablas_cfdi.tabla_antiguedades.filtered(lambda x: x.antiguedad <= antiguedad_anos).sorted(key=lambda x:x.antiguedad, reverse=True)
-        if not tablas_cfdi_lines:
-            return
-        tablas_cfdi_line = tablas_cfdi_lines[0]
-        today = datetime.today()
-        current_year = today.strftime('%Y')
+    def _get_lineas_antiguedad(self, contracts):
+        """ Tabla CFDI y renglones de antigüedades ordenados por contrato
+            {contract_id: (tabla, [renglones])}; sin tabla en el contrato se usa la primera. """
+        default = self.env['tablas.cfdi']
+        if contracts.filtered(lambda x: not x.tablas_cfdi_id):
+            default = self.env['tablas.cfdi'].search([],limit=1)
+        lines = {}
+        result = {}
+        for contract in contracts:
+            tablas_cfdi = contract.tablas_cfdi_id or default
+            if not tablas_cfdi:
+                continue
+            if tablas_cfdi.id not in lines:
+                lines[tablas_cfdi.id] = list(tablas_cfdi.tabla_antiguedades.sorted('antiguedad'))
+            result[contract.id] = (tablas_cfdi, lines[tablas_cfdi.id])
+        return result
+
+    @api.model
+    def _get_linea_antiguedad(self, lines, years):
+        """ Con menos de un año el primer renglón con antigüedad mayor o igual, si no el
+            último con antigüedad menor o igual. """
+        if years < 1.0:
+            return next((line for line in lines if line.antiguedad >= years), None)
+        return next((line for line in reversed(lines) if line.antiguedad <= years), None)
+
+    @api.model
+    def calculate_contract_vacaciones(self, contracts, aniversarios=None):
+        """ Agrega a los contratos los días de vacaciones del año según su antigüedad en un
+            solo create. aniversarios {contract_id: fecha} da el año y la fecha de la
+            antigüedad de cada contrato (hoy por omisión). Con vacaciones adelantadas se
+            descuentan y se reinician. """
+        today = datetime.today().date()
+        aniversarios = aniversarios or {}
         vac_adelantada = self.env['ir.config_parameter'].sudo().get_param('nomina_cfdi_extras_ee.vacaciones_adelantadas')
-        if not vac_adelantada:
-           contract.write({'tabla_vacaciones': [(0, 0, {'ano':current_year, 'dias': tablas_cfdi_line.vacaciones, 'dias_otorgados': tablas_cfdi_line.vacaciones})]})
-        else:
-           contract.write({'tabla_vacaciones': [(0, 0, {'ano':current_year, 'dias': tablas_cfdi_line.vacaciones - contract.vacaciones_adelantadas, 'dias_otorgados': tablas_cfdi_line.vacaciones})], 
-                           'vacaciones_adelantadas': 0})
-        return True
+        lineas = self._get_lineas_antiguedad(contracts)
+        vals_list = []
+        adelantadas = self.env['hr.contract']
+        for contract in contracts:
+            if contract.id not in lineas:
+                continue
+            fecha = aniversarios.get(contract.id, today)
+            antiguedad_anos = round((fecha - contract.date_start).days / 365.0) if contract.date_start else 0
+            tablas_cfdi_line = self._get_linea_antiguedad(lineas[contract.id][1], antiguedad_anos)
+            if not tablas_cfdi_line:
+                continue
+            dias = tablas_cfdi_line.vacaciones
+            if vac_adelantada:
+                dias -= contract.vacaciones_adelantadas
+                adelantadas |= contract
+            vals_list.append({'form_id': contract.id, 'ano': str(fecha.year), 'dias': dias,
+                              'dias_otorgados': tablas_cfdi_line.vacaciones})
+        lines = self.env['tablas.vacaciones.line'].create(vals_list)
+        if adelantadas:
+            adelantadas.write({'vacaciones_adelantadas': 0})
+        return lines
 
     @api.model
-    def create_cambio_salario(self, contract):
-        if contract.date_start:
-            today = datetime.today().date()
-            diff_date = (today - contract.date_start + timedelta(days=1)).days #today - date_start 
-            years = diff_date /365.0
-            tablas_cfdi = contract.tablas_cfdi_id
-            if not tablas_cfdi:
-                tablas_cfdi = self.env['tablas.cfdi'].search([],limit=1)
-            if not tablas_cfdi:
-                return
-            if years < 1.0:
-                tablas_cfdi_lines = tablas_cfdi.tabla_antiguedades.filtered(lambda x: x.antiguedad >= years).sorted(key=lambda x:x.antiguedad)
-            else:
-                tablas_cfdi_lines = tablas_cfdi.tabla_antiguedades.filtered(lambda x: x.antiguedad <= years).sorted(key=lambda x:x.antiguedad, reverse=True)
-            if not tablas_cfdi_lines:
-                return
-            tablas_cfdi_line = tablas_cfdi_lines[0]
+    def create_cambio_salario(self, contracts, fecha=None):
+        """ Crea las incidencias de cambio de salario a la fecha (hoy por omisión) con el SDI
+            de la nueva antigüedad en un solo create. """
+        today = fecha or datetime.today().date()
+        lineas = self._get_lineas_antiguedad(contracts.filtered('date_start'))
+        vals_list = []
+        for contract in contracts:
+            if contract.id not in lineas:
+                continue
+            tablas_cfdi, lines = lineas[contract.id]
+            years = (today - contract.date_start + timedelta(days=1)).days / 365.0
+            tablas_cfdi_line = self._get_linea_antiguedad(lines, years)
+            if not tablas_cfdi_line:
+                continue
             sueldo_diario_integrado = ((365 + tablas_cfdi_line.aguinaldo + (tablas_cfdi_line.vacaciones)* (tablas_cfdi_line.prima_vac/100) ) / 365) * contract.wage/tablas_cfdi.dias_mes
-            if sueldo_diario_integrado > (tablas_cfdi.uma * 25):
-                sueldo_base_cotizacion = tablas_cfdi.uma * 25
-            else:
-                sueldo_base_cotizacion = sueldo_diario_integrado
-            incidencia = self.env['incidencias.nomina'].create({'tipo_de_incidencia':'Cambio salario', 
-                                                                'employee_id': contract.employee_id.id,
-                                                                'sueldo_mensual': contract.wage,
-                                                                'sueldo_diario': contract.sueldo_diario,
-                                                                'sueldo_diario_integrado': sueldo_diario_integrado,
-                                                                'sueldo_por_horas' : contract.sueldo_hora,
-                                                                'sueldo_cotizacion_base': sueldo_base_cotizacion,
-                                                                'fecha': today,
-                                                                'contract_id': contract.id
-                                                                })
-        return
+            sueldo_base_cotizacion = min(sueldo_diario_integrado, tablas_cfdi.uma * 25)
+            vals_list.append({'tipo_de_incidencia':'Cambio salario',
+                              'employee_id': contract.employee_id.id,
+                              'sueldo_mensual': contract.wage,
+                              'sueldo_diario': contract.sueldo_diario,
+                              'sueldo_diario_integrado': sueldo_diario_integrado,
+                              'sueldo_por_horas' : contract.sueldo_hora,
+                              'sueldo_cotizacion_base': sueldo_base_cotizacion,
+                              'fecha': today,
+                              'contract_id': contract.id,
+                              })
+        return self.env['incidencias.nomina'].create(vals_list)
 
     @api.model
     def get_saldo_by_cron(self):
@@ -177,6 +177,13 @@ class TablasCFDI(models.Model):
             if self.search([('id', '!=', self.id),('name','=',self.name)]):
                 raise ValidationError(_('Reference with same name already exist.'))
             
+    def write(self, vals):
+        res = super(TablasCFDI, self).write(vals)
+        if 'caja_ahorro_abono' in vals or 'caja_ahorro_retiro' in vals:
+            contracts = self.env['hr.contract'].with_context(active_test=False).search([('tablas_cfdi_id', 'in', self.ids)])
+            self.env['caja.ahorro.saldo']._reconstruir(contracts.employee_id)
+        return res
+
     @api.returns('self', lambda value: value.id)
     def copy(self, default=None):
         default = dict(default or {})
@@ -61,7 +61,7 @@ class GeneraLiquidaciones(models.TransientModel):
 
     def calculo_create(self):
         employee = self.employee_id
-        module = self.env['ir.module.module'].sudo().search([('name','=','om_hr_payroll_account_ee')])
+        account_installed = 'om_hr_payroll_account_ee' in self.env['ir.module.module']._installed()
         if not employee:
             raise UserError("Seleccione primero al empleado.")
         payslip_batch_nm = 'Liquidacion ' + employee.name
@@ -79,7 +79,7 @@ class GeneraLiquidaciones(models.TransientModel):
                'tipo_nomina': 'E',
                'fecha_pago' : date_to,
            })
-           if module and module.state == 'installed':
+           if account_installed:
                if not self.journal_id:
                   raise UserError("Falta a agregar un diario")
                batch.update({'journal_id': self.journal_id.id})
@@ -151,7 +151,7 @@ class GeneraLiquidaciones(models.TransientModel):
             'nom_liquidacion': True,
              #'input_line_ids': [(0, 0, x) for x in payslip_vals.get('input_line_ids',[])],
             })
-        if module and module.state == 'installed':
+        if account_installed:
             if not self.journal_id:
                 raise UserError("Falta a agregar un diario")
             payslip_vals.update({'journal_id': self.journal_id.id})
@@ -184,7 +184,7 @@ class GeneraLiquidaciones(models.TransientModel):
                'nom_liquidacion': True,
                'worked_days_line_ids': worked_days2, #[(0, 0, x) for x in payslip_vals2.get('worked_days_line_ids',[])],
             })
-            if module and module.state == 'installed':
+            if account_installed:
                 if not self.journal_id:
                    raise UserError("Falta a agregar un diario")
                 payslip_vals2.update({'journal_id': self.journal_id.id})
@@ -346,41 +346,8 @@ class GeneraLiquidaciones(models.TransientModel):
             contract = record.employee_id.contract_ids[0]
             if contract:
                if contract.tablas_cfdi_id:
-                   abono = 0
-                   retiro = 0
-                   domain=[('state','=', 'done')]
-                   domain.append(('employee_id','=',record.employee_id.id))
-                   if contract.tablas_cfdi_id.caja_ahorro_abono:
-                        rules = record.env['hr.salary.rule'].sudo().search([('code', '=', contract.tablas_cfdi_id.caja_ahorro_abono.code)], limit=1)
-                        payslips = record.env['hr.payslip'].sudo().search(domain)
-                        payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id in rules.ids)
-                        employees = {}
-                        for line in payslip_lines:
-                           if line.slip_id.employee_id not in employees:
-                              employees[line.slip_id.employee_id] = {line.slip_id: []}
-                           if line.slip_id not in employees[line.slip_id.employee_id]:
-                              employees[line.slip_id.employee_id].update({line.slip_id: []})
-                           employees[line.slip_id.employee_id][line.slip_id].append(line)
-                        for employee, payslips in employees.items():
-                            for payslip2,lines in payslips.items():
-                               for line in lines:
-                                  abono += line.total
-                   if contract.tablas_cfdi_id.caja_ahorro_retiro:
-                        rules = record.env['hr.salary.rule'].sudo().search([('code', '=', contract.tablas_cfdi_id.caja_ahorro_retiro.code)], limit=1)
-                        payslips = record.env['hr.payslip'].sudo().search(domain)
-                        payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id in rules.ids)
-                        employees = {}
-                        for line in payslip_lines:
-                           if line.slip_id.employee_id not in employees:
-                              employees[line.slip_id.employee_id] = {line.slip_id: []}
-                           if line.slip_id not in employees[line.slip_id.employee_id]:
-                              employees[line.slip_id.employee_id].update({line.slip_id: []})
-                           employees[line.slip_id.employee_id][line.slip_id].append(line)
-                        for employee, payslips in employees.items():
-                            for payslip2,lines in payslips.items():
-                               for line in lines:
-                                  retiro += line.total
-                   return (abono - retiro)
+                   saldos = record.env['caja.ahorro.saldo'].get_saldos(record.employee_id)
+                   return saldos.get(record.employee_id.id, 0.0)
             else:
                return 0
           else:
@@ -168,8 +168,7 @@ class HrPayslipEmployeesExt(models.TransientModel):
                      res.update({'input_line_ids': other_inputsb,})
 
             #Compute days for attendance module
-            module = self.env['ir.module.module'].sudo().search([('name','=','hr_attendance_sheet')])
-            if module and module.state == 'installed':
+            if 'hr_attendance_sheet' in self.env['ir.module.module']._installed():
                if payslip_batch.attendance_report:
                    asistencia_lines = payslip_batch.attendance_report.mapped('attendent_sheet_ids')
                    emp_line_exist = asistencia_lines.filtered(lambda x: x.employee_id.id==employee.id)
@@ -16,6 +16,7 @@ This new module will create 2 new models: incidencias and incapacidades, they wi
     ],
     'data': [
         'data/hr_data.xml',
+        'data/hr_salary_rule_data.xml',
         'data/ir_sequence_data.xml',
        # 'data/action_report_xls.xml',
         'security/ir.model.access.csv',
@@ -49,6 +50,7 @@ This new module will create 2 new models: incidencias and incapacidades, they wi
         'wizard/importar_dias_wizard.xml',
         'report/reporte_isr_imss.xml',
         'report/reporte_de_control.xml',
+        'report/reporte_nomina_xlsx.xml',
         'report/report_payslip_nomina_x_3.xml',
         'wizard/altas_y_bajas_view.xml',
         'wizard/total_por_empleado_view.xml',
@@ -58,6 +60,11 @@ This new module will create 2 new models: incidencias and incapacidades, they wi
         'wizard/reporte_nominas.xml',
         'wizard/reporte_imss.xml',
         'wizard/wizard_isn.xml',
+        'wizard/exportar_sua_idse_view.xml',
+        'wizard/retroactivo_salario_view.xml',
+        'wizard/liquidaciones_masivas_view.xml',
+        'wizard/calculo_aguinaldo_view.xml',
+        'wizard/recalculo_sdi_view.xml',
         'views/hr_leave_type.xml',
         'wizard/nomina_liquidaciones_view.xml',
         'report/liquidaciones_report.xml',
@@ -12,3 +12,13 @@ from . import installment_line
 from . import hr_payslip
 from . import skip_installment
 from . import hr_leave_type
+from . import nomina_reporte_query
+from . import nomina_isr_anual
+from . import nomina_ptu
+from . import hr_payslip_run_total
+from . import nomina_sua
+from . import nomina_retroactivo
+from . import hr_payslip_simulacion
+from . import nomina_liquidacion
+from . import nomina_aguinaldo
+from . import nomina_recalculo_sdi
@@ -4,12 +4,7 @@ from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from calendar import monthrange
-import io
-import xlwt
-import itertools
-from odoo.tools.misc import xlwt
-import base64
+from bisect import bisect_left
 
 class employee_loan(models.Model):
     _name = 'employee.loan'
@@ -17,7 +12,6 @@ class employee_loan(models.Model):
     _order = 'name desc'
     _description = 'employee_loan'
     
-    file_data = fields.Binary("File Data")
     loan_state=[('draft','Borrador'),
                # ('request','Enviar petición'),
                # ('dep_approval','Aprobación del departamento'),
@@ -41,23 +35,34 @@ class employee_loan(models.Model):
     def nearest_date(self, items, pivot):
         return min(items, key=lambda x: abs(x - pivot))
 
+    @api.model
+    def _get_quincenas(self, date_from, date_to):
+        """ Calendario de pago quincenal (día 15 y último día de cada mes) que cubre el rango
+            con un mes de margen a cada lado. """
+        quincenas = []
+        month = date_from + relativedelta(months=-1, day=1)
+        while month <= date_to + relativedelta(months=1):
+            quincenas.append(month + relativedelta(day=15))
+            quincenas.append(month + relativedelta(day=31))
+            month += relativedelta(months=1)
+        return quincenas
+
+    @api.model
+    def _get_fecha_quincena(self, quincenas, date):
+        """ Quincena del calendario más cercana a la fecha; en empate la posterior. """
+        i = bisect_left(quincenas, date)
+        if quincenas[i] == date:
+            return date
+        anterior, siguiente = quincenas[i - 1], quincenas[i]
+        return anterior if date - anterior < siguiente - date else siguiente
+
     @api.model
     def get_quincenal_end_date(self,start_date, term):
-        for i in range(0,term):
-            if i!=0:
-                date = start_date + relativedelta(days=i*15)
-                month_last_day = monthrange(date.year,date.month)[1]
-                items = [date+relativedelta(day=month_last_day), date+relativedelta(day=15)]
-                previous_month_date = date+relativedelta(months=-1)
-                previous_month_last_day = monthrange(previous_month_date.year,previous_month_date.month)[1]
-                items.append(previous_month_date+relativedelta(day=previous_month_last_day),)
-                if date.day>15:
-                    items.append(date+relativedelta(months=1,day=15))
-                end_date = self.nearest_date(items,date)
-            else:
-                end_date = start_date
-        return end_date
-    
+        if term <= 1:
+            return start_date
+        date = start_date + relativedelta(days=(term - 1) * 15)
+        return self._get_fecha_quincena(self._get_quincenas(date, date), date)
+
     @api.depends('start_date','term')
     def _get_end_date(self):
         
@@ -131,55 +136,61 @@ class employee_loan(models.Model):
             loan.paid_amount = amt
 
     
-    def compute_installment(self):
-        vals=[]
-
-        for i in range(0,self.term):
-            date = self.start_date #datetime.strptime(self.start_date, '%Y-%m-%d')
-            
-            periodo_de_pago = self.loan_type_id.periodo_de_pago or ''
-            if periodo_de_pago=='Semanal':
-                date = date+relativedelta(weeks=i)
-            elif periodo_de_pago=='Quincenal':
-                if i!=0:
-                    date = date+relativedelta(days=i*15)
-                    month_last_day = monthrange(date.year,date.month)[1]
-                    items = [date+relativedelta(day=month_last_day), date+relativedelta(day=15)]
-                    previous_month_date = date+relativedelta(months=-1)
-                    previous_month_last_day = monthrange(previous_month_date.year,previous_month_date.month)[1]
-                    items.append(previous_month_date+relativedelta(day=previous_month_last_day),)
-                    if date.day>15:
-                        items.append(date+relativedelta(months=1,day=15))
-                    date = self.nearest_date(items,date)
-            else:
-                date = date+relativedelta(months=i)
-            
+    def _get_installment_dates(self, quincenas=None):
+        self.ensure_one()
+        periodo_de_pago = self.loan_type_id.periodo_de_pago or ''
+        start_date = self.start_date
+        if periodo_de_pago=='Semanal':
+            return [start_date + relativedelta(weeks=i) for i in range(self.term)]
+        if periodo_de_pago=='Quincenal':
+            if quincenas is None:
+                quincenas = self._get_quincenas(start_date, start_date + relativedelta(days=self.term * 15))
+            return [start_date] + [self._get_fecha_quincena(quincenas, start_date + relativedelta(days=i * 15))
+                                   for i in range(1, self.term)]
+        return [start_date + relativedelta(months=i) for i in range(self.term)]
+
+    def _get_installment_vals(self, dates):
+        """ Cuotas con interés sobre monto total o sobre saldo pendiente. """
+        self.ensure_one()
+        vals = []
+        saldo_pendiente = self.is_apply_interest and self.interest_rate and self.loan_amount and self.interest_type == 'reduce'
+        for i, date in enumerate(dates):
             amount = self.loan_amount
             interest_amount = 0.0
-            ins_interest_amount=0.0
+            ins_interest_amount = 0.0
             if self.is_apply_interest:
-                amount = self.loan_amount
-                interest_amount = (amount  * self.interest_rate)/100 #* self.term/12
-
-                if self.interest_rate and self.loan_amount and self.interest_type == 'reduce':
+                interest_amount = (amount * self.interest_rate) / 100
+                if saldo_pendiente:
                     amount = self.loan_amount - self.installment_amount * i
-                    interest_amount = (amount * self.term * self.interest_rate) / 100 # / 12
+                    interest_amount = (amount * self.term * self.interest_rate) / 100
                 ins_interest_amount = interest_amount / self.term
-            vals.append((0, 0,{
-                #'name':'INS - '+self.name+ ' - '+str(i+1),
-                'name': self.name+ ' - '+str(i+1),
-                'employee_id':self.employee_id and self.employee_id.id or False,
-                'date':date,
-                'amount':amount,
-                'interest':interest_amount,
-                'installment_amt':self.installment_amount,
-                'ins_interest':ins_interest_amount,
+            vals.append({
+                'name': self.name + ' - ' + str(i + 1),
+                'loan_id': self.id,
+                'employee_id': self.employee_id.id,
+                'date': date,
+                'amount': amount,
+                'interest': interest_amount,
+                'installment_amt': self.installment_amount,
+                'ins_interest': ins_interest_amount,
                 'tipo_deduccion': self.loan_type_id.tipo_deduccion,
-            }))
-        if self.installment_lines:
-            for l in self.installment_lines:
-                l.unlink()
-        self.installment_lines=vals
+            })
+        return vals
+
+    def compute_installment(self):
+        """ Genera las cuotas de uno o varios préstamos. El calendario quincenal se arma una
+            sola vez y las cuotas anteriores se reemplazan con un solo unlink y un solo create. """
+        quincenales = self.filtered(lambda x: x.loan_type_id.periodo_de_pago == 'Quincenal')
+        quincenas = None
+        if quincenales:
+            quincenas = self._get_quincenas(
+                min(quincenales.mapped('start_date')),
+                max(loan.start_date + relativedelta(days=loan.term * 15) for loan in quincenales))
+        vals = []
+        for loan in self:
+            vals += loan._get_installment_vals(loan._get_installment_dates(quincenas))
+        self.installment_lines.unlink()
+        self.env['installment.line'].create(vals)
 
     @api.depends('paid_amount','loan_amount')
     def get_remaing_amount(self):
@@ -242,17 +253,22 @@ class employee_loan(models.Model):
             else:
                 loan.installment_amount = 0.0
 
-    @api.constrains('employee_id')
-    def _check_loan(self):
-        now = datetime.now()
-        year = now.year
+    @api.model
+    def _get_loan_count_by_employee(self, employees):
+        """ Préstamos del año en curso por empleado {employee_id: cantidad}, con un solo GROUP BY. """
+        year = datetime.now().year
         s_date = str(year)+'-01-01'
         e_date = str(year)+'-12-01'
-        
-        loan_ids = self.search([('employee_id','=',self.employee_id.id),('date','<=',e_date),('date','>=',s_date)])
-        loan = len(loan_ids)
-        if loan > self.employee_id.loan_request:
-            raise ValidationError("Puedes crear un máximo de %s de prestamo" % self.employee_id.loan_request)
+        groups = self._read_group([('employee_id', 'in', employees.ids), ('date', '<=', e_date), ('date', '>=', s_date)],
+                                  ['employee_id'], ['__count'])
+        return {employee.id: count for employee, count in groups}
+
+    @api.constrains('employee_id')
+    def _check_loan(self):
+        loan_count = self._get_loan_count_by_employee(self.employee_id)
+        for employee in self.employee_id:
+            if loan_count.get(employee.id, 0) > employee.loan_request:
+                raise ValidationError("Puedes crear un máximo de %s de prestamo" % employee.loan_request)
 
     @api.constrains('loan_amount','term','loan_type_id','employee_id.loan_request')
     def _check_loan_amount_term(self):
@@ -417,15 +433,17 @@ class employee_loan(models.Model):
         return super(employee_loan,self).unlink()
 
     def xls_generate_for_employee_loans(self):
-        workbook = xlwt.Workbook()
-        worksheet = workbook.add_sheet('Reporte de préstamos')
-        col_width = 256 * 20
-        try:
-            for i in itertools.count():
-                worksheet.col(i).width = col_width
-        except ValueError:
-            pass
-        bold = xlwt.easyxf("font: bold on;")
+        if not self.env['employee.loan'].search_count([]):
+            return
+        # sin docids para no armar una URL con todos los ids; con 'todos' el reporte busca todos
+        # los préstamos aunque la acción se llame desde una selección (active_ids)
+        return self.env.ref('nomina_cfdi_extras_ee.action_reporte_prestamos_xlsx').report_action(
+            self.env['employee.loan'], data={'todos': True})
+
+    def _write_xlsx_report(self, workbook):
+        worksheet = workbook.add_worksheet('Reporte de préstamos')
+        worksheet.set_column(0, 9, 20)
+        bold = workbook.add_format({'bold': True})
         
         worksheet.write(0, 0, 'Numero de empleado', bold)
         worksheet.write(0, 1, 'Nombre de empleado', bold)
@@ -438,12 +456,8 @@ class employee_loan(models.Model):
         worksheet.write(0, 8, 'Cantidad a plazos', bold)
         worksheet.write(0, 9, 'Fecha de incio', bold)
         
-        employee_loans = self.env['employee.loan'].search([], order="employee_id")
-        if not employee_loans:
-            return
-        
         row = 1
-        for emp_loan in employee_loans:
+        for emp_loan in self:
             numero_de_empleado = emp_loan.employee_id.no_empleado or ''
             nombre_de_empleado = emp_loan.employee_id.name or ''
             status = 'P' if emp_loan.remaing_amount == 0 else 'N'
@@ -466,21 +480,6 @@ class employee_loan(models.Model):
             worksheet.write(row, 8, cantidad_a_plazos)
             worksheet.write(row, 9, fecha_de_incio)
             row += 1
-        
-        fp = io.BytesIO()
-        workbook.save(fp)
-        fp.seek(0)
-        data = fp.read()
-        fp.close()
-        
-        employee_loans[0].write({'file_data':base64.b64encode(data)})
-        action = {
-            'name': 'Reporte de préstamos',
-            'type': 'ir.actions.act_url',
-            'url': "/web/content/?model="+self._name+"&id=" + str(employee_loans[0].id) + "&field=file_data&download=true&filename=reporte_de_prestamos.xls",
-            'target': 'self',
-            }
-        return action
 
 
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
@@ -8,6 +8,12 @@ class hr_employee(models.Model):
 
     loan_request = fields.Integer('Solicitud del prestamo por año', default=1, required=True)
 
+    def write(self, vals):
+        res = super(hr_employee, self).write(vals)
+        if 'department_id' in vals:
+            self.env['hr.payslip.run.total'].sudo()._set_department(self, vals['department_id'])
+        return res
+
 
 class HrEmployeePublic(models.Model):
     _inherit = 'hr.employee.public'
@@ -3,43 +3,57 @@ from odoo import models, fields, api, _
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
 from odoo.tools.safe_eval import safe_eval as eval
+from collections import defaultdict
+
+# tipo_deduccion de installment.line -> (campo monto, campo interés) en la nómina
+INSTALLMENT_FIELDS = {'1': ('installment_amount', 'installment_int')}
+INSTALLMENT_FIELDS.update({
+    str(n + 1): ('descuento%s_amount' % n, 'descuento%s_int' % n) for n in range(1, 16)
+})
+
+# campos de la nómina, de sus líneas y de las reglas que cambian las filas del cubo
+# hr.payslip.run.total
+TOTALES_FIELDS = {'state', 'payslip_run_id', 'contract_id', 'employee_id'}
+TOTALES_LINEA_FIELDS = {'slip_id', 'employee_id', 'salary_rule_id', 'category_id', 'code', 'sequence',
+                        'quantity', 'amount', 'rate'}
+TOTALES_REGLA_FIELDS = {'forma_pago', 'category_id', 'fondo_ahorro_aux'}
 
 class hr_payslip(models.Model):
     _inherit = 'hr.payslip'
     
     installment_ids = fields.Many2many('installment.line',string='Pŕestamos')
-    installment_amount = fields.Float('Monto Pŕestamo',compute='get_installment_amount')
-    installment_int = fields.Float('Interés Péstamo',compute='get_installment_amount')
-    descuento1_amount = fields.Float('Monto descuento 1',compute='get_descuento1_amount')
-    descuento1_int = fields.Float('Interés descuento 1',compute='get_descuento1_amount')
-    descuento2_amount = fields.Float('Monto descuento 2',compute='get_descuento2_amount')
-    descuento2_int = fields.Float('Interés descuento 2',compute='get_descuento2_amount')
-    descuento3_amount = fields.Float('Monto descuento 3',compute='get_descuento3_amount')
-    descuento3_int = fields.Float('Interés descuento 3',compute='get_descuento3_amount')
-    descuento4_amount = fields.Float('Monto descuento 4',compute='get_descuento4_amount')
-    descuento4_int = fields.Float('Interés descuento 4',compute='get_descuento4_amount')
-    descuento5_amount = fields.Float('Monto descuento 5',compute='get_descuento5_amount')
-    descuento5_int = fields.Float('Interés descuento 5',compute='get_descuento5_amount')
-    descuento6_amount = fields.Float('Monto descuento 6',compute='get_descuento6_amount')
-    descuento6_int = fields.Float('Interés descuento 6',compute='get_descuento6_amount')
-    descuento7_amount = fields.Float('Monto descuento 7',compute='get_descuento7_amount')
-    descuento7_int = fields.Float('Interés descuento 7',compute='get_descuento7_amount')
-    descuento8_amount = fields.Float('Monto descuento 8',compute='get_descuento8_amount')
-    descuento8_int = fields.Float('Interés descuento 8',compute='get_descuento8_amount')
-    descuento9_amount = fields.Float('Monto descuento 9',compute='get_descuento9_amount')
-    descuento9_int = fields.Float('Interés descuento 9',compute='get_descuento9_amount')
-    descuento10_amount = fields.Float('Monto descuento 10',compute='get_descuento10_amount')
-    descuento10_int = fields.Float('Interés descuento 10',compute='get_descuento10_amount')
-    descuento11_amount = fields.Float('Monto descuento 11',compute='get_descuento11_amount')
-    descuento11_int = fields.Float('Interés descuento 11',compute='get_descuento11_amount')
-    descuento12_amount = fields.Float('Monto descuento 12',compute='get_descuento12_amount')
-    descuento12_int = fields.Float('Interés descuento 12',compute='get_descuento12_amount')
-    descuento13_amount = fields.Float('Monto descuento 13',compute='get_descuento13_amount')
-    descuento13_int = fields.Float('Interés descuento 13',compute='get_descuento13_amount')
-    descuento14_amount = fields.Float('Monto descuento 14',compute='get_descuento14_amount')
-    descuento14_int = fields.Float('Interés descuento 14',compute='get_descuento14_amount')
-    descuento15_amount = fields.Float('Monto descuento 15',compute='get_descuento15_amount')
-    descuento15_int = fields.Float('Interés descuento 15',compute='get_descuento15_amount')
+    installment_amount = fields.Float('Monto Pŕestamo',compute='_compute_installment_amounts')
+    installment_int = fields.Float('Interés Péstamo',compute='_compute_installment_amounts')
+    descuento1_amount = fields.Float('Monto descuento 1',compute='_compute_installment_amounts')
+    descuento1_int = fields.Float('Interés descuento 1',compute='_compute_installment_amounts')
+    descuento2_amount = fields.Float('Monto descuento 2',compute='_compute_installment_amounts')
+    descuento2_int = fields.Float('Interés descuento 2',compute='_compute_installment_amounts')
+    descuento3_amount = fields.Float('Monto descuento 3',compute='_compute_installment_amounts')
+    descuento3_int = fields.Float('Interés descuento 3',compute='_compute_installment_amounts')
+    descuento4_amount = fields.Float('Monto descuento 4',compute='_compute_installment_amounts')
+    descuento4_int = fields.Float('Interés descuento 4',compute='_compute_installment_amounts')
+    descuento5_amount = fields.Float('Monto descuento 5',compute='_compute_installment_amounts')
+    descuento5_int = fields.Float('Interés descuento 5',compute='_compute_installment_amounts')
+    descuento6_amount = fields.Float('Monto descuento 6',compute='_compute_installment_amounts')
+    descuento6_int = fields.Float('Interés descuento 6',compute='_compute_installment_amounts')
+    descuento7_amount = fields.Float('Monto descuento 7',compute='_compute_installment_amounts')
+    descuento7_int = fields.Float('Interés descuento 7',compute='_compute_installment_amounts')
+    descuento8_amount = fields.Float('Monto descuento 8',compute='_compute_installment_amounts')
+    descuento8_int = fields.Float('Interés descuento 8',compute='_compute_installment_amounts')
+    descuento9_amount = fields.Float('Monto descuento 9',compute='_compute_installment_amounts')
+    descuento9_int = fields.Float('Interés descuento 9',compute='_compute_installment_amounts')
+    descuento10_amount = fields.Float('Monto descuento 10',compute='_compute_installment_amounts')
+    descuento10_int = fields.Float('Interés descuento 10',compute='_compute_installment_amounts')
+    descuento11_amount = fields.Float('Monto descuento 11',compute='_compute_installment_amounts')
+    descuento11_int = fields.Float('Interés descuento 11',compute='_compute_installment_amounts')
+    descuento12_amount = fields.Float('Monto descuento 12',compute='_compute_installment_amounts')
+    descuento12_int = fields.Float('Interés descuento 12',compute='_compute_installment_amounts')
+    descuento13_amount = fields.Float('Monto descuento 13',compute='_compute_installment_amounts')
+    descuento13_int = fields.Float('Interés descuento 13',compute='_compute_installment_amounts')
+    descuento14_amount = fields.Float('Monto descuento 14',compute='_compute_installment_amounts')
+    descuento14_int = fields.Float('Interés descuento 14',compute='_compute_installment_amounts')
+    descuento15_amount = fields.Float('Monto descuento 15',compute='_compute_installment_amounts')
+    descuento15_int = fields.Float('Interés descuento 15',compute='_compute_installment_amounts')
     rp_dias_completos = fields.Float('dias completos', compute='get_dias_completos')
     rp_dias_laborados = fields.Float('dias laborados', compute='get_dias_laborados')
     rp_dias_periodo = fields.Float('dias periodo', compute='get_dias_periodo')
@@ -50,23 +64,12 @@ class hr_payslip(models.Model):
     rp_subsidio = fields.Float('rp_subsidio', compute='get_tablas_values')
     retardo = fields.Boolean(string=_('Retardo'), compute='_get_retardo', default = False)
 
-    
+
     def compute_sheet(self):
-        for data in self:
-          if data.concepto_periodico and data.aplicar_descuentos:
-              if data.nom_liquidacion:
-                 installment_ids = data.env['installment.line'].search(
-                      [('employee_id', '=', data.employee_id.id), ('loan_id.state', '=', 'done'),
-                       ('is_paid', '=', False)])
-              else:
-                 installment_ids = data.env['installment.line'].search(
-                      [('employee_id', '=', data.employee_id.id), ('loan_id.state', '=', 'done'),
-                       ('is_paid', '=', False),('date','<=',data.date_to)])
-              if installment_ids:
-                  data.installment_ids = [(6, 0, installment_ids.ids)]
-          else:
-              data.installment_ids = [(6, 0, [])]
-        return super(hr_payslip,self).compute_sheet()
+        self.env['installment.line']._link_payslips(self)
+        res = super(hr_payslip,self).compute_sheet()
+        self.payslip_run_id._invalidate_totales()
+        return res
     
 #    
 #    def compute_sheet(self):
@@ -79,212 +82,18 @@ class hr_payslip(models.Model):
         
 
     @api.depends('installment_ids')
-    def get_installment_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '1':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.installment_amount = amount
-            payslip.installment_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento1_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '2':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento1_amount = amount
-            payslip.descuento1_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento2_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '3':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento2_amount = amount
-            payslip.descuento2_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento3_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '4':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento3_amount = amount
-            payslip.descuento3_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento4_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '5':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento4_amount = amount
-            payslip.descuento4_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento5_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '6':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento5_amount = amount
-            payslip.descuento5_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento6_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '7':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento6_amount = amount
-            payslip.descuento6_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento7_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '8':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento7_amount = amount
-            payslip.descuento7_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento8_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '9':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento8_amount = amount
-            payslip.descuento8_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento9_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '10':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento9_amount = amount
-            payslip.descuento9_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento10_amount(self):
+    def _compute_installment_amounts(self):
+        """ Monto e interés por tipo de deducción en una sola pasada por nómina. """
         for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '11':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento10_amount = amount
-            payslip.descuento10_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento11_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '12':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento11_amount = amount
-            payslip.descuento11_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento12_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '13':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento12_amount = amount
-            payslip.descuento12_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento13_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '14':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento13_amount = amount
-            payslip.descuento13_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento14_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '15':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento14_amount = amount
-            payslip.descuento14_int = int_amount
-
-    @api.depends('installment_ids')
-    def get_descuento15_amount(self):
-        for payslip in self:
-            amount = 0
-            int_amount = 0
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                    if not installment.is_skip and installment.tipo_deduccion == '16':
-                        amount += installment.installment_amt
-                        int_amount += installment.ins_interest
-            payslip.descuento15_amount = amount
-            payslip.descuento15_int = int_amount
+            totals = dict.fromkeys(INSTALLMENT_FIELDS, (0, 0))
+            for installment in payslip.installment_ids:
+                if installment.is_skip or installment.tipo_deduccion not in totals:
+                    continue
+                amount, int_amount = totals[installment.tipo_deduccion]
+                totals[installment.tipo_deduccion] = (amount + installment.installment_amt,
+                                                      int_amount + installment.ins_interest)
+            for tipo, (amount_field, int_field) in INSTALLMENT_FIELDS.items():
+                payslip[amount_field], payslip[int_field] = totals[tipo]
 
     @api.onchange('employee_id')
     def onchange_employee(self):
@@ -307,11 +116,10 @@ class hr_payslip(models.Model):
     
     def action_payslip_done(self):
         res = super(hr_payslip, self).action_payslip_done()
-        if self.installment_ids:
-            for installment in self.installment_ids:
-                #if not installment.is_skip:
-                installment.is_paid = True
-                installment.payslip_id = self.id
+        # al confirmar el procesamiento completo las deducciones se pagan al final en un solo paso
+        if not self.env.context.get('installments_batch'):
+            self.env['installment.line']._pay_payslips(self)
+        return res
 
 #    @api.depends('installment_ids')
     def get_dias_laborados(self):
@@ -395,17 +203,26 @@ class HrPayslipRun(models.Model):
     _inherit = 'hr.payslip.run'
     
     
-    @api.depends('slip_ids.state','slip_ids.estado_factura')
+    @api.depends('slip_count', 'slip_timbrada_count')
     def _compute_show_cancelar_button(self):
         for payslip_batch in self:
-            show_button = True
-            for payslip in payslip_batch.slip_ids:
-                if payslip.state != 'done'  or payslip.estado_factura!='factura_correcta':
-                    show_button=False
-                    break
-            payslip_batch.show_cancelar_button = show_button
+            payslip_batch.show_cancelar_button = payslip_batch.slip_timbrada_count == payslip_batch.slip_count
         
-    show_cancelar_button = fields.Boolean('Show Cancelar CFDI/Payslip Button', compute='_compute_show_cancelar_button')
+    show_cancelar_button = fields.Boolean('Show Cancelar CFDI/Payslip Button', compute='_compute_show_cancelar_button', store=True)
+    
+    def _invalidate_totales(self):
+        self.env['hr.payslip.run.total']._marcar(self)
+
+    def _ensure_totales(self):
+        """ Rearma el cubo hr.payslip.run.total de los procesamientos que la transacción
+            actual ya modificó y todavía no se rearman (el resto ya está al día). """
+        self.env['hr.payslip.run.total']._build_pendientes(self)
+
+    def get_formas_pago(self):
+        """ Total en efectivo y en especie por nómina {slip_id: {'001': efectivo, '002': especie}}. """
+        totals = self.env['hr.payslip.run.total'].get_totals(self, 'slip_id', aggregates=('efectivo', 'especie'))
+        return defaultdict(lambda: {'001': 0.0, '002': 0.0}, {
+            slip_id: {'001': values['efectivo'], '002': values['especie']} for slip_id, values in totals.items()})
     
     
     def action_cancelar_cfdi(self):
@@ -417,6 +234,24 @@ class HrPayslipRun(models.Model):
     def action_cancelar_nomina(self):
         self.slip_ids.action_payslip_cancel()
         return True
+
+    def _pay_installments(self):
+        self.env['installment.line']._pay_payslips(self.slip_ids.filtered(lambda x: x.state == 'done'))
+
+    def done_payslip_run(self):
+        res = super(HrPayslipRun, self.with_context(installments_batch=True)).done_payslip_run()
+        self._pay_installments()
+        return res
+
+    def action_confirmar_nomina(self):
+        res = super(HrPayslipRun, self.with_context(installments_batch=True)).action_confirmar_nomina()
+        self._pay_installments()
+        return res
+
+    def confirmar_nomina_wizard(self):
+        res = super(HrPayslipRun, self.with_context(installments_batch=True)).confirmar_nomina_wizard()
+        self._pay_installments()
+        return res
     
     
     
@@ -441,18 +276,70 @@ class HrPayslipRun(models.Model):
 class HrPayslip(models.Model):
     _inherit = 'hr.payslip'
 
+    def write(self, vals):
+        if TOTALES_FIELDS.isdisjoint(vals):
+            return super(HrPayslip, self).write(vals)
+        # el cubo de totales se rearma en el procesamiento anterior y en el nuevo
+        runs = self.payslip_run_id
+        res = super(HrPayslip, self).write(vals)
+        (runs | self.payslip_run_id)._invalidate_totales()
+        return res
+
+    def unlink(self):
+        self.payslip_run_id._invalidate_totales()
+        return super(HrPayslip, self).unlink()
+
     def action_payslip_cancel(self):
-        for payslip in self:
-            module = self.env['ir.module.module'].sudo().search([('name','=','om_hr_payroll_account_ee')])
-            if module and module.state == 'installed':
-               moves = payslip.mapped('move_id')
-               moves.filtered(lambda x: x.state == 'posted').button_cancel()
-               payslip.write({'move_id': None})
-            payslip.write({'acum_fondo_ahorro': 0})
-            #quitar los prestamos
-            if payslip.installment_ids:
-                for installment in payslip.installment_ids:
-                   installment.is_paid = False
-                   installment.payslip_id = None
-            payslip.write({'state': 'cancel'})
+        if 'om_hr_payroll_account_ee' in self.env['ir.module.module']._installed():
+            moves = self.mapped('move_id')
+            moves.filtered(lambda x: x.state == 'posted').button_cancel()
+            self.write({'move_id': None})
+        #quitar los prestamos
+        self.env['installment.line']._unpay_payslips(self)
+        self.write({'acum_fondo_ahorro': 0, 'state': 'cancel'})
         return
+
+
+class HrPayslipLine(models.Model):
+    _inherit = 'hr.payslip.line'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super(HrPayslipLine, self).create(vals_list)
+        lines.slip_id.payslip_run_id._invalidate_totales()
+        return lines
+
+    def write(self, vals):
+        if TOTALES_LINEA_FIELDS.isdisjoint(vals):
+            return super(HrPayslipLine, self).write(vals)
+        runs = self.slip_id.payslip_run_id
+        res = super(HrPayslipLine, self).write(vals)
+        (runs | self.slip_id.payslip_run_id)._invalidate_totales()
+        return res
+
+    def unlink(self):
+        self.slip_id.payslip_run_id._invalidate_totales()
+        return super(HrPayslipLine, self).unlink()
+
+
+class HrSalaryRule(models.Model):
+    _inherit = 'hr.salary.rule'
+
+    def write(self, vals):
+        res = super(HrSalaryRule, self).write(vals)
+        # hr.payslip.line hereda de hr.salary.rule; sus cambios se marcan en HrPayslipLine
+        if self._name == 'hr.salary.rule' and not TOTALES_REGLA_FIELDS.isdisjoint(vals):
+            self.env['hr.payslip.run.total']._marcar_reglas(self)
+        return res
+
+
+class HrSalaryRuleCategory(models.Model):
+    _inherit = 'hr.salary.rule.category'
+
+    def write(self, vals):
+        res = super(HrSalaryRuleCategory, self).write(vals)
+        if 'code' in vals:
+            # category_code de las reglas define efectivo / especie en el cubo
+            self.env['hr.payslip.run.total']._marcar_reglas(
+                self.env['hr.salary.rule'].with_context(active_test=False).search([('category_id', 'in', self.ids)]))
+        return res
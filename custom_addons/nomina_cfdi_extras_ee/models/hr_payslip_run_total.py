@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+
+class HrPayslipRunTotal(models.Model):
+    """ Totales de un procesamiento por nómina y regla (cubo para los reportes).
+
+        Una fila por nómina y código con el empleado, su departamento, la secuencia y
+        categoría de la regla, el total y su parte en efectivo / especie (mismo criterio
+        que hr.payslip.get_total_code_value). Los procesamientos se marcan al calcular,
+        mover, cancelar o borrar sus nóminas, al crear, editar o borrar líneas de nómina y
+        al cambiar la forma de pago, la categoría o el fondo de ahorro de una regla (o el
+        código de su categoría), y se rearman con un solo INSERT ... SELECT antes del
+        commit de esa misma transacción; el cambio de departamento de un empleado se copia
+        a sus filas. Los reportes solo leen. El estado de la nómina no se
+        copia: los reportes filtran por slip_id.state.
+    """
+    _name = 'hr.payslip.run.total'
+    _description = 'Totales de procesamiento de nómina'
+    _order = 'payslip_run_id, sequence, code'
+
+    payslip_run_id = fields.Many2one('hr.payslip.run', 'Procesamiento', required=True, index=True, ondelete='cascade')
+    slip_id = fields.Many2one('hr.payslip', 'Nómina', required=True, index=True, ondelete='cascade')
+    employee_id = fields.Many2one('hr.employee', 'Empleado')
+    department_id = fields.Many2one('hr.department', 'Departamento')
+    salary_rule_id = fields.Many2one('hr.salary.rule', 'Regla')
+    category_id = fields.Many2one('hr.salary.rule.category', 'Categoría')
+    code = fields.Char('Código')
+    sequence = fields.Integer('Secuencia')
+    total = fields.Float('Total')
+    efectivo = fields.Float('Efectivo')
+    especie = fields.Float('Especie')
+
+    def init(self):
+        # primer llenado con los procesamientos existentes
+        self.env.cr.execute("SELECT 1 FROM hr_payslip_run_total LIMIT 1")
+        if not self.env.cr.fetchone():
+            self.env.cr.execute("SELECT DISTINCT payslip_run_id FROM hr_payslip WHERE payslip_run_id IS NOT NULL")
+            run_ids = [row[0] for row in self.env.cr.fetchall()]
+            if run_ids:
+                self._build(self.env['hr.payslip.run'].browse(run_ids))
+
+    @api.model
+    def _marcar(self, runs):
+        """ Marca los procesamientos para rearmar antes del commit de la transacción. """
+        if not runs:
+            return
+        pendientes = self.env.cr.precommit.data.get(self._name)
+        if pendientes is None:
+            pendientes = self.env.cr.precommit.data[self._name] = set()
+            self.env.cr.precommit.add(self._build_pendientes)
+        pendientes.update(runs.ids)
+
+    @api.model
+    def _marcar_reglas(self, rules):
+        """ Marca los procesamientos con líneas de las reglas. """
+        if not rules:
+            return
+        self.env['hr.payslip.line'].flush_model(['slip_id', 'salary_rule_id'])
+        self.env['hr.payslip'].flush_model(['payslip_run_id'])
+        rows = self.env.execute_query(SQL("""
+            SELECT DISTINCT p.payslip_run_id
+              FROM hr_payslip_line l
+              JOIN hr_payslip p ON p.id = l.slip_id
+             WHERE l.salary_rule_id IN %s AND p.payslip_run_id IS NOT NULL
+        """, tuple(rules.ids)))
+        self._marcar(self.env['hr.payslip.run'].browse([run_id for run_id, in rows]))
+
+    @api.model
+    def _build_pendientes(self, runs=None):
+        """ Rearma los procesamientos marcados en la transacción (solo los de runs si se indica). """
+        pendientes = self.env.cr.precommit.data.get(self._name)
+        if not pendientes:
+            return
+        run_ids = pendientes & set(runs.ids) if runs is not None else set(pendientes)
+        pendientes -= run_ids
+        self._build(self.env['hr.payslip.run'].browse(run_ids).exists())
+
+    @api.model
+    def _build(self, runs):
+        """ Rearma las filas de los procesamientos con un DELETE y un INSERT ... SELECT. """
+        if not runs:
+            return
+        for model, fnames in [
+                ('hr.payslip.line', ['slip_id', 'employee_id', 'salary_rule_id', 'category_id', 'code', 'sequence',
+                                     'quantity', 'amount', 'rate']),
+                ('hr.payslip', ['payslip_run_id']),
+                ('hr.employee', ['department_id']),
+                ('hr.salary.rule', ['forma_pago', 'category_code', 'fondo_ahorro_aux'])]:
+            self.env[model].flush_model(fnames)
+        self.env.cr.execute(SQL("DELETE FROM hr_payslip_run_total WHERE payslip_run_id IN %s", tuple(runs.ids)))
+        self.env.cr.execute(SQL("""
+            INSERT INTO hr_payslip_run_total (payslip_run_id, slip_id, employee_id, department_id, salary_rule_id,
+                                              category_id, code, sequence, total, efectivo, especie,
+                                              create_uid, create_date, write_uid, write_date)
+            SELECT p.payslip_run_id, l.slip_id, l.employee_id, e.department_id, l.salary_rule_id,
+                   l.category_id, l.code, MIN(l.sequence), SUM(t.total),
+                   SUM(CASE WHEN r.forma_pago = '001' AND r.category_code IN ('ALW', 'ALW3', 'BASIC') THEN t.total
+                            WHEN r.forma_pago = '001' AND r.category_code = 'DED' THEN -t.total
+                            WHEN r.category_code = 'AUX' AND r.fondo_ahorro_aux THEN -t.total
+                            ELSE 0 END),
+                   SUM(CASE WHEN r.forma_pago = '002' AND r.category_code IN ('ALW', 'ALW3', 'BASIC') THEN t.total
+                            WHEN r.forma_pago = '002' AND r.category_code = 'DED' THEN -t.total
+                            ELSE 0 END),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM hr_payslip_line l
+              JOIN hr_payslip p ON p.id = l.slip_id
+              LEFT JOIN hr_employee e ON e.id = l.employee_id
+              LEFT JOIN hr_salary_rule r ON r.id = l.salary_rule_id
+              CROSS JOIN LATERAL (SELECT l.quantity * l.amount * l.rate / 100 AS total) t
+             WHERE p.payslip_run_id IN %(run_ids)s
+             GROUP BY p.payslip_run_id, l.slip_id, l.employee_id, e.department_id, l.salary_rule_id, l.category_id, l.code
+        """, uid=self.env.uid, run_ids=tuple(runs.ids)))
+        self.invalidate_model()
+
+    @api.model
+    def _set_department(self, employees, department_id):
+        """ Copia el nuevo departamento de los empleados a sus filas. """
+        self.flush_model()
+        self.env.cr.execute(SQL("UPDATE hr_payslip_run_total SET department_id = %s WHERE employee_id IN %s",
+                                department_id or None, tuple(employees.ids)))
+        self.invalidate_model(['department_id'])
+
+    @api.model
+    def _get_domain(self, runs, states=None, with_category=False):
+        runs._ensure_totales()
+        domain = [('payslip_run_id', 'in', runs.ids)]
+        if states:
+            domain.append(('slip_id.state', 'in', list(states)))
+        if with_category:
+            domain.append(('category_id', '!=', False))
+        return domain
+
+    @api.model
+    def get_columns(self, runs, states=None, with_category=False):
+        """ Lista de (código, nombre de la regla) ordenada por secuencia. """
+        columns = {}
+        for sequence, code, rule in self.sudo()._read_group(
+                self._get_domain(runs, states, with_category), ['sequence', 'code', 'salary_rule_id'], order='sequence'):
+            columns.setdefault(code, rule.name)
+        return list(columns.items())
+
+    @api.model
+    def get_totals(self, runs, group_by, states=None, with_category=False, aggregates=('total',)):
+        """ Pivote {llave: {código: total}} de los procesamientos. group_by es un campo del
+            cubo ('slip_id', 'employee_id', 'department_id'); la llave es su id (False si no
+            tiene). Con aggregates distintos de total se regresa {llave: {campo: total}}. """
+        domain = self._get_domain(runs, states, with_category)
+        result = {}
+        if aggregates == ('total',):
+            for key, code, total in self.sudo()._read_group(domain, [group_by, 'code'], ['total:sum']):
+                result.setdefault(key.id, {})[code] = total
+        else:
+            for key, *totals in self.sudo()._read_group(domain, [group_by], ['%s:sum' % fname for fname in aggregates]):
+                result[key.id] = dict(zip(aggregates, totals))
+        return result
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+from datetime import date
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import groupby, split_every
+
+from .nomina_sua import IMSS_FIELDS
+
+# acumulados que compute_sheet (nomina_cfdi_ee) guarda en la nómina antes de calcular las reglas
+ACUMULADOS_MENSUAL = {
+    'acum_sueldo': 'P001',
+    'acum_per_totales': 'TPER',
+    'acum_subsidio_aplicado': 'SUB',
+    'acum_isr_antes_subem': 'ISR',
+    'acum_per_grav': 'TPERG',
+    'acum_isr': 'ISR2',
+}
+ACUMULADOS_ANUAL = {
+    'acum_subsidio_aplicado_anual': 'SUB',
+    'acum_per_grav_anual': 'TPERG',
+    'acum_isr_anual': 'ISR2',
+    'acum_dev_isr': 'O007',
+    'acum_dev_subem': 'D061',
+    'acum_dev_subem_entregado': 'D062',
+    'acum_isr_ajuste': 'D060',
+}
+ACUMULADO_PRIMA_VAC = ('acum_prima_vac_exento', 'PE010')
+
+# escenarios que se simulan juntos antes de limpiar el caché
+SIMULACION_LOTE = 500
+
+
+class HrPayslipSimulacion(models.Model):
+    """ Simulación de nóminas sin escribir en la base.
+
+        Cada escenario se arma como registro en memoria (new) con su contrato, días y
+        entradas; los acumulados mensuales / anuales y las deducciones se cargan para todo
+        el lote con consultas agrupadas y después se corren las reglas y el cálculo del
+        IMSS igual que en compute_sheet. El resultado son diccionarios simples.
+    """
+    _inherit = 'hr.payslip'
+
+    @api.model
+    def simular(self, escenarios, valores=None):
+        """ Calcula las nóminas de los escenarios sin crear registros.
+
+            Cada escenario es un diccionario con:
+              - employee_id, date_from, date_to (requeridos)
+              - contract_id: contrato a usar; por omisión el contrato abierto del periodo
+              - contract_values: cambios al contrato (p. ej. {'wage': 12000}) sin guardarlos
+              - payslip_values: valores de la nómina (dias_pagar, imss_dias, mes, tipo_nomina...)
+              - worked_days: lista de {'code', 'name', 'number_of_days', 'number_of_hours'} en
+                lugar de los días del calendario del contrato
+              - inputs: {código: monto} de otras entradas
+            valores son los valores de nómina comunes a todos los escenarios.
+
+            Regresa una lista en el mismo orden con {'employee_id', 'contract_id', 'date_from',
+            'date_to', 'lines': {código: total}, 'imss': {campo: monto}, 'total_nom', 'error'}.
+        """
+        result = []
+        for lote in split_every(SIMULACION_LOTE, escenarios, list):
+            result += self._simular_lote(lote, valores or {})
+            self.env.invalidate_all()
+        return result
+
+    @api.model
+    def _simular_contratos(self, escenarios):
+        """ Contrato de cada escenario: el indicado o el primero abierto en el periodo,
+            buscados por periodo en una sola consulta. """
+        contract_obj = self.env['hr.contract']
+        contratos = [contract_obj.browse(escenario.get('contract_id')) for escenario in escenarios]
+        faltantes = defaultdict(set)
+        for escenario, contract in zip(escenarios, contratos):
+            if not contract:
+                faltantes[(escenario['date_from'], escenario['date_to'])].add(escenario['employee_id'])
+        por_periodo = {}
+        for (date_from, date_to), employee_ids in faltantes.items():
+            for contract in contract_obj.search([
+                    ('employee_id', 'in', list(employee_ids)), ('state', '=', 'open'),
+                    ('date_start', '<=', date_to), '|', ('date_end', '=', False), ('date_end', '>=', date_from)],
+                    order='date_start desc, id desc'):
+                por_periodo.setdefault((date_from, date_to, contract.employee_id.id), contract)
+        return [contract or por_periodo.get((escenario['date_from'], escenario['date_to'], escenario['employee_id']),
+                                            contract_obj)
+                for escenario, contract in zip(escenarios, contratos)]
+
+    @api.model
+    def _simular_vals(self, escenario, contract, defaults, valores):
+        """ Valores del registro en memoria de un escenario. """
+        date_from = fields.Date.to_date(escenario['date_from'])
+        date_to = fields.Date.to_date(escenario['date_to'])
+        if escenario.get('contract_values'):
+            sim_contract = contract.new(escenario['contract_values'], origin=contract)
+        else:
+            sim_contract = contract
+
+        if escenario.get('worked_days') is not None:
+            worked_days = [dict(line, contract_id=contract.id) for line in escenario['worked_days']]
+        else:
+            worked_days = self.get_worked_day_lines(contract, date_from, date_to)
+        inputs = self.get_inputs(contract, date_from, date_to)
+        montos = dict(escenario.get('inputs') or {})
+        for line in inputs:
+            line['amount'] = montos.pop(line['code'], 0.0)
+        inputs += [{'name': code, 'code': code, 'contract_id': contract.id, 'amount': amount}
+                   for code, amount in montos.items()]
+
+        vals = dict(defaults, **valores)
+        vals.update({
+            'employee_id': escenario['employee_id'],
+            'company_id': contract.employee_id.company_id.id or self.env.company.id,
+            'contract_id': sim_contract,
+            'struct_id': valores.get('struct_id') or contract.struct_id.id,
+            'date_from': date_from,
+            'date_to': date_to,
+            'worked_days_line_ids': [(0, 0, line) for line in worked_days],
+            'input_line_ids': [(0, 0, line) for line in inputs],
+        })
+        vals.update(escenario.get('payslip_values') or {})
+        return vals
+
+    @api.model
+    def _simular_acumulados(self, payslips):
+        """ Acumulados de las nóminas en memoria (mismos criterios que _get_acumulados_*
+            de compute_sheet): una consulta por tabla / mes y otra por año. """
+        reporte_query = self.env['nomina.reporte.query']
+        payslips = payslips.filtered(lambda x: x.employee_id and x.contract_id.tablas_cfdi_id)
+
+        for (tabla, mes, extra), slips in groupby(payslips, key=lambda x: (
+                x.contract_id.tablas_cfdi_id, x.mes, x.contract_id.calc_isr_extra)):
+            mes_actual = tabla.tabla_mensual.filtered(lambda x: x.mes == mes)[:1]
+            domain = [('state', '=', 'done'), ('employee_id', 'in', [slip.employee_id.id for slip in slips])]
+            if mes_actual.dia_inicio:
+                domain.append(('date_from', '>=', mes_actual.dia_inicio))
+            if mes_actual.dia_fin:
+                domain.append(('date_to', '<=', mes_actual.dia_fin))
+            if not extra:
+                domain.append(('tipo_nomina', '=', 'O'))
+            totales = reporte_query.get_totals(domain, group_by='employee', codes=list(ACUMULADOS_MENSUAL.values()))
+            for slip in slips:
+                acumulados = totales.get(slip.employee_id.id, {})
+                slip.update({fname: acumulados.get(code, 0.0) for fname, code in ACUMULADOS_MENSUAL.items()})
+
+        prima_field, prima_code = ACUMULADO_PRIMA_VAC
+        codes = [code for code in ACUMULADOS_ANUAL.values() if code != 'ISR2'] + [prima_code]
+        for ano, slips in groupby(payslips, key=lambda x: x.date_from.year):
+            domain = [('state', '=', 'done'), ('date_from', '>=', date(ano, 1, 1)), ('date_to', '<=', date(ano, 12, 31)),
+                      ('employee_id', 'in', [slip.employee_id.id for slip in slips])]
+            totales = reporte_query.get_totals(domain, group_by='employee', codes=codes)
+            if any(slip.isr_anual for slip in slips):
+                # ISR retenido: el mayor entre ISR2 e ISR de cada nómina
+                for employee_id, acumulados in self.env['nomina.isr.anual'].get_totales(domain).items():
+                    totales.setdefault(employee_id, {})['ISR2'] = acumulados.get('ISR2', 0.0)
+            for slip in slips:
+                acumulados = totales.get(slip.employee_id.id, {})
+                vals = {prima_field: acumulados.get(prima_code, 0.0)}
+                if slip.isr_anual:
+                    vals.update({fname: acumulados.get(code, 0.0) for fname, code in ACUMULADOS_ANUAL.items()})
+                slip.update(vals)
+
+    @api.model
+    def _simular_deducciones(self, payslips):
+        """ Deducciones pendientes de cada nómina en memoria (criterio de
+            installment.line._link_payslips) con una sola búsqueda. """
+        con_descuentos = payslips.filtered(lambda x: x.concepto_periodico and x.aplicar_descuentos)
+        if not con_descuentos:
+            return
+        by_employee = defaultdict(list)
+        for installment in self.env['installment.line'].search([
+                ('employee_id', 'in', con_descuentos.employee_id.ids),
+                ('loan_id.state', '=', 'done'), ('is_paid', '=', False)]):
+            by_employee[installment.employee_id.id].append(installment.id)
+        installment_obj = self.env['installment.line']
+        for payslip in con_descuentos:
+            pending = installment_obj.browse(by_employee.get(payslip.employee_id.id, []))
+            if not payslip.nom_liquidacion:
+                pending = pending.filtered(lambda x: x.date and x.date <= payslip.date_to)
+            payslip.installment_ids = pending
+
+    @api.model
+    def _simular_resultado(self, payslip):
+        """ Reglas e IMSS de una nómina en memoria como diccionario. """
+        if payslip.company_cfdi:
+            payslip._validate_slip_fields()
+        # _ids conserva el contrato en memoria con los cambios del escenario (ids regresa el
+        # contrato guardado), así las reglas leen los mismos valores que calculo_imss
+        payslip_lines = self._get_payslip_lines(list(payslip.contract_id._ids), payslip.id)
+        rules = self.env['hr.salary.rule'].browse({line['salary_rule_id'] for line in payslip_lines})
+        en_especie = set(rules.filtered(lambda x: x.forma_pago == '002').ids)
+        lines = defaultdict(float)
+        especie = 0.0
+        for line in payslip_lines:
+            total = line['amount'] * line['quantity'] * line['rate'] / 100
+            lines[line['code']] += total
+            if line['salary_rule_id'] in en_especie:
+                especie += total
+        imss = {}
+        if payslip.company_cfdi:
+            payslip.calculo_imss()
+            imss = {fname: payslip[fname] for fname in IMSS_FIELDS}
+            if 'EFECT' in lines:
+                lines['EFECT'] -= especie
+        return {'lines': dict(lines), 'imss': imss, 'total_nom': lines.get('NET', 0.0)}
+
+    @api.model
+    def _simular_lote(self, escenarios, valores):
+        defaults = self.default_get(list(self._fields))
+        result = []
+        simulados = []
+        payslips = self.browse()
+        for escenario, contract in zip(escenarios, self._simular_contratos(escenarios)):
+            resultado = {
+                'employee_id': escenario['employee_id'],
+                'contract_id': contract.id,
+                'date_from': fields.Date.to_date(escenario['date_from']),
+                'date_to': fields.Date.to_date(escenario['date_to']),
+                'lines': {},
+                'imss': {},
+                'total_nom': 0.0,
+                'error': False,
+            }
+            result.append(resultado)
+            if not contract:
+                resultado['error'] = _('El empleado %s no tiene contrato en el periodo.') % (
+                    self.env['hr.employee'].browse(escenario['employee_id']).name)
+                continue
+            payslip = self.new(self._simular_vals(escenario, contract, defaults, valores))
+            payslips += payslip
+            simulados.append((payslip, resultado))
+
+        self._simular_acumulados(payslips.filtered('company_cfdi'))
+        self._simular_deducciones(payslips)
+        for payslip, resultado in simulados:
+            try:
+                resultado.update(self._simular_resultado(payslip))
+            except (UserError, ValidationError, ValueError) as e:
+                resultado['error'] = str(e)
+        return result
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api
+from odoo.tools import SQL
 
 class installment_line(models.Model):
     _name = 'installment.line'
@@ -51,3 +52,77 @@ class installment_line(models.Model):
                 'type': 'ir.actions.act_window',
                 
             }
+
+    # Movimientos de deducciones por lote de nóminas: una búsqueda y un UPDATE/INSERT
+    # para todas las nóminas en lugar de escribir cada cuota por separado.
+
+    @api.model
+    def _get_payslip_relation(self):
+        field = self.env['hr.payslip']._fields['installment_ids']
+        return SQL.identifier(field.relation), SQL.identifier(field.column1), SQL.identifier(field.column2)
+
+    @api.model
+    def _link_payslips(self, payslips):
+        """ Liga a cada nómina las deducciones pendientes de su empleado. Las nóminas sin
+            descuentos quedan sin deducciones; si no hay pendientes se conservan las ligadas. """
+        con_descuentos = payslips.filtered(lambda x: x.concepto_periodico and x.aplicar_descuentos)
+        installments = self.search([('employee_id', 'in', con_descuentos.employee_id.ids),
+                                    ('loan_id.state', '=', 'done'), ('is_paid', '=', False)])
+        by_employee = {}
+        for installment in installments:
+            by_employee.setdefault(installment.employee_id.id, []).append(installment)
+
+        reset_ids = (payslips - con_descuentos).ids
+        slip_ids, installment_ids = [], []
+        for payslip in con_descuentos:
+            pending = by_employee.get(payslip.employee_id.id, [])
+            if not payslip.nom_liquidacion:
+                pending = [x for x in pending if x.date and x.date <= payslip.date_to]
+            if pending:
+                reset_ids.append(payslip.id)
+                slip_ids += [payslip.id] * len(pending)
+                installment_ids += [x.id for x in pending]
+
+        payslips.flush_recordset(['installment_ids'])
+        relation, column1, column2 = self._get_payslip_relation()
+        if reset_ids:
+            self.env.cr.execute(SQL("DELETE FROM %s WHERE %s IN %s", relation, column1, tuple(reset_ids)))
+        if slip_ids:
+            self.env.cr.execute(SQL("""
+                INSERT INTO %s (%s, %s)
+                SELECT unnest(%s::int[]), unnest(%s::int[])
+                ON CONFLICT DO NOTHING
+            """, relation, column1, column2, slip_ids, installment_ids))
+        payslips.invalidate_recordset(['installment_ids'])
+        payslips.modified(['installment_ids'])
+
+    @api.model
+    def _set_paid_by_payslips(self, payslips, paid):
+        if not payslips:
+            return
+        payslips.flush_recordset(['installment_ids'])
+        self.flush_model(['is_paid', 'payslip_id'])
+        relation, column1, column2 = self._get_payslip_relation()
+        rows = self.env.execute_query(SQL("""
+            UPDATE installment_line il
+               SET is_paid = %s,
+                   payslip_id = CASE WHEN %s THEN rel.%s END,
+                   write_uid = %s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+              FROM %s rel
+             WHERE rel.%s = il.id AND rel.%s IN %s
+         RETURNING il.id
+        """, paid, paid, column1, self.env.uid, relation, column2, column1, tuple(payslips.ids)))
+        installments = self.browse([row[0] for row in rows])
+        installments.invalidate_recordset(['is_paid', 'payslip_id', 'write_uid', 'write_date'])
+        installments.modified(['is_paid', 'payslip_id'])
+
+    @api.model
+    def _pay_payslips(self, payslips):
+        """ Marca como pagadas las deducciones ligadas a las nóminas. """
+        self._set_paid_by_payslips(payslips, True)
+
+    @api.model
+    def _unpay_payslips(self, payslips):
+        """ Regresa a pendientes las deducciones ligadas a las nóminas. """
+        self._set_paid_by_payslips(payslips, False)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date, datetime, time, timedelta
+
+import babel
+
+from odoo import api, models, tools, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+from .nomina_liquidacion import DIAS_FALTAS
+
+# UMAs diarias exentas de aguinaldo (art. 93 fr. XIV LISR)
+AGUINALDO_UMAS_EXENTAS = 30
+ESTRUCTURA_AGUINALDO = 'Aguinaldo'
+
+# entradas que se agregan a las nóminas del procesamiento de aguinaldo
+AGUINALDO_INPUTS = {
+    'dias_aguinaldo': ('DAGUI', 'Días aguinaldo'),
+    'monto': ('PAGUI', 'Aguinaldo'),
+    'exento': ('PAGUI_EXE', 'Aguinaldo exento'),
+    'gravado': ('PAGUI_GRAV', 'Aguinaldo gravado'),
+}
+
+
+class NominaAguinaldo(models.AbstractModel):
+    """ Cálculo del aguinaldo del año para todos los empleados.
+
+        Los días del año de cada contrato se reducen con las faltas (FI, FJS, FR): las
+        de nóminas ordinarias hechas salen de una consulta agrupada sobre los días
+        trabajados y las ausencias aprobadas posteriores a la última nómina pagada de otra
+        sobre hr.leave. Los días por antigüedad se buscan en memoria en la tabla de
+        antigüedades y el monto se separa en exento (30 UMA) y gravado. El resultado se
+        pasa como entradas a las nóminas del procesamiento de aguinaldo.
+    """
+    _name = 'nomina.aguinaldo'
+    _description = 'Cálculo de aguinaldo'
+
+    @api.model
+    def _get_faltas_pagadas(self, employees, date_from, date_to):
+        """ Faltas en nóminas ordinarias hechas del periodo y fecha final de la última
+            nómina por empleado ({employee_id: faltas}, {employee_id: fecha}). """
+        query = self.env['hr.payslip']._search([
+            ('state', '=', 'done'), ('tipo_nomina', '=', 'O'), ('employee_id', 'in', employees.ids),
+            ('date_from', '>=', date_from), ('date_to', '<=', date_to)])
+        self.env['hr.payslip.worked_days'].flush_model(['payslip_id', 'code', 'number_of_days'])
+        self.env['hr.payslip'].flush_model(['employee_id', 'date_to'])
+        rows = self.env.execute_query(SQL("""
+            SELECT p.employee_id, MAX(p.date_to),
+                   SUM(CASE WHEN w.code IN %s THEN w.number_of_days ELSE 0 END)
+              FROM hr_payslip p
+              LEFT JOIN hr_payslip_worked_days w ON w.payslip_id = p.id
+             WHERE p.id IN %s
+             GROUP BY 1
+        """, tuple(DIAS_FALTAS), query.subselect()))
+        return ({employee_id: faltas or 0.0 for employee_id, pagado, faltas in rows},
+                {employee_id: pagado for employee_id, pagado, faltas in rows})
+
+    @api.model
+    def _get_faltas_ausencias(self, desde, date_to):
+        """ Días de ausencias aprobadas con código de falta entre el día de desde de cada
+            empleado ({employee_id: fecha}) y date_to {employee_id: días}. """
+        if not desde:
+            return {}
+        self.env['hr.leave'].flush_model(['employee_id', 'holiday_status_id', 'state',
+                                          'request_date_from', 'request_date_to'])
+        self.env['hr.leave.type'].flush_model(['code'])
+        employee_ids = list(desde)
+        rows = self.env.execute_query(SQL("""
+            SELECT l.employee_id,
+                   SUM(LEAST(l.request_date_to, %(date_to)s::date) - GREATEST(l.request_date_from, c.desde) + 1)
+              FROM hr_leave l
+              JOIN hr_leave_type t ON t.id = l.holiday_status_id
+              JOIN unnest(%(employee_ids)s::int[], %(desde)s::date[]) AS c(employee_id, desde)
+                ON c.employee_id = l.employee_id
+             WHERE l.state = 'validate' AND t.code IN %(codes)s
+               AND l.request_date_to >= c.desde AND l.request_date_from <= %(date_to)s::date
+             GROUP BY 1
+        """, date_to=date_to, employee_ids=employee_ids, desde=[desde[employee_id] for employee_id in employee_ids],
+            codes=tuple(DIAS_FALTAS)))
+        return {employee_id: dias or 0 for employee_id, dias in rows}
+
+    @api.model
+    def calcular(self, contracts, ano, fecha_corte=None):
+        """ Aguinaldo por contrato {contract_id: {...}} con días del periodo, faltas, días
+            de aguinaldo, monto, exento y gravado. fecha_corte limita el periodo (por omisión
+            el 31 de diciembre). Sin tabla CFDI o sin renglón de antigüedad el contrato se
+            regresa con el motivo en 'error'. """
+        ano = int(ano)
+        inicio_ano = date(ano, 1, 1)
+        fecha_corte = fecha_corte or date(ano, 12, 31)
+        employees = contracts.employee_id
+        faltas, pagado = self._get_faltas_pagadas(employees, inicio_ano, fecha_corte)
+        # ausencias que todavía no se pagaron en una nómina ordinaria
+        ausencias = self._get_faltas_ausencias(
+            {employee.id: (pagado.get(employee.id) or inicio_ano - timedelta(days=1)) + timedelta(days=1)
+             for employee in employees}, fecha_corte)
+        liquidacion = self.env['nomina.liquidacion']
+        antiguedades = liquidacion._get_antiguedades(contracts.tablas_cfdi_id)
+
+        result = {}
+        for contract in contracts:
+            employee = contract.employee_id
+            tabla = contract.tablas_cfdi_id
+            inicio = max(inicio_ano, contract.date_start or inicio_ano)
+            fin = min(fecha_corte, contract.date_end or fecha_corte)
+            calculo = {'employee_id': employee.id, 'error': False}
+            result[contract.id] = calculo
+            if not tabla:
+                calculo['error'] = _('El empleado %s no tiene tablas CFDI asignado en el contrato.') % employee.name
+                continue
+            if fin < inicio:
+                calculo['error'] = _('El contrato de %s no tiene días en el periodo.') % employee.name
+                continue
+            antiguedad_anos = (fin - contract.date_start).days / 365.0
+            line = liquidacion._linea_antiguedad(antiguedades, tabla, antiguedad_anos)
+            if not line:
+                calculo['error'] = _('La tabla CFDI %s no tiene antigüedades para %s años.') % (
+                    tabla.name, round(antiguedad_anos, 2))
+                continue
+
+            dias = (fin - inicio).days + 1
+            dias_faltas = min(faltas.get(employee.id, 0) + ausencias.get(employee.id, 0), dias)
+            dias_aguinaldo = line.aguinaldo * (dias - dias_faltas) / 365.0
+            monto = dias_aguinaldo * contract.sueldo_diario
+            exento = min(monto, AGUINALDO_UMAS_EXENTAS * tabla.uma)
+            calculo.update({
+                'dias': dias,
+                'faltas': dias_faltas,
+                'dias_aguinaldo': dias_aguinaldo,
+                'monto': monto,
+                'exento': exento,
+                'gravado': monto - exento,
+            })
+        return result
+
+    @api.model
+    def _get_input_vals(self, calculo, contract):
+        return [{'name': name, 'code': code, 'contract_id': contract.id, 'amount': calculo[key]}
+                for key, (code, name) in AGUINALDO_INPUTS.items()]
+
+    @api.model
+    def aplicar_en_procesamiento(self, payslip_run, ano, fecha_corte=None):
+        """ Agrega las entradas de aguinaldo a las nóminas en borrador del procesamiento.
+            Las entradas existentes con el mismo código se actualizan con un write por monto
+            y las nuevas se crean con un solo create. Regresa los errores {empleado: motivo}. """
+        payslips = payslip_run.slip_ids.filtered(lambda x: x.state == 'draft' and x.contract_id)
+        if not payslips:
+            raise UserError(_('El procesamiento %s no tiene nóminas en borrador.') % payslip_run.name)
+        calculos = self.calcular(payslips.contract_id, ano, fecha_corte)
+
+        input_obj = self.env['hr.payslip.input']
+        codes = [code for code, name in AGUINALDO_INPUTS.values()]
+        existing = {(line.payslip_id.id, line.code): line
+                    for line in input_obj.search([('payslip_id', 'in', payslips.ids), ('code', 'in', codes)])}
+        vals_list = []
+        to_write = {}
+        errores = {}
+        for payslip in payslips:
+            calculo = calculos[payslip.contract_id.id]
+            if calculo['error']:
+                errores[payslip.employee_id] = calculo['error']
+                continue
+            for vals in self._get_input_vals(calculo, payslip.contract_id):
+                line = existing.get((payslip.id, vals['code']))
+                if line:
+                    to_write.setdefault(vals['amount'], []).append(line.id)
+                else:
+                    vals_list.append(dict(vals, payslip_id=payslip.id))
+        # un write por cada monto distinto (los días y el exento suelen repetirse)
+        for amount, line_ids in to_write.items():
+            input_obj.browse(line_ids).write({'amount': amount})
+        input_obj.create(vals_list)
+        return errores
+
+    @api.model
+    def generar_procesamiento(self, employees, ano, fecha_pago, fecha_corte=None):
+        """ Crea el procesamiento de aguinaldo con las nóminas de los empleados en un solo
+            create. Los días y las entradas se toman del cálculo, sin calcular los días
+            trabajados del año por empleado. Regresa (procesamiento, {empleado: motivo}). """
+        contracts = employees.contract_id
+        calculos = self.calcular(contracts, ano, fecha_corte)
+        ano = int(ano)
+        batch = self.env['hr.payslip.run'].create({
+            'name': 'Aguinaldo ' + str(ano),
+            'date_start': date(ano, 1, 1),
+            'date_end': fecha_corte or date(ano, 12, 31),
+            'periodicidad_pago': '99',
+            'tipo_nomina': 'E',
+            'fecha_pago': fecha_pago,
+        })
+        structure = self.env['hr.payroll.structure'].search([('name', '=', ESTRUCTURA_AGUINALDO)], limit=1)
+        if structure:
+            batch.estructura = structure
+        locale = self.env.context.get('lang') or 'en_US'
+        periodo = tools.ustr(babel.dates.format_date(date=datetime.combine(fecha_pago, time.min), format='MMMM-y', locale=locale))
+
+        vals_list = []
+        errores = {}
+        for contract in contracts:
+            employee = contract.employee_id
+            calculo = calculos[contract.id]
+            if calculo['error']:
+                errores[employee] = calculo['error']
+                continue
+            vals_list.append({
+                'name': _('Salary Slip of %s for %s') % (employee.name, periodo),
+                'company_id': employee.company_id.id,
+                'employee_id': employee.id,
+                'tipo_nomina': 'E',
+                'input_line_ids': [(0, 0, vals) for vals in self._get_input_vals(calculo, contract)],
+                'worked_days_line_ids': [(0, 0, {'name': 'Dias a pagar', 'code': 'WORK100', 'contract_id': contract.id,
+                                                 'number_of_days': calculo['dias'] - calculo['faltas']})],
+                'payslip_run_id': batch.id,
+                'date_from': date(ano, 1, 1),
+                'date_to': fecha_corte or date(ano, 12, 31),
+                'contract_id': contract.id,
+                'dias_pagar': 1,
+                'fecha_pago': fecha_pago,
+                'struct_id': structure.id or contract.struct_id.id,
+            })
+        self.env['hr.payslip'].create(vals_list)
+        return batch, errores
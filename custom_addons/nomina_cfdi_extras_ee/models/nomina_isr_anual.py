@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_right
+from datetime import date
+
+from odoo import api, models, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+ISR_ANUAL_CODES = ['TPERG', 'ISR', 'ISR2', 'SUB', 'O007', 'D060', 'D061', 'D062', 'PQ039', 'PS039']
+
+# entradas que se agregan a las nóminas del procesamiento de diciembre
+ISR_ANUAL_INPUTS = {
+    'ISR a cargo': ('D060', 'Ajuste ISR anual'),
+    'ISR a favor': ('O007', 'Devolución ISR anual'),
+}
+
+
+class NominaIsrAnual(models.AbstractModel):
+    """ Cálculo anual del ISR (art. 152 LISR).
+
+        Los acumulados del año por empleado se obtienen con una sola consulta; el ISR
+        retenido de cada nómina es el mayor entre ISR2 e ISR (antes de subsidio) de esa
+        misma nómina. La tarifa anual se lee una vez y se busca en memoria por límite inferior.
+    """
+    _name = 'nomina.isr.anual'
+    _description = 'Cálculo del ISR anual'
+
+    @api.model
+    def get_payslip_domain(self, ano, employee_ids=None, department_ids=None):
+        return self.env['nomina.reporte.query'].get_payslip_domain(
+            date_from=date(int(ano), 1, 1), date_to=date(int(ano), 12, 31),
+            employee_ids=employee_ids, department_ids=department_ids, states=['done'],
+            date_field_from='date_to', date_field_to='date_to')
+
+    @api.model
+    def get_totales(self, domain):
+        """ Acumulados {employee_id: {código: total}} de las nóminas del dominio. """
+        conditions = self.env['nomina.reporte.query']._get_line_conditions(domain, ISR_ANUAL_CODES)
+        rows = self.env.execute_query(SQL("""
+            WITH por_nomina AS (
+                SELECT l.slip_id, l.employee_id, l.code, SUM(l.quantity * l.amount * l.rate / 100) AS total
+                  FROM hr_payslip_line l
+                 WHERE %s
+                 GROUP BY 1, 2, 3
+            )
+            SELECT n.employee_id, n.code,
+                   SUM(CASE WHEN n.code = 'ISR2' THEN GREATEST(n.total, COALESCE(i.total, 0)) ELSE n.total END)
+              FROM por_nomina n
+              LEFT JOIN por_nomina i ON n.code = 'ISR2' AND i.slip_id = n.slip_id AND i.code = 'ISR'
+             GROUP BY 1, 2
+        """, conditions))
+        totales = {}
+        for employee_id, code, total in rows:
+            totales.setdefault(employee_id, {})[code] = total or 0.0
+        return totales
+
+    @api.model
+    def _get_tarifa(self, tablas):
+        """ Tarifa anual de la tabla CFDI como listas paralelas ordenadas por límite inferior. """
+        lines = tablas.tabla_ISR_anual.sorted('lim_inf')
+        return lines.mapped('lim_inf'), [(line.lim_inf, line.c_fija, line.s_excedente) for line in lines]
+
+    @api.model
+    def _impuesto(self, tarifa, base):
+        limites, renglones = tarifa
+        index = bisect_right(limites, base) - 1
+        if index < 0:
+            return 0
+        limite_inferior, cuota_fija, porcentaje_sobre_excedente = renglones[index]
+        return (base - limite_inferior) * porcentaje_sobre_excedente / 100 + cuota_fija
+
+    @api.model
+    def calcular(self, totales, tablas):
+        """ Cálculo anual por empleado a partir de los acumulados de get_totales.
+            Sin tabla CFDI el impuesto se toma en cero. """
+        tarifa = self._get_tarifa(tablas) if tablas else ([], [])
+        result = {}
+        for employee_id, acumulados in totales.items():
+            acum_per_grav_anual = acumulados.get('TPERG', 0)
+            calculo = {
+                'Ingr. gravable': acum_per_grav_anual,
+                'Impuesto': self._impuesto(tarifa, acum_per_grav_anual),
+                'ISR acum': acumulados.get('ISR2', 0) + acumulados.get('D060', 0) - acumulados.get('O007', 0),
+                'Acum SE apl': acumulados.get('SUB', 0) - acumulados.get('D061', 0),
+            }
+            calculo['Exc. SE'] = max(calculo['Acum SE apl'] - calculo['Impuesto'], 0)
+            calculo['ISR a favor'] = max(calculo['ISR acum'] - calculo['Impuesto'], 0)
+            calculo['ISR a cargo'] = max(calculo['Impuesto'] - calculo['ISR acum'], 0)
+            result[employee_id] = calculo
+        return result
+
+    @api.model
+    def aplicar_en_procesamiento(self, payslip_run, ano, tablas=None):
+        """ Agrega a cada nómina del procesamiento las entradas de ISR a cargo / a favor del
+            cálculo anual. Sin tabla se usa la de la tabla CFDI del contrato de cada nómina.
+            Las entradas existentes con el mismo código se actualizan. """
+        payslips = payslip_run.slip_ids.filtered(lambda x: x.state == 'draft')
+        if not payslips:
+            raise UserError(_('El procesamiento %s no tiene nóminas en borrador.') % payslip_run.name)
+        totales = self.get_totales(self.get_payslip_domain(ano, employee_ids=payslips.employee_id.ids))
+
+        calculos = {}
+        for tabla, slips in payslips.grouped(lambda x: tablas or x.contract_id.tablas_cfdi_id).items():
+            if not tabla:
+                raise UserError(_('El empleado %s no tiene tablas CFDI asignado en el contrato.') % slips[0].employee_id.name)
+            employee_ids = set(slips.employee_id.ids)
+            calculos.update(self.calcular(
+                {employee_id: acumulados for employee_id, acumulados in totales.items() if employee_id in employee_ids}, tabla))
+
+        input_obj = self.env['hr.payslip.input']
+        codes = [code for code, name in ISR_ANUAL_INPUTS.values()]
+        existing = {(line.payslip_id.id, line.code): line
+                    for line in input_obj.search([('payslip_id', 'in', payslips.ids), ('code', 'in', codes)])}
+        vals_list = []
+        for payslip in payslips:
+            calculo = calculos.get(payslip.employee_id.id, {})
+            for concepto, (code, name) in ISR_ANUAL_INPUTS.items():
+                amount = calculo.get(concepto, 0)
+                line = existing.get((payslip.id, code))
+                if line:
+                    line.amount = amount
+                elif amount:
+                    vals_list.append({'payslip_id': payslip.id, 'contract_id': payslip.contract_id.id,
+                                      'code': code, 'name': name, 'amount': amount})
+        input_obj.create(vals_list)
+        return calculos
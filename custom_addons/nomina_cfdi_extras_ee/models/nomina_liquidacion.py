@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+
+import babel
+
+from odoo import api, models, tools, _
+from odoo.exceptions import UserError
+
+# días que no se descuentan de los días pendientes de pagar (calculo.liquidaciones)
+DIAS_NO_DESCONTAR = ['WORK100', 'DFES', 'DFES_3', 'SEPT']
+DIAS_FALTAS = ['FI', 'FJS', 'FR']
+ESTRUCTURA_FINIQUITO = 'Liquidación - indemnizacion/finiquito'
+
+
+class NominaLiquidacion(models.AbstractModel):
+    """ Liquidaciones / finiquitos de varios empleados (cierres o bajas masivas).
+
+        Mismo cálculo que el asistente calculo.liquidaciones de nomina_cfdi_ee, pero con
+        los datos de todos los empleados cargados de una vez: última nómina por empleado
+        con un solo _read_group, tablas de antigüedades leídas una vez por tabla CFDI y
+        buscadas en memoria, saldos de caja de ahorro en una consulta y la estructura de
+        finiquito por compañía en una búsqueda. Las nóminas de todos los empleados se
+        crean en un solo procesamiento con un solo create.
+    """
+    _name = 'nomina.liquidacion'
+    _description = 'Liquidaciones masivas'
+
+    @api.model
+    def _get_fechas_inicio(self, employees):
+        """ Día siguiente a la última nómina de cada empleado {employee_id: fecha}. """
+        return {employee.id: date_to + timedelta(days=1)
+                for employee, date_to in self.env['hr.payslip'].sudo()._read_group(
+                    [('employee_id', 'in', employees.ids)], ['employee_id'], ['date_to:max']) if date_to}
+
+    @api.model
+    def _get_antiguedades(self, tablas):
+        """ Renglones de antigüedades por tabla CFDI ordenados {tabla_id: (antigüedades, renglones)}. """
+        result = {}
+        for tabla in tablas:
+            lines = tabla.tabla_antiguedades.sorted('antiguedad')
+            result[tabla.id] = (lines.mapped('antiguedad'), lines)
+        return result
+
+    @api.model
+    def _linea_antiguedad(self, antiguedades, tabla, anos):
+        """ Renglón con la mayor antigüedad <= años + 1 (mismo criterio que calculo.liquidaciones). """
+        limites, lines = antiguedades.get(tabla.id, ([], []))
+        index = bisect_right(limites, anos + 1) - 1
+        return lines[index] if index >= 0 else None
+
+    @api.model
+    def calcular(self, contracts, opciones):
+        """ Conceptos de liquidación por contrato, en el orden de contracts.
+
+            opciones: fecha_liquidacion, tipo_de_baja, sueldo_calculo ('01' sueldo diario,
+            '02' SDI), indemnizacion, dias_base, dias_x_ano, antiguedad, tope_prima ('01'
+            salario mínimo, '02' UMA), round_antiguedad, pago_separacion y fechas_inicio
+            opcional {employee_id: fecha}. Sin fecha de inicio se usa el día siguiente a la
+            última nómina del empleado. Los contratos que no se pueden calcular se regresan
+            con el motivo en 'error'.
+        """
+        fecha_liquidacion = opciones['fecha_liquidacion']
+        fechas_inicio = dict(self._get_fechas_inicio(contracts.employee_id), **(opciones.get('fechas_inicio') or {}))
+        antiguedades = self._get_antiguedades(contracts.tablas_cfdi_id)
+        saldos = self.env['caja.ahorro.saldo'].get_saldos(contracts.employee_id)
+        payslip_obj = self.env['hr.payslip']
+
+        result = []
+        for contract in contracts:
+            employee = contract.employee_id
+            tabla = contract.tablas_cfdi_id
+            calculo = {
+                'employee_id': employee.id,
+                'contract_id': contract.id,
+                'fecha_inicio': fechas_inicio.get(employee.id) or contract.date_start,
+                'pago_separacion': opciones.get('pago_separacion', 0.0),
+                'error': False,
+            }
+            result.append(calculo)
+            if not tabla:
+                calculo['error'] = _('El empleado %s no tiene tablas CFDI asignado en el contrato.') % employee.name
+                continue
+            if not contract.date_start or contract.date_start > fecha_liquidacion:
+                calculo['error'] = _('El contrato de %s empieza después de la fecha de liquidación.') % employee.name
+                continue
+
+            # indemnización y prima de antigüedad
+            antiguedad_anos = (fecha_liquidacion - contract.date_start).days / 365.0
+            if opciones.get('sueldo_calculo') == '02':
+                sueldo = contract.calculate_sueldo_diario_integrado() or 0.0
+            else:
+                sueldo = contract.sueldo_diario
+            dias_totales = antiguedad_anos * opciones.get('dias_x_ano', 0) + opciones.get('dias_base', 0) \
+                if opciones.get('indemnizacion') else 0
+            monto_prima_antiguedad = 0
+            if opciones.get('antiguedad'):
+                anos = round(antiguedad_anos) if opciones.get('round_antiguedad') else round(antiguedad_anos, 2)
+                tope = tabla.salario_minimo if opciones.get('tope_prima') == '01' else tabla.uma
+                if sueldo > 2 * tabla.salario_minimo:
+                    monto_prima_antiguedad = anos * 12 * tope * 2
+                else:
+                    monto_prima_antiguedad = anos * 12 * sueldo
+
+            line = self._linea_antiguedad(antiguedades, tabla, antiguedad_anos)
+            if not line:
+                calculo['error'] = _('La tabla CFDI %s no tiene antigüedades para %s años.') % (
+                    tabla.name, round(antiguedad_anos, 2))
+                continue
+
+            # aguinaldo proporcional del año menos faltas
+            if contract.date_start.year < fecha_liquidacion.year:
+                inicio_aguinaldo = date(fecha_liquidacion.year, 1, 1)
+            else:
+                inicio_aguinaldo = contract.date_start
+            dias_faltas = sum(dias['number_of_days'] for dias in payslip_obj.get_worked_day_lines(
+                contract, inicio_aguinaldo, fecha_liquidacion) if dias['code'] in DIAS_FALTAS)
+            dias_aguinaldo = line.aguinaldo * ((fecha_liquidacion - inicio_aguinaldo).days + 1 - dias_faltas) / 365.0
+
+            # vacaciones desde el último aniversario más las pendientes del contrato
+            date_start = contract.date_start
+            if date_start.day == 29 and date_start.month == 2:
+                date_start -= timedelta(days=1)
+            aniversario = date_start.replace(fecha_liquidacion.year)
+            if fecha_liquidacion <= aniversario:
+                aniversario = date_start.replace(fecha_liquidacion.year - 1)
+            dias_vacaciones = ((fecha_liquidacion - aniversario).days + 1) / 365.0 * line.vacaciones
+            dias_pri_vac = dias_vacaciones
+            dias_vacaciones += sum(contract.tabla_vacaciones.mapped('dias'))
+            if contract.tipo_prima_vacacional == '02':
+                dias_pri_vac = dias_vacaciones
+
+            calculo.update({
+                'antiguedad_anos': antiguedad_anos,
+                'sueldo_calculo_monto': sueldo,
+                'dias_totales': dias_totales,
+                'monto_indemnizacion': dias_totales * sueldo,
+                'monto_prima_antiguedad': monto_prima_antiguedad,
+                'dias_pendientes_pagar': (fecha_liquidacion - calculo['fecha_inicio']).days + 1,
+                'dias_aguinaldo': dias_aguinaldo,
+                'dias_vacaciones': dias_vacaciones,
+                'dias_prima_vac': dias_pri_vac * line.prima_vac / 100.0,
+                'fondo_ahorro': saldos.get(employee.id, 0.0),
+            })
+        return result
+
+    @api.model
+    def _get_worked_days(self, contract, calculo, fecha_liquidacion):
+        """ Días de la nómina ordinaria de liquidación (mismo armado que calculo_create). """
+        dias_pendientes = calculo['dias_pendientes_pagar']
+        worked_days = []
+        for line in self.env['hr.payslip'].get_worked_day_lines(contract, calculo['fecha_inicio'], fecha_liquidacion):
+            if line['code'] not in ('WORK100', 'SEPT'):
+                worked_days.append((0, 0, line))
+            if line['code'] not in DIAS_NO_DESCONTAR:
+                dias_pendientes = max(dias_pendientes - line['number_of_days'], 0)
+
+        for name, code, field in [('Dias aguinaldo', 'AGUI', 'dias_aguinaldo'),
+                                  ('Dias vacaciones', 'VAC', 'dias_vacaciones'),
+                                  ('Prima vacacional', 'PVC', 'dias_prima_vac')]:
+            worked_days.append((0, 0, {'name': name, 'code': code, 'contract_id': contract.id,
+                                       'number_of_days': calculo[field]}))
+        if contract.periodicidad_pago == '02' and contract.sept_dia:
+            if contract.semana_inglesa:
+                dias_pendientes -= 2
+                septimo = dias_pendientes / 5
+            else:
+                dias_pendientes -= 1
+                septimo = dias_pendientes / 6
+            worked_days.append((0, 0, {'name': 'Dias a pagar', 'code': 'WORK100', 'contract_id': contract.id,
+                                       'number_of_days': dias_pendientes}))
+            worked_days.append((0, 0, {'name': 'Septimo día', 'code': 'SEPT', 'contract_id': contract.id,
+                                       'number_of_days': septimo}))
+        else:
+            worked_days.append((0, 0, {'name': 'Dias a pagar', 'code': 'WORK100', 'contract_id': contract.id,
+                                       'number_of_days': dias_pendientes}))
+        return worked_days, dias_pendientes
+
+    @api.model
+    def generar(self, calculos, opciones):
+        """ Crea las nóminas de liquidación de los cálculos sin error en un procesamiento.
+
+            Por empleado se crea la nómina ordinaria (días pendientes, aguinaldo, vacaciones,
+            prima vacacional y fondo de ahorro) y, si el tipo de baja es '02', la
+            extraordinaria con prima de antigüedad, indemnización y pago por separación.
+            opciones además de las de calcular: payslip_run_id, estructura (id) y journal_id.
+        """
+        calculos = [calculo for calculo in calculos if not calculo.get('error')]
+        if not calculos:
+            raise UserError(_('No hay liquidaciones calculadas para generar.'))
+        fecha_liquidacion = opciones['fecha_liquidacion']
+        contracts = self.env['hr.contract'].browse([calculo['contract_id'] for calculo in calculos])
+        account_installed = 'om_hr_payroll_account_ee' in self.env['ir.module.module']._installed()
+        if account_installed and not opciones.get('journal_id'):
+            raise UserError(_('Falta a agregar un diario'))
+
+        batch = self.env['hr.payslip.run'].browse(opciones.get('payslip_run_id'))
+        if not batch:
+            # con contratos de distinta periodicidad el procesamiento va como 'Otra periodicidad'
+            periodicidades = set(contracts.mapped('periodicidad_pago'))
+            batch = self.env['hr.payslip.run'].create({
+                'name': _('Liquidaciones %s') % fecha_liquidacion.strftime('%d/%m/%Y'),
+                'date_start': min(calculo['fecha_inicio'] for calculo in calculos),
+                'date_end': fecha_liquidacion,
+                'periodicidad_pago': periodicidades.pop() if len(periodicidades) == 1 else '99',
+                'tipo_nomina': 'E',
+                'fecha_pago': fecha_liquidacion,
+            })
+            if account_installed:
+                batch.journal_id = opciones['journal_id']
+
+        finiquito = {}
+        if opciones.get('tipo_de_baja') == '02':
+            for structure in self.env['hr.payroll.structure'].sudo().search([
+                    ('name', '=', ESTRUCTURA_FINIQUITO), ('company_id', 'in', contracts.employee_id.company_id.ids)]):
+                finiquito.setdefault(structure.company_id.id, structure)
+
+        locale = self.env.context.get('lang') or 'en_US'
+        periodo = tools.ustr(babel.dates.format_date(
+            date=datetime.combine(fecha_liquidacion, time.min), format='MMMM-y', locale=locale))
+        vals_list = []
+        for calculo, contract in zip(calculos, contracts):
+            employee = contract.employee_id
+            worked_days, dias_pendientes = self._get_worked_days(contract, calculo, fecha_liquidacion)
+            common = {
+                'name': _('Salary Slip of %s for %s') % (employee.name, periodo),
+                'company_id': employee.company_id.id,
+                'employee_id': employee.id,
+                'contract_id': contract.id,
+                'payslip_run_id': batch.id,
+                'date_from': calculo['fecha_inicio'],
+                'date_to': fecha_liquidacion,
+                'fecha_pago': fecha_liquidacion,
+                'nom_liquidacion': True,
+            }
+            if account_installed:
+                common['journal_id'] = opciones['journal_id']
+            vals_list.append(dict(common, **{
+                'struct_id': opciones.get('estructura') or contract.struct_id.id,
+                'tipo_nomina': 'O',
+                'worked_days_line_ids': worked_days,
+                'input_line_ids': [(0, 0, {'name': 'Fondo ahorro', 'code': 'PFA', 'contract_id': contract.id,
+                                           'amount': calculo['fondo_ahorro']})],
+                'mes': str(fecha_liquidacion.month).zfill(2),
+                'dias_pagar': dias_pendientes or 1,
+                'imss_dias': dias_pendientes,
+            }))
+            if opciones.get('tipo_de_baja') == '02':
+                structure = finiquito.get(employee.company_id.id)
+                vals_list.append(dict(common, **{
+                    'struct_id': structure.id if structure else contract.struct_id.id,
+                    'tipo_nomina': 'E',
+                    'worked_days_line_ids': [(0, 0, {'name': 'Dias a pagar', 'code': 'WORK100',
+                                                     'contract_id': contract.id, 'number_of_days': 0})],
+                    'input_line_ids': [
+                        (0, 0, {'name': 'Prima antiguedad', 'code': 'PDA', 'contract_id': contract.id,
+                                'amount': calculo['monto_prima_antiguedad']}),
+                        (0, 0, {'name': 'Indemnizacion', 'code': 'IND', 'contract_id': contract.id,
+                                'amount': calculo['monto_indemnizacion']}),
+                        (0, 0, {'name': 'Pago por separacion', 'code': 'PPS', 'contract_id': contract.id,
+                                'amount': calculo['pago_separacion']}),
+                    ],
+                    'dias_pagar': 1,
+                }))
+        self.env['hr.payslip'].create(vals_list)
+        return batch
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date, datetime, time
+
+import babel
+
+from odoo import api, models, tools, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+PTU_DIAS_CODES = ['WORK100', 'VAC', 'FJC', 'SEPT']
+
+
+class NominaPtu(models.AbstractModel):
+    """ Cálculo del reparto de utilidades (PTU) de un año.
+
+        La mitad del monto se reparte en proporción a lo pagado (NET) y la otra mitad en
+        proporción a los días laborados en nóminas ordinarias, ambos del régimen de sueldos
+        y salarios. Los acumulados por empleado salen de dos consultas agrupadas.
+    """
+    _name = 'nomina.ptu'
+    _description = 'Reparto de utilidades'
+
+    @api.model
+    def _get_payslip_domain(self, ano, ordinarias=False):
+        domain = [('state', '=', 'done'), ('date_from', '>=', date(ano, 1, 1)), ('date_from', '<=', date(ano, 12, 31)),
+                  ('employee_id.regimen', '=', '02')]
+        if ordinarias:
+            domain.append(('tipo_nomina', '=', 'O'))
+        return domain
+
+    @api.model
+    def get_totales(self, ano):
+        """ Regresa ({employee_id: NET del año}, {employee_id: días laborados del año}). """
+        totals = self.env['nomina.reporte.query'].get_totals(self._get_payslip_domain(ano), group_by='employee', codes=['NET'])
+        montos = {employee_id: amounts.get('NET', 0) for employee_id, amounts in totals.items()}
+
+        query = self.env['hr.payslip']._search(self._get_payslip_domain(ano, ordinarias=True))
+        self.env['hr.payslip.worked_days'].flush_model(['payslip_id', 'code', 'number_of_days'])
+        self.env['hr.payslip'].flush_model(['employee_id'])
+        rows = self.env.execute_query(SQL("""
+            SELECT p.employee_id, SUM(w.number_of_days)
+              FROM hr_payslip_worked_days w
+              JOIN hr_payslip p ON p.id = w.payslip_id
+             WHERE w.payslip_id IN %s AND w.code IN %s
+             GROUP BY 1
+        """, query.subselect(), tuple(PTU_DIAS_CODES)))
+        return montos, {employee_id: dias or 0 for employee_id, dias in rows}
+
+    @api.model
+    def _get_promedio_ptu(self, employee_ids, ano):
+        """ Promedio de la PTU recibida en los últimos tres años {employee_id: promedio}. """
+        if not employee_ids:
+            return {}
+        query = self.env['hr.payslip']._search([
+            ('state', '=', 'done'), ('employee_id', 'in', employee_ids),
+            ('date_from', '>=', date(ano - 2, 1, 1)), ('date_from', '<=', date(ano, 12, 31))])
+        self.env['hr.payslip.input'].flush_model(['payslip_id', 'code', 'amount'])
+        rows = self.env.execute_query(SQL("""
+            SELECT p.employee_id, SUM(i.amount)
+              FROM hr_payslip_input i
+              JOIN hr_payslip p ON p.id = i.payslip_id
+             WHERE i.payslip_id IN %s AND i.code = 'PTU'
+             GROUP BY 1
+        """, query.subselect()))
+        return {employee_id: (amount or 0) / 3 for employee_id, amount in rows}
+
+    @api.model
+    def _get_contracts(self, employees):
+        """ Contrato de cada empleado {employee_id: contrato}; el actual o el primero que tenga. """
+        contracts = {employee.id: employee.contract_id for employee in employees if employee.contract_id}
+        missing = employees.filtered(lambda x: not x.contract_id)
+        if missing:
+            for contract in self.env['hr.contract'].search([('employee_id', 'in', missing.ids)]):
+                contracts.setdefault(contract.employee_id.id, contract)
+        return contracts
+
+    @api.model
+    def calcular(self, ano, total_repartir):
+        """ Regresa los coeficientes y la PTU por empleado. Los empleados sin días laborados
+            se listan sin PTU (dias = None). El tope es el mayor entre tres meses de salario y
+            el promedio de la PTU recibida en los últimos tres años (art. 127 fr. VIII LFT). """
+        ano = int(ano)
+        montos, dias = self.get_totales(ano)
+        monto_total = sum(montos.values())
+        if monto_total == 0:
+            raise UserError(_('No hay monto pagado en las nóminas del periodo seleccionado'))
+        dias_laborados = sum(dias.values())
+        if dias_laborados == 0:
+            raise UserError(_('No hay dias laborados en las nóminas del periodo seleccionado.'))
+        coef_dias = (total_repartir / 2) / dias_laborados
+        coef_monto = (total_repartir / 2) / monto_total
+
+        employees = self.env['hr.employee'].browse(montos).sorted(lambda x: (x.name or '', x.id))
+        with_days = employees.filtered(lambda x: x.id in dias)
+        contracts = self._get_contracts(with_days)
+        promedios = self._get_promedio_ptu(with_days.ids, ano)
+
+        empleados = []
+        for employee in employees:
+            monto = montos[employee.id]
+            empleado = {'employee': employee, 'monto': monto, 'dias': dias.get(employee.id)}
+            if empleado['dias'] is not None:
+                contract = contracts.get(employee.id, self.env['hr.contract'])
+                ptu_monto = monto * coef_monto
+                ptu_dias = empleado['dias'] * coef_dias
+                max_limit = max(contract.sueldo_diario * 90, promedios.get(employee.id, 0))
+                empleado.update({
+                    'contract': contract,
+                    'ptu_monto': ptu_monto,
+                    'ptu_dias': ptu_dias,
+                    'total': min(ptu_monto + ptu_dias, max_limit),
+                })
+            empleados.append(empleado)
+        return {
+            'monto_total': monto_total,
+            'dias_laborados': dias_laborados,
+            'coef_monto': coef_monto,
+            'coef_dias': coef_dias,
+            'empleados': empleados,
+        }
+
+    @api.model
+    def generar_procesamiento(self, ano, total_repartir, date_slip):
+        """ Crea el procesamiento de PTU con las nóminas de todos los empleados en un solo create. """
+        calculo = self.calcular(ano, total_repartir)
+        batch = self.env['hr.payslip.run'].create({
+            'name': 'Reparto Utilidades ' + str(ano),
+            'date_start': date_slip,
+            'date_end': date_slip,
+            'periodicidad_pago': '99',
+            'tipo_nomina': 'E',
+            'fecha_pago': date_slip,
+        })
+        structure = self.env['hr.payroll.structure'].search([('code', '=', 'PTU')], limit=1)
+        locale = self.env.context.get('lang') or 'en_US'
+        periodo = tools.ustr(babel.dates.format_date(date=datetime.combine(date_slip, time.min), format='MMMM-y', locale=locale))
+
+        vals_list = []
+        for empleado in calculo['empleados']:
+            if empleado['dias'] is None:
+                continue
+            employee = empleado['employee']
+            contract = empleado['contract']
+            vals = {
+                'name': _('Salary Slip of %s for %s') % (employee.name, periodo),
+                'company_id': employee.company_id.id,
+                'employee_id': employee.id,
+                'tipo_nomina': 'E',
+                'input_line_ids': [(0, 0, {'name': 'Reparto utilidades', 'code': 'PTU', 'contract_id': contract.id, 'amount': empleado['total']})],
+                'worked_days_line_ids': [(0, 0, {'name': 'Dias a pagar', 'code': 'WORK100', 'contract_id': contract.id, 'number_of_days': 0})],
+                'payslip_run_id': batch.id,
+                'date_from': date_slip,
+                'date_to': date_slip,
+                'contract_id': contract.id,
+                'dias_pagar': 1,
+                'fecha_pago': date_slip,
+                'struct_id': structure.id or contract.struct_id.id,
+            }
+            vals_list.append(vals)
+        self.env['hr.payslip'].create(vals_list)
+        return batch
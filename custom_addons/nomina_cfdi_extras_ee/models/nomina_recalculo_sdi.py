@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from odoo import api, models, _
+from odoo.exceptions import UserError
+
+# tope del salario base de cotización en UMAs
+SBC_UMAS_TOPE = 25
+
+
+class NominaRecalculoSdi(models.AbstractModel):
+    """ Recálculo masivo del SDI y SBC de los contratos (cambio de UMA o de tablas).
+
+        Mismo criterio que hr.contract.calculate_sueldo_diario_integrado: el renglón de
+        antigüedad es el primero mayor o igual con menos de un año de antigüedad y el
+        último menor o igual con más. El factor de integración de cada renglón se calcula
+        una sola vez por tabla CFDI y el renglón de cada contrato se busca por bisección,
+        así el SDI de cada contrato es una búsqueda y una multiplicación. Los cambios se
+        guardan con incidencias 'Cambio salario' e historial de salario en un solo create.
+    """
+    _name = 'nomina.recalculo.sdi'
+    _description = 'Recálculo masivo de SDI'
+
+    @api.model
+    def _get_factores(self, tablas):
+        """ {tabla_id: (antigüedades ordenadas, factores de integración)}. """
+        result = {}
+        for tabla in tablas:
+            lines = tabla.tabla_antiguedades.sorted('antiguedad')
+            result[tabla.id] = (lines.mapped('antiguedad'),
+                                [(365 + line.aguinaldo + line.vacaciones * line.prima_vac / 100.0) / 365.0
+                                 for line in lines])
+        return result
+
+    @api.model
+    def _factor(self, factores, years):
+        limites, valores = factores
+        if years < 1.0:
+            index = bisect_left(limites, years)
+            return valores[index] if index < len(valores) else None
+        index = bisect_right(limites, years) - 1
+        return valores[index] if index >= 0 else None
+
+    @api.model
+    def calcular(self, contracts, fecha=None):
+        """ SDI y SBC nuevos por contrato a la fecha (hoy por omisión), en el orden de
+            contracts: [{'contract', 'sdi_anterior', 'sdi', 'sbc_anterior', 'sbc', 'error'}].
+            Sin tabla CFDI en el contrato se usa la primera tabla. """
+        fecha = fecha or datetime.today().date()
+        default = self.env['tablas.cfdi']
+        if contracts.filtered(lambda x: not x.tablas_cfdi_id):
+            default = self.env['tablas.cfdi'].search([], limit=1)
+        factores = self._get_factores(contracts.tablas_cfdi_id | default)
+
+        result = []
+        for contract in contracts:
+            tabla = contract.tablas_cfdi_id or default
+            calculo = {
+                'contract': contract,
+                'sdi_anterior': contract.sueldo_diario_integrado,
+                'sbc_anterior': contract.sueldo_base_cotizacion,
+                'sdi': contract.sueldo_diario_integrado,
+                'sbc': contract.sueldo_base_cotizacion,
+                'error': False,
+            }
+            result.append(calculo)
+            if not tabla or not tabla.dias_mes:
+                calculo['error'] = _('El empleado %s no tiene tablas CFDI asignado en el contrato.') % contract.employee_id.name
+                continue
+            if not contract.date_start:
+                calculo['error'] = _('El contrato de %s no tiene fecha de inicio.') % contract.employee_id.name
+                continue
+            years = (fecha - contract.date_start + timedelta(days=1)).days / 365.0
+            factor = self._factor(factores[tabla.id], years)
+            if factor is None:
+                calculo['error'] = _('La tabla CFDI %s no tiene antigüedades para %s años.') % (tabla.name, round(years, 2))
+                continue
+            sdi = factor * contract.wage / tabla.dias_mes
+            calculo.update({'sdi': sdi, 'sbc': min(sdi, tabla.uma * SBC_UMAS_TOPE)})
+        return result
+
+    @api.model
+    def aplicar(self, calculos, fecha=None):
+        """ Guarda los SDI / SBC que cambiaron: incidencias 'Cambio salario' ya validadas
+            (con los valores anteriores) e historial de salario en un create cada uno, y el
+            nuevo SDI / SBC en los contratos. Regresa las incidencias creadas. """
+        fecha = fecha or datetime.today().date()
+        cambios = [calculo for calculo in calculos if not calculo['error'] and (
+            round(calculo['sdi'], 2) != round(calculo['sdi_anterior'], 2)
+            or round(calculo['sbc'], 2) != round(calculo['sbc_anterior'], 2))]
+        if not cambios:
+            raise UserError(_('No hay cambios de salario diario integrado por aplicar.'))
+
+        incidencias_vals = []
+        historial_vals = []
+        for calculo in cambios:
+            contract = calculo['contract']
+            incidencias_vals.append({
+                'tipo_de_incidencia': 'Cambio salario',
+                'employee_id': contract.employee_id.id,
+                'contract_id': contract.id,
+                'company_id': contract.company_id.id or self.env.company.id,
+                'fecha': fecha,
+                'sueldo_mensual': contract.wage,
+                'sueldo_diario': contract.sueldo_diario,
+                'sueldo_por_horas': contract.sueldo_hora,
+                'sueldo_diario_integrado': calculo['sdi'],
+                'sueldo_cotizacion_base': calculo['sbc'],
+                'sueldo_mensual_ant': contract.wage,
+                'sueldo_diario_ant': contract.sueldo_diario,
+                'sueldo_por_horas_ant': contract.sueldo_hora,
+                'sueldo_diario_integrado_ant': calculo['sdi_anterior'],
+                'sueldo_cotizacion_base_ant': calculo['sbc_anterior'],
+                'state': 'done',
+            })
+            historial_vals.append({
+                'contract_id': contract.id,
+                'fecha_sueldo': fecha,
+                'sueldo_mensual': contract.wage,
+                'sueldo_diario': contract.sueldo_diario,
+                'sueldo_por_hora': contract.sueldo_hora,
+                'sueldo_diario_integrado': calculo['sdi'],
+                'sueldo_base_cotizacion': calculo['sbc'],
+            })
+        incidencias = self.env['incidencias.nomina'].create(incidencias_vals)
+        self.env['contract.historial.salario'].create(historial_vals)
+        for calculo in cambios:
+            calculo['contract'].write({'sueldo_diario_integrado': calculo['sdi'],
+                                       'sueldo_base_cotizacion': calculo['sbc']})
+        return incidencias
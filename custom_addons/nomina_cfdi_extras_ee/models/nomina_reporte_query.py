@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, models
+from odoo.tools import SQL
+
+
+class NominaReporteQuery(models.AbstractModel):
+    """ Capa de consultas para los reportes de nómina.
+
+        Regresa los totales de hr.payslip.line por (nómina, empleado o departamento) y
+        código de regla con un solo GROUP BY, en lugar de recorrer line_ids en Python.
+        El total de la línea no se guarda en la base: se calcula como en
+        hr.payslip.line._compute_total (quantity * amount * rate / 100).
+    """
+    _name = 'nomina.reporte.query'
+    _description = 'Consultas de reportes de nómina'
+
+    _GROUP_BY = {
+        'slip': 'l.slip_id',
+        'employee': 'l.employee_id',
+        'department': 'e.department_id',
+    }
+
+    @api.model
+    def get_payslip_domain(self, date_from=None, date_to=None, employee_ids=None, department_ids=None,
+                           states=None, date_field_from='date_from', date_field_to='date_from'):
+        """ Dominio de hr.payslip con los filtros comunes de los wizards de reportes.
+            date_field_from / date_field_to indican contra qué fecha de la nómina se
+            compara cada extremo del rango. """
+        domain = []
+        if date_from:
+            domain.append((date_field_from, '>=', date_from))
+        if date_to:
+            domain.append((date_field_to, '<=', date_to))
+        if employee_ids:
+            domain.append(('employee_id', 'in', list(employee_ids)))
+        elif department_ids:
+            domain.append(('employee_id.department_id', 'in', list(department_ids)))
+        if states:
+            domain.append(('state', 'in', list(states)))
+        return domain
+
+    def _get_line_conditions(self, domain, codes=None, with_category=False):
+        query = self.env['hr.payslip']._search(domain)
+        conditions = [SQL("l.slip_id IN %s", query.subselect())]
+        if codes:
+            conditions.append(SQL("l.code IN %s", tuple(codes)))
+        if with_category:
+            # mismo criterio que details_by_salary_rule_category
+            conditions.append(SQL("l.category_id IS NOT NULL"))
+        self.env['hr.payslip.line'].flush_model(['slip_id', 'employee_id', 'code', 'category_id', 'sequence',
+                                                 'quantity', 'amount', 'rate'])
+        return SQL(" AND ").join(conditions)
+
+    @api.model
+    def get_totals(self, domain, group_by='slip', codes=None, with_category=False):
+        """ Pivote {llave: {código: total}} de las líneas de las nóminas del dominio.
+            group_by: 'slip', 'employee' o 'department' (departamento actual del empleado,
+            None para empleados sin departamento). codes limita las reglas consultadas. """
+        self.env['hr.employee'].flush_model(['department_id'])
+        rows = self.env.execute_query(SQL("""
+            SELECT %s, l.code, SUM(l.quantity * l.amount * l.rate / 100)
+              FROM hr_payslip_line l
+              JOIN hr_employee e ON e.id = l.employee_id
+             WHERE %s
+             GROUP BY 1, 2
+        """, SQL(self._GROUP_BY[group_by]), self._get_line_conditions(domain, codes, with_category)))
+        result = {}
+        for key, code, total in rows:
+            result.setdefault(key, {})[code] = total or 0.0
+        return result
+
+    @api.model
+    def get_rule_columns(self, domain, codes=None, with_category=False):
+        """ Lista de (código, nombre) de las reglas presentes en las nóminas del dominio,
+            ordenada por secuencia. """
+        rows = self.env.execute_query(SQL("""
+            SELECT DISTINCT ON (l.code) l.code, l.id, l.sequence
+              FROM hr_payslip_line l
+             WHERE %s
+             ORDER BY l.code, l.sequence, l.id
+        """, self._get_line_conditions(domain, codes, with_category)))
+        rows.sort(key=lambda row: (row[2], row[1]))
+        # el nombre es traducible, se lee con el ORM
+        lines = self.env['hr.payslip.line'].browse([row[1] for row in rows])
+        return [(line.code, line.name) for line in lines]
+
+    @api.model
+    def get_isn_totals(self, domain, code='TPER'):
+        """ Base e impuesto sobre nómina por empleado {employee_id: (nóminas, base, isn)}.
+            La base es el total de la regla code y la tasa la de la tabla CFDI del contrato
+            de cada nómina. """
+        self.env['hr.payslip'].flush_model(['contract_id'])
+        self.env['hr.contract'].flush_model(['tablas_cfdi_id'])
+        self.env['tablas.cfdi'].flush_model(['isn'])
+        rows = self.env.execute_query(SQL("""
+            SELECT l.employee_id, COUNT(DISTINCT l.slip_id), SUM(t.total), SUM(t.total * COALESCE(tc.isn, 0) / 100)
+              FROM hr_payslip_line l
+              JOIN hr_payslip p ON p.id = l.slip_id
+              LEFT JOIN hr_contract c ON c.id = p.contract_id
+              LEFT JOIN tablas_cfdi tc ON tc.id = c.tablas_cfdi_id
+              CROSS JOIN LATERAL (SELECT l.quantity * l.amount * l.rate / 100 AS total) t
+             WHERE %s
+             GROUP BY 1
+        """, self._get_line_conditions(domain, [code])))
+        return {employee_id: (nominas, base or 0.0, isn or 0.0) for employee_id, nominas, base, isn in rows}
+
+    @api.model
+    def get_employee_groups(self, employees, agrupar_por=False):
+        """ Empleados ordenados por número y agrupados para los reportes [(grupo, empleados)].
+            agrupar_por: 'registro_patronal' o 'estado' (lugar donde labora); sin agrupar
+            regresa un solo grupo sin nombre. """
+        employees = employees.sorted(lambda x: (x.no_empleado or '', x.name or ''))
+        if agrupar_por == 'registro_patronal':
+            grupos = employees.grouped(lambda x: x.registro_patronal_id.registro_patronal or 'Sin registro patronal')
+        elif agrupar_por == 'estado':
+            grupos = employees.grouped(lambda x: x.estado.name or 'Sin estado')
+        else:
+            return [(False, employees)]
+        return sorted(grupos.items())
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from odoo import api, models, _
+from odoo.exceptions import UserError
+
+# regla cuya diferencia se paga como retroactivo
+RETROACTIVO_CODE = 'TPER'
+# entrada que se agrega a la nómina del procesamiento abierto
+RETROACTIVO_INPUT = ('PRETRO', 'Retroactivo por cambio de salario')
+
+
+class NominaRetroactivo(models.AbstractModel):
+    """ Diferencias retroactivas por cambios de salario (incidencias 'Cambio salario').
+
+        Para cada contrato se toma el último cambio de salario validado: las nóminas
+        ordinarias hechas con fecha final a partir de la fecha del cambio se simulan de
+        nuevo con el contrato actual (sin escribir en la base, con los días, entradas y
+        acumulados guardados en la nómina) y se comparan contra lo pagado, que sale de una
+        sola consulta agrupada. Las nóminas que empiezan antes del cambio se prorratean por
+        días. Las diferencias positivas se agregan como entrada PRETRO a la nómina del
+        empleado en el procesamiento abierto; la paga la regla de datos hr_rule_retroactivo,
+        que se agrega a las estructuras que no tengan una regla con esa entrada. Las
+        diferencias negativas no se descuentan, se regresan para revisarlas.
+    """
+    _name = 'nomina.retroactivo'
+    _description = 'Retroactivo por cambio de salario'
+
+    @api.model
+    def get_cambios(self, incidencias):
+        """ Último cambio de salario validado de cada contrato {contrato: incidencia}. """
+        cambios = {}
+        for incidencia in incidencias.filtered(
+                lambda x: x.tipo_de_incidencia == 'Cambio salario' and x.state == 'done' and x.contract_id and x.fecha
+        ).sorted(lambda x: (x.fecha, x.id), reverse=True):
+            cambios.setdefault(incidencia.contract_id, incidencia)
+        return cambios
+
+    @api.model
+    def get_nominas_afectadas(self, cambios):
+        """ Nóminas ordinarias hechas pagadas con el salario anterior {nómina: incidencia}. """
+        if not cambios:
+            return {}
+        payslips = self.env['hr.payslip'].search([
+            ('state', '=', 'done'), ('tipo_nomina', '=', 'O'),
+            ('contract_id', 'in', [contract.id for contract in cambios]),
+            ('date_to', '>=', min(incidencia.fecha for incidencia in cambios.values()))])
+        return {payslip: cambios[payslip.contract_id] for payslip in payslips
+                if payslip.date_to >= cambios[payslip.contract_id].fecha}
+
+    @api.model
+    def simular(self, payslips, codes=None):
+        """ Totales por regla de las nóminas calculadas con el contrato actual, sin
+            escribir en la base {slip_id: {código: total}}. """
+        payslip_obj = self.env['hr.payslip']
+        result = {}
+        for payslip in payslips:
+            totales = defaultdict(float)
+            for line in payslip_obj._get_payslip_lines(payslip.contract_id.ids, payslip.id):
+                if not codes or line['code'] in codes:
+                    totales[line['code']] += line['amount'] * line['quantity'] * line['rate'] / 100
+            result[payslip.id] = totales
+        return result
+
+    @api.model
+    def calcular(self, incidencias):
+        """ Diferencia por empleado {employee_id: {'total': diferencia, 'nominas': [(nómina,
+            pagado, recalculado, factor)]}}. Se regresan las diferencias positivas y las
+            negativas; las que redondean a cero no. """
+        afectadas = self.get_nominas_afectadas(self.get_cambios(incidencias))
+        if not afectadas:
+            return {}
+        payslips = self.env['hr.payslip'].union(*afectadas)
+        pagado = self.env['nomina.reporte.query'].get_totals(
+            [('id', 'in', payslips.ids)], group_by='slip', codes=[RETROACTIVO_CODE])
+        recalculado = self.simular(payslips, codes=[RETROACTIVO_CODE])
+
+        result = {}
+        for payslip, incidencia in afectadas.items():
+            antes = pagado.get(payslip.id, {}).get(RETROACTIVO_CODE, 0.0)
+            despues = recalculado[payslip.id].get(RETROACTIVO_CODE, 0.0)
+            factor = 1.0
+            if payslip.date_from < incidencia.fecha:
+                factor = ((payslip.date_to - incidencia.fecha).days + 1) / ((payslip.date_to - payslip.date_from).days + 1)
+            empleado = result.setdefault(payslip.employee_id.id, {'total': 0.0, 'nominas': []})
+            empleado['total'] += (despues - antes) * factor
+            empleado['nominas'].append((payslip, antes, despues, factor))
+        return {employee_id: empleado for employee_id, empleado in result.items() if round(empleado['total'], 2)}
+
+    @api.model
+    def _check_regla(self, payslips):
+        """ Valida que las estructuras de las nóminas tengan una regla que lea la entrada
+            del retroactivo (p. ej. la regla PRETRO del módulo); las estructuras no se
+            modifican al aplicar el cálculo. """
+        code = RETROACTIVO_INPUT[0]
+        structures = self.env['hr.payroll.structure'].union(
+            *[payslip.struct_id or payslip.contract_id.struct_id for payslip in payslips])
+        faltantes = structures.filtered(lambda x: code not in x.rule_ids.input_ids.mapped('code'))
+        if faltantes:
+            raise UserError(_('Las estructuras %s no tienen una regla con la entrada %s. Agregue la regla '
+                              'Retroactivo (%s) a las estructuras antes de aplicar el retroactivo.') % (
+                ', '.join(faltantes.mapped('name')), code, code))
+
+    @api.model
+    def aplicar_en_procesamiento(self, incidencias, payslip_run):
+        """ Agrega la entrada de retroactivo a las nóminas en borrador del procesamiento.
+            Las entradas existentes con el mismo código se actualizan. Regresa los empleados
+            con diferencia que no se aplicó {empleado: motivo}: sin nómina en el
+            procesamiento o con diferencia negativa. """
+        payslips = payslip_run.slip_ids.filtered(lambda x: x.state == 'draft')
+        if not payslips:
+            raise UserError(_('El procesamiento %s no tiene nóminas en borrador.') % payslip_run.name)
+        diferencias = self.calcular(incidencias)
+        if not diferencias:
+            raise UserError(_('No hay diferencias de salario por pagar en las nóminas hechas.'))
+
+        code, name = RETROACTIVO_INPUT
+        input_obj = self.env['hr.payslip.input']
+        existing = {line.payslip_id.id: line
+                    for line in input_obj.search([('payslip_id', 'in', payslips.ids), ('code', '=', code)])}
+        slips_by_employee = {payslip.employee_id.id: payslip for payslip in payslips}
+        montos = {}
+        no_aplicadas = {}
+        for employee_id, diferencia in diferencias.items():
+            employee = self.env['hr.employee'].browse(employee_id)
+            amount = round(diferencia['total'], 2)
+            if amount < 0:
+                no_aplicadas[employee] = _('diferencia negativa de %s, no se descuenta') % amount
+                continue
+            payslip = slips_by_employee.get(employee_id)
+            if not payslip:
+                no_aplicadas[employee] = _('no tiene nómina en el procesamiento')
+                continue
+            montos[payslip] = amount
+        self._check_regla(self.env['hr.payslip'].union(*montos))
+
+        vals_list = []
+        for payslip, amount in montos.items():
+            if payslip.id in existing:
+                existing[payslip.id].amount = amount
+            else:
+                vals_list.append({'payslip_id': payslip.id, 'contract_id': payslip.contract_id.id,
+                                  'code': code, 'name': name, 'amount': amount})
+        input_obj.create(vals_list)
+        return no_aplicadas
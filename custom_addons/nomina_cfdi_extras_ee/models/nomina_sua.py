@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import re
+import zipfile
+
+from odoo import api, models, _
+
+# Cuotas IMSS que calculo_imss guarda en la nómina
+IMSS_FIELDS = [
+    'emp_exedente_smg', 'emp_prest_dinero', 'emp_esp_pens', 'emp_invalidez_vida', 'emp_cesantia_vejez', 'emp_total',
+    'pat_cuota_fija_pat', 'pat_exedente_smg', 'pat_prest_dinero', 'pat_esp_pens', 'pat_riesgo_trabajo',
+    'pat_invalidez_vida', 'pat_guarderias', 'pat_retiro', 'pat_cesantia_vejez', 'pat_infonavit', 'pat_total',
+]
+
+# tipo de incidencia -> tipo de movimiento IMSS. 'Cambio reg. patronal' se reporta como
+# baja en el registro anterior y reingreso en el nuevo.
+TIPOS_MOVIMIENTO = {
+    'Alta': '08',
+    'Reingreso': '08',
+    'Cambio salario': '07',
+    'Baja': '02',
+}
+
+# Layouts de ancho fijo [(campo, ancho, tipo)]: 'N' se rellena con ceros a la izquierda y
+# 'A' con espacios a la derecha. Las cifras van sin punto decimal.
+SUA_ASEGURADOS = [
+    ('registro_patronal', 11, 'A'),
+    ('nss', 11, 'A'),
+    ('rfc', 13, 'A'),
+    ('curp', 18, 'A'),
+    ('nombre_sua', 50, 'A'),
+    ('tipo_trabajador', 1, 'N'),
+    ('jornada', 1, 'N'),
+    ('fecha', 8, 'A'),
+    ('sdi', 7, 'N'),
+    ('ubicacion', 17, 'A'),
+    ('no_credito', 10, 'A'),
+    ('fecha_infonavit', 8, 'A'),
+    ('tipo_descuento', 1, 'N'),
+    ('valor_descuento', 8, 'N'),
+]
+
+# movimientos de créditos INFONAVIT (tipos 15 a 20 de credito.infonavit)
+SUA_CREDITOS = [
+    ('registro_patronal', 11, 'A'),
+    ('nss', 11, 'A'),
+    ('no_credito', 10, 'A'),
+    ('tipo_movimiento', 2, 'N'),
+    ('fecha', 8, 'A'),
+    ('tipo_descuento', 1, 'N'),
+    ('valor_descuento', 8, 'N'),
+    ('aplica_tabla', 1, 'A'),
+]
+
+# campos del crédito que actualiza cada tipo de movimiento; sin tipo se toma como inicio
+CREDITO_CAMPOS = {
+    '15': ('no_credito', 'fecha', 'tipo_de_descuento', 'valor_descuento'),
+    '16': (),
+    '17': (),
+    '18': ('tipo_de_descuento', 'valor_descuento'),
+    '19': ('valor_descuento',),
+    '20': ('no_credito',),
+}
+
+SUA_MOVIMIENTOS = [
+    ('registro_patronal', 11, 'A'),
+    ('nss', 11, 'A'),
+    ('tipo_movimiento', 2, 'N'),
+    ('fecha', 8, 'A'),
+    ('folio', 8, 'A'),
+    ('dias', 2, 'N'),
+    ('sdi', 7, 'N'),
+]
+
+# DISPMAG de IDSE, 168 posiciones por movimiento
+IDSE_MOVIMIENTOS = [
+    ('registro_patronal', 11, 'A'),
+    ('nss', 11, 'A'),
+    ('paterno', 27, 'A'),
+    ('materno', 27, 'A'),
+    ('nombres', 27, 'A'),
+    ('sbc', 6, 'N'),
+    ('filler', 6, 'A'),
+    ('tipo_trabajador', 1, 'N'),
+    ('tipo_salario', 1, 'N'),
+    ('jornada', 1, 'N'),
+    ('fecha', 8, 'A'),
+    ('umf', 3, 'A'),
+    ('filler', 2, 'A'),
+    ('tipo_movimiento', 2, 'N'),
+    ('guia', 5, 'A'),
+    ('clave_trabajador', 10, 'A'),
+    ('causa_baja', 1, 'A'),
+    ('curp', 18, 'A'),
+    ('identificador', 1, 'A'),
+]
+
+# SUA e IDSE son aplicaciones de Windows
+ENCODING = 'cp1252'
+ACENTOS = str.maketrans('áéíóúüÁÉÍÓÚÜ', 'aeiouuAEIOUU')
+
+
+def _texto(value):
+    return re.sub(r'\s+', ' ', (value or '').translate(ACENTOS)).strip().upper()
+
+
+def _cifra(monto, decimales=2):
+    return str(int(round((monto or 0) * 10 ** decimales)))
+
+
+def _fecha(fecha):
+    return fecha.strftime('%d%m%Y') if fecha else ''
+
+
+def _desbordes(layout, values):
+    """ Campos numéricos del registro [(campo, valor, ancho)] más largos que su ancho. """
+    return [(campo, values[campo], ancho) for campo, ancho, tipo in layout
+            if tipo == 'N' and values.get(campo) not in (None, False) and len(str(values[campo])) > ancho]
+
+
+def _linea(layout, values):
+    """ Registro de ancho fijo; los textos se recortan al ancho del campo. Una cifra no se
+        recorta (perdería los dígitos de la derecha): si no cabe se lanza ValueError, por
+        eso preparar() valida los anchos con _desbordes antes de escribir. """
+    partes = []
+    for campo, ancho, tipo in layout:
+        value = values.get(campo)
+        value = '' if value in (None, False) else str(value)
+        if tipo == 'N':
+            if len(value) > ancho:
+                raise ValueError('%s: %s no cabe en %s posiciones' % (campo, value, ancho))
+            partes.append(value.rjust(ancho, '0'))
+        else:
+            partes.append(value[:ancho].ljust(ancho))
+    return ''.join(partes)
+
+
+class NominaSua(models.AbstractModel):
+    """ Archivos bimestrales para SUA (asegurados y movimientos) e IDSE (DISPMAG).
+
+        Los trabajadores salen de una búsqueda de contratos vigentes en el bimestre, los
+        movimientos de las incidencias hechas, los créditos INFONAVIT de los movimientos de
+        credito.infonavit y las cuotas de una suma agrupada de los campos emp_* / pat_* de
+        las nóminas. Todo se valida antes de escribir y los archivos se escriben registro
+        por registro dentro de un ZIP, una carpeta por registro patronal.
+    """
+    _name = 'nomina.sua'
+    _description = 'Exportación SUA / IDSE'
+
+    @api.model
+    def get_trabajadores(self, date_from, date_to, registros=None):
+        """ Contrato vigente en el bimestre de cada empleado {empleado: contrato}; si hay
+            varios se toma el más reciente. """
+        domain = [('state', '!=', 'cancel'), ('date_start', '<=', date_to),
+                  '|', ('date_end', '=', False), ('date_end', '>=', date_from),
+                  ('employee_id.registro_patronal_id', '!=', False)]
+        if registros:
+            domain.append(('employee_id.registro_patronal_id', 'in', registros.ids))
+        trabajadores = {}
+        for contract in self.env['hr.contract'].with_context(active_test=False).search(domain, order='date_start desc'):
+            trabajadores.setdefault(contract.employee_id, contract)
+        return trabajadores
+
+    @api.model
+    def get_movimientos(self, date_from, date_to, registros=None):
+        """ Movimientos IMSS de las incidencias hechas del bimestre
+            [(registro patronal, tipo de movimiento, incidencia)] ordenados por fecha. """
+        incidencias = self.env['incidencias.nomina'].search([
+            ('state', '=', 'done'), ('fecha', '>=', date_from), ('fecha', '<=', date_to),
+            ('tipo_de_incidencia', 'in', list(TIPOS_MOVIMIENTO) + ['Cambio reg. patronal'])], order='fecha, id')
+        movimientos = []
+        for incidencia in incidencias:
+            registro = incidencia.registro_patronal or incidencia.employee_id.registro_patronal_id
+            if incidencia.tipo_de_incidencia == 'Cambio reg. patronal':
+                movimientos.append((incidencia.registro_patronal_ant, '02', incidencia))
+                movimientos.append((registro, '08', incidencia))
+            else:
+                movimientos.append((registro, TIPOS_MOVIMIENTO[incidencia.tipo_de_incidencia], incidencia))
+        if registros:
+            movimientos = [movimiento for movimiento in movimientos if movimiento[0] in registros]
+        return movimientos
+
+    @api.model
+    def get_cuotas(self, date_from, date_to, employees):
+        """ Cuotas IMSS de las nóminas hechas del bimestre sumadas por empleado
+            {employee_id: {campo: total}}. """
+        domain = self.env['nomina.reporte.query'].get_payslip_domain(
+            date_from=date_from, date_to=date_to, employee_ids=employees.ids, states=['done'],
+            date_field_from='date_to', date_field_to='date_to')
+        return {employee.id: dict(zip(IMSS_FIELDS, totals))
+                for employee, *totals in self.env['hr.payslip']._read_group(
+                    domain, ['employee_id'], ['%s:sum' % fname for fname in IMSS_FIELDS])}
+
+    @api.model
+    def _get_creditos_infonavit(self, employees, date_to):
+        """ Crédito INFONAVIT vigente a date_to de cada empleado, armado con los movimientos
+            hechos de credito.infonavit en orden: {employee_id: {'no_credito', 'fecha',
+            'tipo_de_descuento', 'valor_descuento'}}. """
+        creditos = {}
+        for credito in self.env['credito.infonavit'].search([
+                ('state', '=', 'done'), ('employee_id', 'in', employees.ids), ('fecha', '<=', date_to)],
+                order='fecha, id'):
+            datos = creditos.setdefault(credito.employee_id.id, {})
+            for fname in CREDITO_CAMPOS.get(credito.tipo_de_movimiento or '15', ()):
+                datos[fname] = credito[fname]
+        return {employee_id: datos for employee_id, datos in creditos.items() if datos.get('no_credito')}
+
+    @api.model
+    def get_movimientos_credito(self, date_from, date_to, registros=None):
+        """ Movimientos hechos de créditos INFONAVIT del bimestre, por fecha. """
+        domain = [('state', '=', 'done'), ('fecha', '>=', date_from), ('fecha', '<=', date_to),
+                  ('employee_id.registro_patronal_id', '!=', False)]
+        if registros:
+            domain.append(('employee_id.registro_patronal_id', 'in', registros.ids))
+        return self.env['credito.infonavit'].search(domain, order='fecha, id')
+
+    @api.model
+    def _get_datos_empleado(self, employee, registro):
+        return {
+            'registro_patronal': _texto(registro.registro_patronal),
+            'nss': _texto(employee.segurosocial),
+            'rfc': _texto(employee.rfc),
+            'curp': _texto(employee.curp),
+            'paterno': _texto(employee.empleado_paterno),
+            'materno': _texto(employee.empleado_materno),
+            'nombres': _texto(employee.empleado_nombre),
+            'nombre_sua': '$'.join([_texto(employee.empleado_paterno), _texto(employee.empleado_materno),
+                                    _texto(employee.empleado_nombre)]),
+            'tipo_trabajador': '1' if employee.contrato in (False, '01') else '2',
+            'jornada': '6' if employee.jornada == '05' else '0',
+            'clave_trabajador': _texto(employee.no_empleado),
+        }
+
+    @api.model
+    def _validar(self, employee, values, errores, sdi=True):
+        """ Agrega a errores los datos faltantes o con formato incorrecto del empleado. """
+        mensajes = []
+        if len(values['registro_patronal']) != 11:
+            mensajes.append(_('el registro patronal debe tener 11 caracteres'))
+        if not re.fullmatch(r'\d{11}', values['nss']):
+            mensajes.append(_('el número de seguro social debe tener 11 dígitos'))
+        if len(values['curp']) != 18:
+            mensajes.append(_('la CURP debe tener 18 caracteres'))
+        if 'rfc' in values and len(values['rfc']) != 13:
+            mensajes.append(_('el RFC debe tener 13 caracteres'))
+        if not values['paterno'] or not values['nombres']:
+            mensajes.append(_('falta el apellido paterno o el nombre'))
+        if sdi and not 0 < values.get('importe_sdi', 0) < 100000:
+            mensajes.append(_('el salario diario integrado no es válido'))
+        for mensaje in mensajes:
+            errores.append(_('%s %s: %s') % (employee.no_empleado or '', employee.name, mensaje))
+        return not mensajes
+
+    @api.model
+    def _validar_anchos(self, employee, registros, errores):
+        """ Agrega a errores las cifras de los registros [(layout, values)] que no caben en
+            su campo. """
+        mensajes = [_('el campo %s (%s) excede %s posiciones') % desborde
+                    for layout, values in registros for desborde in _desbordes(layout, values)]
+        for mensaje in mensajes:
+            errores.append(_('%s %s: %s') % (employee.no_empleado or '', employee.name, mensaje))
+        return not mensajes
+
+    @api.model
+    def preparar(self, date_from, date_to, registros=None):
+        """ Valores de los registros de cada archivo por registro patronal y la lista de
+            errores encontrados: ({registro: {'asegurados': [], 'movimientos': [], 'idse': [],
+            'creditos': [], 'empleados': hr.employee}}, errores). Los empleados con errores no
+            se incluyen. """
+        trabajadores = self.get_trabajadores(date_from, date_to, registros)
+        movimientos = self.get_movimientos(date_from, date_to, registros)
+        movimientos_credito = self.get_movimientos_credito(date_from, date_to, registros)
+        employees = self.env['hr.employee'].browse(
+            [employee.id for employee in trabajadores] + [incidencia.employee_id.id for r, t, incidencia in movimientos])
+        creditos = self._get_creditos_infonavit(employees, date_to)
+        archivos = {}
+        errores = []
+
+        def archivo(registro):
+            # los empleados se juntan como ids y se leen una sola vez al final
+            return archivos.setdefault(registro, {'asegurados': [], 'movimientos': [], 'idse': [],
+                                                  'creditos': [], 'empleados': set()})
+
+        for employee, contract in sorted(trabajadores.items(), key=lambda x: (x[0].no_empleado or '', x[0].id)):
+            registro = employee.registro_patronal_id
+            values = self._get_datos_empleado(employee, registro)
+            values['importe_sdi'] = contract.sueldo_base_cotizacion or contract.sueldo_diario_integrado
+            if not self._validar(employee, values, errores):
+                continue
+            credito = creditos.get(employee.id)
+            values.update({
+                'fecha': _fecha(contract.date_start),
+                'sdi': _cifra(values['importe_sdi']),
+                'no_credito': credito and _texto(credito['no_credito']),
+                'fecha_infonavit': credito and _fecha(credito.get('fecha')),
+                'tipo_descuento': credito and credito.get('tipo_de_descuento'),
+                'valor_descuento': credito and _cifra(credito.get('valor_descuento'), 4),
+            })
+            if not self._validar_anchos(employee, [(SUA_ASEGURADOS, values)], errores):
+                continue
+            archivo(registro)['asegurados'].append(values)
+            archivo(registro)['empleados'].add(employee.id)
+
+        for registro, tipo_movimiento, incidencia in movimientos:
+            employee = incidencia.employee_id
+            values = self._get_datos_empleado(employee, registro)
+            values.pop('rfc')
+            values['importe_sdi'] = incidencia.sueldo_cotizacion_base or incidencia.sueldo_diario_integrado
+            if not self._validar(employee, values, errores, sdi=tipo_movimiento != '02'):
+                continue
+            fecha = _fecha(incidencia.fecha)
+            movimiento = {
+                'registro_patronal': values['registro_patronal'],
+                'nss': values['nss'],
+                'tipo_movimiento': tipo_movimiento,
+                'fecha': fecha,
+                'sdi': tipo_movimiento != '02' and _cifra(values['importe_sdi']),
+            }
+            values.update({
+                'tipo_movimiento': tipo_movimiento,
+                'fecha': fecha,
+                'sbc': tipo_movimiento != '02' and _cifra(values['importe_sdi']),
+                'tipo_salario': '0',
+                'guia': _texto(registro.no_guia),
+                'causa_baja': tipo_movimiento == '02' and (incidencia.tipo_de_baja or '6'),
+                'identificador': '9',
+            })
+            if not self._validar_anchos(employee, [(SUA_MOVIMIENTOS, movimiento), (IDSE_MOVIMIENTOS, values)], errores):
+                continue
+            if tipo_movimiento != '08' or incidencia.tipo_de_incidencia != 'Alta':
+                # las altas van en el archivo de asegurados
+                archivo(registro)['movimientos'].append(movimiento)
+            archivo(registro)['idse'].append(values)
+            archivo(registro)['empleados'].add(employee.id)
+
+        for credito in movimientos_credito:
+            employee = credito.employee_id
+            registro = employee.registro_patronal_id
+            values = self._get_datos_empleado(employee, registro)
+            if not self._validar(employee, values, errores, sdi=False):
+                continue
+            movimiento = {
+                'registro_patronal': values['registro_patronal'],
+                'nss': values['nss'],
+                'no_credito': _texto(credito.no_credito),
+                'tipo_movimiento': credito.tipo_de_movimiento or '15',
+                'fecha': _fecha(credito.fecha),
+                'tipo_descuento': credito.tipo_de_descuento,
+                'valor_descuento': _cifra(credito.valor_descuento, 4),
+                'aplica_tabla': credito.aplica_tabla or 'N',
+            }
+            if not self._validar_anchos(employee, [(SUA_CREDITOS, movimiento)], errores):
+                continue
+            archivo(registro)['creditos'].append(movimiento)
+            archivo(registro)['empleados'].add(employee.id)
+
+        employee_obj = self.env['hr.employee']
+        for datos in archivos.values():
+            datos['empleados'] = employee_obj.browse(sorted(datos['empleados']))
+        # un empleado puede aparecer en varios archivos con el mismo error
+        return archivos, list(dict.fromkeys(errores))
+
+    @api.model
+    def _escribir(self, zfile, filename, layout, registros):
+        with zfile.open(filename, 'w') as archivo:
+            for values in registros:
+                archivo.write((_linea(layout, values) + '\r\n').encode(ENCODING, 'replace'))
+
+    @api.model
+    def _escribir_cuotas(self, zfile, filename, employees, cuotas):
+        """ Cuotas IMSS por trabajador de las nóminas del bimestre, para conciliar con SUA. """
+        payslip_fields = self.env['hr.payslip']._fields
+        with zfile.open(filename, 'w') as archivo, io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='') as texto:
+            writer = csv.writer(texto)
+            writer.writerow(['No. empleado', 'NSS', 'Empleado'] + [payslip_fields[fname].string for fname in IMSS_FIELDS])
+            for employee in employees.sorted(lambda x: (x.no_empleado or '', x.id)):
+                totales = cuotas.get(employee.id, {})
+                writer.writerow([employee.no_empleado or '', employee.segurosocial or '', employee.name]
+                                + [round(totales.get(fname, 0.0), 2) for fname in IMSS_FIELDS])
+
+    @api.model
+    def generar(self, date_from, date_to, registros=None):
+        """ ZIP con los archivos del bimestre: por registro patronal SUA_ASEG.txt,
+            SUA_MOVT.txt, SUA_CRED.txt, IDSE.txt y cuotas.csv. Regresa (contenido, errores); con errores
+            no se genera el archivo. """
+        archivos, errores = self.preparar(date_from, date_to, registros)
+        if errores or not archivos:
+            return False, errores
+        employees = self.env['hr.employee'].union(*[datos['empleados'] for datos in archivos.values()])
+        cuotas = self.get_cuotas(date_from, date_to, employees)
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as zfile:
+            for registro, datos in sorted(archivos.items(), key=lambda x: x[0].registro_patronal or ''):
+                carpeta = _texto(registro.registro_patronal)
+                self._escribir(zfile, '%s/SUA_ASEG.txt' % carpeta, SUA_ASEGURADOS, datos['asegurados'])
+                self._escribir(zfile, '%s/SUA_MOVT.txt' % carpeta, SUA_MOVIMIENTOS, datos['movimientos'])
+                self._escribir(zfile, '%s/SUA_CRED.txt' % carpeta, SUA_CREDITOS, datos['creditos'])
+                self._escribir(zfile, '%s/IDSE.txt' % carpeta, IDSE_MOVIMIENTOS, datos['idse'])
+                self._escribir_cuotas(zfile, '%s/cuotas.csv' % carpeta, datos['empleados'], cuotas)
+        return stream.getvalue(), errores
@@ -1,9 +1,7 @@
 # -*- coding: utf-8 -*-
-from odoo import api, fields, models, _
-import xlwt
-from xlwt import easyxf
-import io
+from odoo import api, models, _
 from docutils.nodes import line
+from collections import defaultdict
 from odoo.exceptions import UserError
 
 class Payslip(models.Model):
@@ -23,7 +21,10 @@ class Payslip(models.Model):
                total += line.number_of_days
         return total
     
-    def get_total_code_value(self,special_code):
+    def get_total_code_value(self, special_code, formas_pago=None):
+        # formas_pago: resultado de hr.payslip.run.get_formas_pago() calculado una vez por procesamiento
+        if formas_pago is not None:
+            return formas_pago[self.id][special_code]
         line_ids = self.line_ids.filtered(lambda l: l.salary_rule_id.forma_pago == special_code)
         total = 0.0
         for line in line_ids:
@@ -42,9 +43,7 @@ class Payslip(models.Model):
 class PayslipBatches(models.Model):
     _inherit = 'hr.payslip.run'
 
-    file_data = fields.Binary('File')
 
-    
     def get_department(self):
         result = {}
         department = self.env['hr.department'].search([])
@@ -53,32 +52,29 @@ class PayslipBatches(models.Model):
         return result
 
     
+    def get_department_summary(self):
+        """ Totales de todas las reglas por departamento y gran total, del cubo del procesamiento:
+            {'departments': {department_id: {código: total}}, 'total': {código: total}}.
+            Los reportes QWeb lo calculan una vez por procesamiento y lo leen de una variable
+            del render; los códigos o departamentos sin líneas regresan 0. """
+        self.ensure_one()
+        totals = self.env['hr.payslip.run.total'].get_totals(
+            self, 'department_id', states=['draft', 'verify', 'done'])
+        departments = defaultdict(lambda: defaultdict(int))
+        grand_total = defaultdict(int)
+        for department_id, amounts in totals.items():
+            for code, total in amounts.items():
+                departments[department_id or False][code] = round(total, 2)
+                grand_total[code] += total
+        for code, total in grand_total.items():
+            grand_total[code] = round(total, 2)
+        return {'departments': departments, 'total': grand_total}
+
     def get_dept_total(self, dept_id):
-        result = {}
-        for rule in self.env['hr.salary.rule'].search([]):
-            result[rule.code] = 0
-        for payslip in self.slip_ids:
-            if payslip.employee_id.department_id.id == dept_id and payslip.state != "cancel":
-                for line in payslip.line_ids:
-                    if line.code in result.keys():
-                        result[line.code] = round(line.total + result.get(line.code), 2)
-                    else:
-                        result[line.code] = round(line.total, 2)
-        return result
+        return self.get_department_summary()['departments'][dept_id or False]
 
-    
     def get_grand_total(self):
-        result = {}
-        for rule in self.env['hr.salary.rule'].search([]):
-            result[rule.code] = 0
-        for payslip in self.slip_ids:
-            if payslip.state != "cancel":
-                for line in payslip.line_ids:
-                   if line.code in result.keys():
-                       result[line.code] = round(line.total + result.get(line.code), 2)
-                   else:
-                       result[line.code] = round(line.total, 2)
-        return result
+        return self.get_department_summary()['total']
 
     def get_payslip_group_by_department(self):
         result = {}
@@ -153,24 +149,23 @@ class PayslipBatches(models.Model):
         }
        
     def export_report_xlsx(self):
-        import base64
-        workbook = xlwt.Workbook()
-        worksheet = workbook.add_sheet('Listado de nomina')
-        header_style = easyxf('font:height 200; align: horiz center; font:bold True;' "borders: top thin,left thin,right thin,bottom thin")
-        text_bold_left = easyxf('font:height 200; font:bold True; align: horiz left;' "borders: top thin,bottom thin")
-        text_left = easyxf('font:height 200; align: horiz left;' "borders: top thin,bottom thin")
-        text_right = easyxf('font:height 200; align: horiz right;' "borders: top thin,bottom thin")
-        text_bold_right = easyxf('font:height 200;font:bold True; align: horiz right;' "borders: top thin,bottom thin")
+        for nom in self.slip_ids:
+            if not nom.employee_id.department_id:
+                raise UserError(_('%s no tiene departamento configurado') % (nom.employee_id.name))
+        return self.env.ref('nomina_cfdi_extras_ee.action_listado_nomina_xlsx').report_action(self)
+
+    def _write_xlsx_report(self, workbook):
+        worksheet = workbook.add_worksheet('Listado de nomina')
+        header_style = workbook.add_format({'font_size': 10, 'align': 'center', 'bold': True, 'border': 1})
+        text_bold_left = workbook.add_format({'font_size': 10, 'bold': True, 'align': 'left', 'top': 1, 'bottom': 1})
+        text_left = workbook.add_format({'font_size': 10, 'align': 'left', 'top': 1, 'bottom': 1})
+        text_right = workbook.add_format({'font_size': 10, 'align': 'right', 'top': 1, 'bottom': 1})
+        text_bold_right = workbook.add_format({'font_size': 10, 'bold': True, 'align': 'right', 'top': 1, 'bottom': 1})
         worksheet.write(0, 0, 'Cod', header_style)
         worksheet.write(0, 1, 'Empleado', header_style)
         worksheet.write(0, 2, 'Dias Pag', header_style)
         col_nm = 3
 
-        noms = self.slip_ids
-        for nom in noms:
-            if not nom.employee_id.department_id:
-                raise UserError(_('%s no tiene departamento configurado') % (nom.employee_id.name))
-
         all_column = self.get_all_columns()
         all_col_dict = all_column[0]
         all_col_list = all_column[1]
@@ -182,11 +177,14 @@ class PayslipBatches(models.Model):
             col_nm += 1
 
         payslip_group_by_department = self.get_payslip_group_by_department()
+        cube = self.env['hr.payslip.run.total']
+        slip_totals = cube.get_totals(self, 'slip_id', with_category=True)
+        formas_pago = self.get_formas_pago()
         row = 1
         grand_total = {}
         for dept in self.env['hr.department'].browse(payslip_group_by_department.keys()).sorted(lambda x:x.name):
             row += 1
-            worksheet.write_merge(row, row, 0, 2, dept.name, text_bold_left)
+            worksheet.merge_range(row, 0, row, 2, dept.name, text_bold_left)
             total = {}
             row += 1
             slip_sorted_by_employee={}
@@ -212,51 +210,26 @@ class PayslipBatches(models.Model):
                 work_day = slip.get_total_work_days()
                 worksheet.write(row, 2, work_day, text_right)
                 code_col = 3
+                amounts = slip_totals.get(slip.id, {})
                 for code in all_col_list:
-                    amt = 0
-                    if code in total.keys():
-                        for line in slip.details_by_salary_rule_category:
-                           if line.code == code:
-                               amt = round(line.total,2)
-                               grand_total[code] = grand_total.get(code) + amt
-                               total[code] = total.get(code) + amt
-                    else:
-                        for line in slip.details_by_salary_rule_category:
-                           if line.code == code:
-                               amt = round(line.total,2)
-                               total[code] = amt or 0
-                        if code in grand_total.keys():
-                            grand_total[code] = amt + grand_total.get(code) or 0.0
-                        else:
-                            grand_total[code] = amt or 0
+                    amt = round(amounts.get(code, 0), 2)
+                    if code in amounts:
+                        total[code] = total.get(code, 0) + amt
+                    grand_total[code] = grand_total.get(code, 0) + amt
                     worksheet.write(row, code_col, amt, text_right)
                     code_col += 1
-                worksheet.write(row, code_col, slip.get_total_code_value('001'), text_right)
+                worksheet.write(row, code_col, formas_pago[slip.id]['001'], text_right)
                 code_col += 1
-                worksheet.write(row, code_col, slip.get_total_code_value('002'), text_right)
+                worksheet.write(row, code_col, formas_pago[slip.id]['002'], text_right)
                 row += 1
-            worksheet.write_merge(row, row, 0, 2, 'Total Departamento', text_bold_left)
+            worksheet.merge_range(row, 0, row, 2, 'Total Departamento', text_bold_left)
             code_col = 3
             for code in all_col_list:
                 worksheet.write(row, code_col, total.get(code), text_bold_right)
                 code_col += 1
         row += 1
-        worksheet.write_merge(row, row, 0, 2, 'Gran Total', text_bold_left)
+        worksheet.merge_range(row, 0, row, 2, 'Gran Total', text_bold_left)
         code_col = 3
         for code in all_col_list:
             worksheet.write(row, code_col, grand_total.get(code), text_bold_right)
             code_col += 1
-
-        fp = io.BytesIO()
-        workbook.save(fp)
-        fp.seek(0)
-        data = fp.read()
-        fp.close()
-        self.write({'file_data': base64.b64encode(data)})
-        action = {
-            'name': 'Journal Entries',
-            'type': 'ir.actions.act_url',
-            'url': "/web/content/?model=hr.payslip.run&id=" + str(self.id) + "&field=file_data&download=true&filename=Listado_de_nomina.xls",
-            'target': 'self',
-            }
-        return action
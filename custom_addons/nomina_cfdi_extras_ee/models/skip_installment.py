@@ -4,7 +4,6 @@ from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 from datetime import date
 from dateutil.relativedelta import relativedelta
-from calendar import monthrange
 
 class dev_skip_installment(models.Model):
     _name = 'dev.skip.installment'
@@ -164,14 +163,7 @@ class dev_skip_installment(models.Model):
             date = date+relativedelta(weeks=i)
         elif periodo_de_pago=='Quincenal':
             date = date+relativedelta(days=i*15)
-            month_last_day = monthrange(date.year,date.month)[1]
-            items = [date+relativedelta(day=month_last_day), date+relativedelta(day=15)]
-            previous_month_date = date+relativedelta(months=-1)
-            previous_month_last_day = monthrange(previous_month_date.year,previous_month_date.month)[1]
-            items.append(previous_month_date+relativedelta(day=previous_month_last_day),)
-            if date.day>15:
-                items.append(date+relativedelta(months=1,day=15))
-            date = loan.nearest_date(items,date)
+            date = loan._get_fecha_quincena(loan._get_quincenas(date, date), date)
         else:
             date = date+relativedelta(months=1)
 
@@ -2,4 +2,5 @@
 
 from . import reporte_de_control
 from . import reporte_imss
-from . import reporte_de_pagos
\ No newline at end of file
+from . import reporte_de_pagos
+from . import reporte_nomina_xlsx
\ No newline at end of file
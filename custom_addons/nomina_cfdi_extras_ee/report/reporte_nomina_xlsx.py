@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+
+class ReporteNominaXlsx(models.AbstractModel):
+    """ Base de los reportes de nómina en Excel generados desde wizards y procesamientos.
+
+        El libro se escribe con xlsxwriter en modo constant_memory: cada fila se pasa a
+        disco al empezar la siguiente, por lo que las filas se deben escribir en orden.
+        report_xlsx regresa el archivo directo en la respuesta HTTP, sin guardarlo en un
+        campo binario. El modelo fuente implementa _write_xlsx_report(workbook).
+    """
+    _name = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _inherit = 'report.report_xlsx.abstract'
+    _description = 'Reporte de nómina XLSX'
+
+    def get_workbook_options(self):
+        return {'constant_memory': True, 'default_date_format': 'dd/mm/yyyy'}
+
+    def generate_xlsx_report(self, workbook, data, objs):
+        objs._write_xlsx_report(workbook)
+
+
+class ReporteNominasXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.reporte_nominas_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Reporte de nóminas XLSX'
+
+
+class ReporteImssXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.reporte_imss_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Reporte IMSS XLSX'
+
+
+class ReporteIsnXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.reporte_isn_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Reporte ISN XLSX'
+
+
+class TotalPorEmpleadoXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.total_por_empleado_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Total por empleado XLSX'
+
+
+class TotalPorDepartamentoXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.total_por_departamento_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Total por departamento XLSX'
+
+
+class ListadoNominaXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.listado_nomina_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Listado de nómina XLSX'
+
+
+class RepartoUtilidadesXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.reparto_utilidades_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Reparto de utilidades XLSX'
+
+
+class ReportePrestamosXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.reporte_prestamos_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Reporte de préstamos XLSX'
+
+    def generate_xlsx_report(self, workbook, data, objs):
+        if data and data.get('todos'):
+            objs = self.env['employee.loan'].search([], order='employee_id')
+        return super().generate_xlsx_report(workbook, data, objs)
+
+
+class ReglasSalarialesXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.reglas_salariales_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Acumulados de conceptos XLSX'
+
+
+class AltasYBajasXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.altas_y_bajas_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Altas y bajas XLSX'
+
+
+class CajaAhorroXlsx(models.AbstractModel):
+    _name = 'report.nomina_cfdi_extras_ee.caja_ahorro_xlsx'
+    _inherit = 'report.nomina_cfdi_extras_ee.reporte_nomina_xlsx'
+    _description = 'Caja de ahorro XLSX'
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from . import test_simulacion
+from . import test_liquidacion
+from . import test_aguinaldo
+from . import test_aniversario
+from . import test_recalculo_sdi
+from . import test_reporte_prestamos
+from . import test_importar_dias
+from . import test_spreadsheet_reader
+from . import test_totales
+from . import test_sua
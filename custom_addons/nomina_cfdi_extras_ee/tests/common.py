@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from odoo.tests import common
+
+# code, secuencia, categoría, fórmula
+REGLAS = [
+    ('P001', 10, 'BASIC', 'result = contract.wage / 30 * (worked_days.WORK100 and worked_days.WORK100.number_of_days or 0)'),
+    ('TPER', 100, 'AUX', 'result = categories.BASIC + categories.ALW'),
+    ('NET', 500, 'NET', 'result = categories.BASIC + categories.ALW - categories.DED'),
+]
+
+
+class NominaExtrasCommon(common.TransactionCase):
+    """ Empresa mínima para los motores de nómina: una tabla CFDI con antigüedades, una
+        estructura con sueldo, total de percepciones y neto, y un empleado con contrato
+        abierto. La empresa no timbra para no pedir los datos del CFDI. """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = cls.env.company
+        cls.company.company_cfdi = False
+        cls.tablas = cls.env['tablas.cfdi'].create({
+            'name': 'Pruebas extras',
+            'uma': 113.14,
+            'salario_minimo': 278.80,
+            'tabla_antiguedades': [(0, 0, {'antiguedad': a, 'vacaciones': v, 'prima_vac': 25, 'aguinaldo': 15})
+                                   for a, v in [(1, 12), (2, 14), (3, 16), (4, 18), (5, 20)]],
+        })
+        cls.structure = cls.env['hr.payroll.structure'].create({
+            'name': 'Pruebas extras',
+            'code': 'EXTRAS',
+            'rule_ids': [(0, 0, {
+                'name': code,
+                'code': code,
+                'sequence': sequence,
+                'category_id': cls._get_category(category).id,
+                'condition_select': 'none',
+                'amount_select': 'code',
+                'amount_python_compute': formula,
+            }) for code, sequence, category, formula in REGLAS],
+        })
+        cls.employee = cls._create_employee('Empleado pruebas', '1')
+        cls.contract = cls._create_contract(cls.employee, date(2020, 3, 1), 9000.0)
+
+    @classmethod
+    def _get_category(cls, code):
+        category = cls.env['hr.salary.rule.category'].search([('code', '=', code)], limit=1)
+        return category or cls.env['hr.salary.rule.category'].create({'name': code, 'code': code})
+
+    @classmethod
+    def _create_employee(cls, name, no_empleado):
+        return cls.env['hr.employee'].create({
+            'name': name,
+            'no_empleado': no_empleado,
+            'company_id': cls.company.id,
+        })
+
+    @classmethod
+    def _create_contract(cls, employee, date_start, wage):
+        return cls.env['hr.contract'].create({
+            'name': 'Contrato %s' % employee.name,
+            'employee_id': employee.id,
+            'company_id': cls.company.id,
+            'struct_id': cls.structure.id,
+            'tablas_cfdi_id': cls.tablas.id,
+            'resource_calendar_id': cls.company.resource_calendar_id.id,
+            'date_start': date_start,
+            'wage': wage,
+            'sueldo_diario': wage / 30,
+            'sueldo_diario_integrado': wage / 30,
+            'sueldo_base_cotizacion': wage / 30,
+            'state': 'open',
+        })
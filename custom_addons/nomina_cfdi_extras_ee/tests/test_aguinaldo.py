@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from .common import NominaExtrasCommon
+
+
+class TestAguinaldo(NominaExtrasCommon):
+
+    def test_calcular(self):
+        # contrato del año: aguinaldo proporcional con el renglón de 1 año
+        nuevo = self._create_contract(self._create_employee('Nuevo', '2'), date(2026, 7, 1), 6000.0)
+        sin_tabla = self._create_contract(self._create_employee('Sin tabla', '3'), date(2024, 1, 1), 9000.0)
+        sin_tabla.tablas_cfdi_id = False
+        calculos = self.env['nomina.aguinaldo'].calcular(self.contract | nuevo | sin_tabla, '2026')
+
+        completo = calculos[self.contract.id]
+        self.assertFalse(completo['error'])
+        self.assertEqual(completo['dias'], 365)
+        self.assertEqual(completo['faltas'], 0)
+        self.assertAlmostEqual(completo['dias_aguinaldo'], 15.0)
+        self.assertAlmostEqual(completo['monto'], 15 * 300.0)
+        self.assertAlmostEqual(completo['exento'], 30 * 113.14)
+        self.assertAlmostEqual(completo['gravado'], 15 * 300.0 - 30 * 113.14)
+
+        proporcional = calculos[nuevo.id]
+        self.assertEqual(proporcional['dias'], 184)
+        self.assertAlmostEqual(proporcional['dias_aguinaldo'], 15 * 184 / 365.0)
+        self.assertAlmostEqual(proporcional['gravado'], 0.0)
+
+        self.assertTrue(calculos[sin_tabla.id]['error'])
+
+    def test_generar_procesamiento(self):
+        batch, errores = self.env['nomina.aguinaldo'].generar_procesamiento(
+            self.employee, '2026', date(2026, 12, 15), date(2026, 12, 15))
+        self.assertFalse(errores)
+        self.assertEqual(batch.slip_ids.employee_id, self.employee)
+        inputs = {line.code: line.amount for line in batch.slip_ids.input_line_ids}
+        self.assertAlmostEqual(inputs['DAGUI'], 15 * 349 / 365.0)
+        self.assertAlmostEqual(inputs['PAGUI'], inputs['PAGUI_EXE'] + inputs['PAGUI_GRAV'])
+
+    def test_anos_asistente(self):
+        ano = str(date.today().year)
+        wizard = self.env['calculo.aguinaldo'].create({})
+        self.assertEqual(wizard.ano, ano)
+        self.assertIn((ano, ano), self.env['calculo.aguinaldo']._fields['ano']._description_selection(self.env))
+
+    def test_aplicar_en_procesamiento(self):
+        batch = self.env['hr.payslip.run'].create({
+            'name': 'Aguinaldo', 'date_start': date(2026, 12, 1), 'date_end': date(2026, 12, 15)})
+        payslip = self.env['hr.payslip'].create({
+            'employee_id': self.employee.id,
+            'contract_id': self.contract.id,
+            'struct_id': self.structure.id,
+            'date_from': date(2026, 12, 1),
+            'date_to': date(2026, 12, 15),
+            'payslip_run_id': batch.id,
+        })
+        aguinaldo = self.env['nomina.aguinaldo']
+        self.assertFalse(aguinaldo.aplicar_en_procesamiento(batch, '2026', date(2026, 6, 30)))
+        # la segunda vez se actualizan las mismas entradas con el nuevo corte
+        self.assertFalse(aguinaldo.aplicar_en_procesamiento(batch, '2026'))
+        inputs = {line.code: line.amount for line in payslip.input_line_ids}
+        self.assertEqual(len(payslip.input_line_ids), 4)
+        self.assertAlmostEqual(inputs['DAGUI'], 15.0)
+        self.assertAlmostEqual(inputs['PAGUI'], 15 * 300.0)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from .common import NominaExtrasCommon
+
+
+class TestAniversario(NominaExtrasCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company.nomina_mail = 'nomina@example.com'
+        cls.diciembre = cls._create_contract(cls._create_employee('Diciembre', '2'), date(2020, 12, 30), 9000.0)
+        cls.enero = cls._create_contract(cls._create_employee('Enero', '3'), date(2021, 1, 2), 9000.0)
+
+    def _vacaciones(self, contract):
+        return self.env['tablas.vacaciones.line'].search([('form_id', '=', contract.id)])
+
+    def test_fechas_aniversario(self):
+        fechas = self.env['res.company']._get_fechas_aniversario(
+            self.contract | self.diciembre | self.enero, date(2025, 12, 29), date(2026, 1, 4))
+        self.assertEqual(fechas, {self.diciembre.id: date(2025, 12, 30), self.enero.id: date(2026, 1, 2)})
+
+    def test_semana_de_ano_nuevo(self):
+        company_obj = self.env['res.company']
+        company_obj.contract_warning_mail_cron(date(2025, 12, 29))
+        # cada contrato con el año de su aniversario y 5 años de antigüedad
+        self.assertEqual([(line.ano, line.dias) for line in self._vacaciones(self.diciembre)], [('2025', 20)])
+        self.assertEqual([(line.ano, line.dias) for line in self._vacaciones(self.enero)], [('2026', 20)])
+        self.assertFalse(self._vacaciones(self.contract))
+        incidencias = self.env['incidencias.nomina'].search([('contract_id', 'in', (self.diciembre | self.enero).ids)])
+        self.assertEqual(len(incidencias), 2)
+
+        # la corrida del 1 de enero no vuelve a otorgar las vacaciones de la semana
+        company_obj.contract_warning_mail_cron(date(2026, 1, 1))
+        self.assertEqual(len(self._vacaciones(self.diciembre)), 1)
+        self.assertEqual(len(self._vacaciones(self.enero)), 1)
+
+        # y el renglón de 2026 de enero no bloquea el aniversario de diciembre de 2026
+        company_obj.contract_warning_mail_cron(date(2026, 12, 28))
+        self.assertEqual(sorted(self._vacaciones(self.diciembre).mapped('ano')), ['2025', '2026'])
+        self.assertEqual(len(self._vacaciones(self.enero)), 1)
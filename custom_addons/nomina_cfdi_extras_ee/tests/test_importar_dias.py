@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import base64
+from datetime import date
+from unittest.mock import patch
+
+from ..wizard import importar_dias_wizard
+from .common import NominaExtrasCommon
+
+
+class TestImportarDias(NominaExtrasCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.batch = cls.env['hr.payslip.run'].create({
+            'name': 'Importar días',
+            'date_start': date(2026, 3, 1),
+            'date_end': date(2026, 3, 15),
+        })
+        cls.payslip = cls.env['hr.payslip'].create({
+            'employee_id': cls.employee.id,
+            'contract_id': cls.contract.id,
+            'struct_id': cls.structure.id,
+            'date_from': date(2026, 3, 1),
+            'date_to': date(2026, 3, 15),
+            'payslip_run_id': cls.batch.id,
+        })
+
+    def _importar(self, contenido):
+        wizard = self.env['importar.dias.wizard.xls'].create({
+            'import_file': base64.b64encode(contenido.encode()),
+            'file_name': 'dias.csv',
+        })
+        # bloques de una fila para que el mismo código llegue en bloques distintos
+        with patch.object(importar_dias_wizard, 'IMPORT_CHUNK_SIZE', 1):
+            return wizard.with_context(active_id=self.batch.id, active_model='hr.payslip.run').import_xls_file()
+
+    def test_bloques_y_renglones(self):
+        result = self._importar('\n'.join([
+            'No,Descripcion,Codigo,Dias,Horas',
+            '',
+            '1,Faltas,FI,1,8',
+            '99,Faltas,FI,1,8',
+            '1,Faltas,FI,2,16',
+        ]))
+        lines = self.payslip.worked_days_line_ids.filtered(lambda x: x.code == 'FI')
+        # la fila del segundo bloque actualiza la línea creada en el primero
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines.number_of_days, 2)
+        # el error lleva el renglón de la hoja (con encabezado y fila vacía)
+        log = self.env['import.logs'].browse(result['res_id'])
+        self.assertTrue(log.name.startswith('Línea 4:'), log.name)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from .common import NominaExtrasCommon
+
+
+class TestLiquidacion(NominaExtrasCommon):
+
+    def _opciones(self, **values):
+        opciones = {
+            'fecha_liquidacion': date(2026, 3, 31),
+            'tipo_de_baja': '02',
+            'sueldo_calculo': '01',
+            'indemnizacion': True,
+            'dias_base': 90,
+            'dias_x_ano': 20,
+            'antiguedad': True,
+            'tope_prima': '01',
+            'round_antiguedad': False,
+            'pago_separacion': 1000.0,
+            'fechas_inicio': {self.employee.id: date(2026, 3, 16)},
+        }
+        if 'om_hr_payroll_account_ee' in self.env['ir.module.module']._installed():
+            opciones['journal_id'] = self.env['account.journal'].search([('type', '=', 'general')], limit=1).id
+        opciones.update(values)
+        return opciones
+
+    def test_calcular(self):
+        sin_tabla = self._create_contract(self._create_employee('Sin tabla', '2'), date(2024, 1, 1), 9000.0)
+        sin_tabla.tablas_cfdi_id = False
+        futuro = self._create_contract(self._create_employee('Contrato futuro', '3'), date(2026, 6, 1), 9000.0)
+        calculo, error_tabla, error_fecha = self.env['nomina.liquidacion'].calcular(
+            self.contract | sin_tabla | futuro, self._opciones())
+
+        self.assertFalse(calculo['error'])
+        anos = (date(2026, 3, 31) - date(2020, 3, 1)).days / 365.0
+        self.assertAlmostEqual(calculo['antiguedad_anos'], anos)
+        self.assertEqual(calculo['dias_pendientes_pagar'], 16)
+        # renglón de 5 años: 15 días de aguinaldo, 20 de vacaciones y 25% de prima
+        self.assertAlmostEqual(calculo['dias_aguinaldo'], 15 * 90 / 365.0)
+        self.assertAlmostEqual(calculo['dias_vacaciones'], 31 / 365.0 * 20)
+        self.assertAlmostEqual(calculo['dias_prima_vac'], 31 / 365.0 * 20 * 0.25)
+        self.assertAlmostEqual(calculo['monto_indemnizacion'], (anos * 20 + 90) * 300.0)
+        self.assertAlmostEqual(calculo['monto_prima_antiguedad'], round(anos, 2) * 12 * 300.0)
+        self.assertEqual(calculo['pago_separacion'], 1000.0)
+
+        self.assertTrue(error_tabla['error'])
+        self.assertTrue(error_fecha['error'])
+
+    def test_generar(self):
+        opciones = self._opciones()
+        calculos = self.env['nomina.liquidacion'].calcular(self.contract, opciones)
+        batch = self.env['nomina.liquidacion'].generar(calculos, opciones)
+        # ordinaria con los días pendientes y extraordinaria de finiquito por la baja '02'
+        self.assertEqual(len(batch.slip_ids), 2)
+        ordinaria = batch.slip_ids.filtered(lambda x: x.tipo_nomina == 'O')
+        extraordinaria = batch.slip_ids - ordinaria
+        self.assertEqual(ordinaria.date_from, date(2026, 3, 16))
+        self.assertEqual(ordinaria.worked_days_line_ids.filtered(lambda x: x.code == 'WORK100').number_of_days, 16)
+        self.assertAlmostEqual(extraordinaria.input_line_ids.filtered(lambda x: x.code == 'IND').amount,
+                               calculos[0]['monto_indemnizacion'])
+
+    def test_generar_periodicidad(self):
+        self.contract.periodicidad_pago = '04'
+        semanal = self._create_contract(self._create_employee('Semanal', '2'), date(2026, 1, 1), 7000.0)
+        semanal.periodicidad_pago = '02'
+        opciones = self._opciones()
+        liquidacion = self.env['nomina.liquidacion']
+        batch = liquidacion.generar(liquidacion.calcular(self.contract, opciones), opciones)
+        self.assertEqual(batch.periodicidad_pago, '04')
+        # periodicidades distintas: 'Otra periodicidad', no la del primer contrato
+        batch = liquidacion.generar(liquidacion.calcular(self.contract | semanal, opciones), opciones)
+        self.assertEqual(batch.periodicidad_pago, '99')
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date, timedelta
+
+from .common import NominaExtrasCommon
+
+
+class TestRecalculoSdi(NominaExtrasCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        today = date.today()
+        cls.menos_de_un_ano = cls._create_contract(
+            cls._create_employee('Menos de un año', '2'), today - timedelta(days=180), 9000.0)
+        # antigüedad de exactamente 3 años: (hoy - inicio + 1 día) / 365 = 3
+        cls.tres_anos = cls._create_contract(
+            cls._create_employee('Tres años', '3'), today - timedelta(days=3 * 365 - 1), 12000.0)
+        cls.sin_renglon = cls._create_contract(
+            cls._create_employee('Sin renglón', '4'), today - timedelta(days=180), 9000.0)
+        cls.sin_renglon.tablas_cfdi_id = cls.env['tablas.cfdi'].create({
+            'name': 'Pruebas sin primer año',
+            'uma': 113.14,
+            'salario_minimo': 278.80,
+            'tabla_antiguedades': [(0, 0, {'antiguedad': 0.1, 'vacaciones': 12, 'prima_vac': 25, 'aguinaldo': 15})],
+        })
+
+    def test_calcular_como_contrato(self):
+        contracts = self.contract | self.menos_de_un_ano | self.tres_anos | self.sin_renglon
+        calculos = self.env['nomina.recalculo.sdi'].calcular(contracts)
+        self.assertEqual([calculo['contract'] for calculo in calculos], list(contracts))
+        for calculo in calculos:
+            contract = calculo['contract']
+            sdi = contract.calculate_sueldo_diario_integrado()
+            if sdi is None:
+                self.assertTrue(calculo['error'], contract.employee_id.name)
+                self.assertEqual(calculo['sdi'], contract.sueldo_diario_integrado)
+                continue
+            self.assertFalse(calculo['error'], contract.employee_id.name)
+            self.assertAlmostEqual(calculo['sdi'], sdi, msg=contract.employee_id.name)
+            self.assertAlmostEqual(calculo['sbc'], contract.calculate_sueldo_base_cotizacion(), msg=contract.employee_id.name)
+        # menos de un año con el renglón de 1 año y 3 años exactos con el de 3
+        self.assertAlmostEqual(calculos[1]['sdi'], (365 + 15 + 12 * 0.25) / 365.0 * 300.0)
+        self.assertAlmostEqual(calculos[2]['sdi'], (365 + 15 + 16 * 0.25) / 365.0 * 400.0)
+        self.assertTrue(calculos[3]['error'])
+
+    def test_aplicar_y_cancelar(self):
+        recalculo = self.env['nomina.recalculo.sdi']
+        contracts = self.menos_de_un_ano | self.tres_anos
+        incidencias = recalculo.aplicar(recalculo.calcular(contracts))
+        self.assertEqual(incidencias.contract_id, contracts)
+        self.assertAlmostEqual(self.tres_anos.sueldo_diario_integrado, (365 + 15 + 16 * 0.25) / 365.0 * 400.0)
+        historial = self.env['contract.historial.salario'].search([('contract_id', 'in', contracts.ids)])
+        self.assertEqual(historial.contract_id, contracts)
+
+        # cancelar la incidencia de un contrato sólo borra su historial
+        incidencias.filtered(lambda x: x.contract_id == self.tres_anos).action_cancelar()
+        self.assertAlmostEqual(self.tres_anos.sueldo_diario_integrado, 400.0)
+        self.assertEqual(historial.exists().contract_id, self.menos_de_un_ano)
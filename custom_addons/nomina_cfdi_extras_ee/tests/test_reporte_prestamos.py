@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+import io
+import zipfile
+
+from .common import NominaExtrasCommon
+
+
+class TestReportePrestamos(NominaExtrasCommon):
+
+    def test_exporta_todos_desde_seleccion(self):
+        loan_type = self.env['employee.loan.type'].create({
+            'name': 'Pruebas', 'loan_limit': 5000, 'loan_term': 12, 'periodo_de_pago': 'Quincenal'})
+        loans = self.env['employee.loan'].create([{
+            'employee_id': employee.id,
+            'loan_type_id': loan_type.id,
+            'loan_amount': 1000,
+            'term': 10,
+            'notes': 'Pruebas',
+        } for employee in self.employee | self._create_employee('Segundo', '2')])
+
+        # acción de servidor desde la lista con sólo el primer préstamo seleccionado
+        action = loans[0].with_context(active_model='employee.loan', active_ids=loans[0].ids) \
+            .xls_generate_for_employee_loans()
+        report = self.env['ir.actions.report'].with_context(active_model='employee.loan', active_ids=loans[0].ids)
+        content, report_type = report._render_xlsx(action['report_name'], None, action['data'])
+        self.assertEqual(report_type, 'xlsx')
+        with zipfile.ZipFile(io.BytesIO(content)) as xlsx:
+            sheet = xlsx.read('xl/worksheets/sheet1.xml').decode()
+        for loan in loans:
+            self.assertIn(loan.employee_id.name, sheet)
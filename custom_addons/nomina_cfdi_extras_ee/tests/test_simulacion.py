@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from .common import NominaExtrasCommon
+
+
+class TestSimulacion(NominaExtrasCommon):
+
+    def _escenario(self, **values):
+        escenario = {
+            'employee_id': self.employee.id,
+            'date_from': date(2026, 1, 1),
+            'date_to': date(2026, 1, 15),
+            'worked_days': [{'code': 'WORK100', 'name': 'Días', 'number_of_days': 15, 'number_of_hours': 120}],
+        }
+        escenario.update(values)
+        return escenario
+
+    def test_simular_cambio_de_sueldo(self):
+        actual, cambio = self.env['hr.payslip'].simular([
+            self._escenario(),
+            self._escenario(contract_values={'wage': 12000.0}),
+        ])
+        self.assertFalse(actual['error'])
+        self.assertFalse(cambio['error'])
+        self.assertEqual(actual['contract_id'], self.contract.id)
+        self.assertAlmostEqual(actual['lines']['P001'], 4500.0)
+        self.assertAlmostEqual(actual['total_nom'], 4500.0)
+        # las reglas leen el sueldo del escenario, no el del contrato guardado
+        self.assertAlmostEqual(cambio['lines']['P001'], 6000.0)
+        self.assertAlmostEqual(cambio['lines']['NET'], 6000.0)
+        self.assertEqual(self.contract.wage, 9000.0)
+        self.assertFalse(self.env['hr.payslip'].search([('employee_id', '=', self.employee.id)]))
+
+    def test_simular_sin_contrato(self):
+        employee = self._create_employee('Sin contrato', '2')
+        resultado, = self.env['hr.payslip'].simular([self._escenario(employee_id=employee.id)])
+        self.assertTrue(resultado['error'])
+        self.assertEqual(resultado['lines'], {})
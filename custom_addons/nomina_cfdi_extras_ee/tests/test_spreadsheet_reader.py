@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import common
+
+from ..wizard import spreadsheet_reader
+
+
+class TestSpreadsheetReader(common.BaseCase):
+
+    def test_csv_cp1252_punto_y_coma(self):
+        content = 'No;Nombre;Monto\n1;Peña;1,5\n\n2;José;3\n'.encode('cp1252')
+        self.assertEqual(list(spreadsheet_reader.iter_rows(content, 'dias.csv', row_numbers=True)),
+                         [(2, ['1', 'Peña', '1,5']), (4, ['2', 'José', '3'])])
+
+    def test_csv_utf8_comas(self):
+        content = '﻿No,Nombre\n1,"Peña, Ana"\n'.encode('utf-8')
+        self.assertEqual(list(spreadsheet_reader.iter_rows(content, 'dias.csv')), [['1', 'Peña, Ana']])
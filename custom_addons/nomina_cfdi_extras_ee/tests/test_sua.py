@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import common
+
+from ..models.nomina_sua import IDSE_MOVIMIENTOS, _cifra, _desbordes, _linea
+
+
+class TestSua(common.BaseCase):
+
+    def test_cifras_sin_recortar(self):
+        layout = [('nombre', 5, 'A'), ('sbc', 6, 'N')]
+        self.assertEqual(_linea(layout, {'nombre': 'JUAN PEREZ', 'sbc': _cifra(999.99)}), 'JUAN 099999')
+        # un SBC de 10,000.00 o más no cabe en las 6 posiciones del IDSE
+        values = {'sbc': _cifra(10000.0)}
+        self.assertEqual(_desbordes(IDSE_MOVIMIENTOS, values), [('sbc', '1000000', 6)])
+        with self.assertRaises(ValueError):
+            _linea(IDSE_MOVIMIENTOS, values)
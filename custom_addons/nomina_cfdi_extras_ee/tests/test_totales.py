@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from .common import NominaExtrasCommon
+
+
+class TestTotales(NominaExtrasCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.batch = cls.env['hr.payslip.run'].create({
+            'name': 'Totales',
+            'date_start': date(2026, 3, 1),
+            'date_end': date(2026, 3, 15),
+        })
+        cls.payslip = cls.env['hr.payslip'].create({
+            'employee_id': cls.employee.id,
+            'contract_id': cls.contract.id,
+            'struct_id': cls.structure.id,
+            'date_from': date(2026, 3, 1),
+            'date_to': date(2026, 3, 15),
+            'payslip_run_id': cls.batch.id,
+        })
+        cls.rule = cls.structure.rule_ids.filtered(lambda x: x.code == 'P001')
+        cls.line = cls.env['hr.payslip.line'].create({
+            'slip_id': cls.payslip.id,
+            'salary_rule_id': cls.rule.id,
+            'employee_id': cls.employee.id,
+            'contract_id': cls.contract.id,
+            'name': cls.rule.name,
+            'code': 'P001',
+            'category_id': cls.rule.category_id.id,
+            'amount': 4500.0,
+            'quantity': 1.0,
+            'rate': 100.0,
+        })
+
+    def _totales(self, aggregates=('total',)):
+        return self.env['hr.payslip.run.total'].get_totals(self.batch, 'slip_id', aggregates=aggregates)[self.payslip.id]
+
+    def test_linea_y_regla(self):
+        self.assertEqual(self._totales(), {'P001': 4500.0})
+        self.assertEqual(self._totales(('efectivo', 'especie')), {'efectivo': 4500.0, 'especie': 0.0})
+
+        # línea editada directamente
+        self.line.amount = 5000.0
+        self.assertEqual(self._totales(), {'P001': 5000.0})
+
+        # forma de pago de la regla
+        self.rule.forma_pago = '002'
+        self.assertEqual(self._totales(('efectivo', 'especie')), {'efectivo': 0.0, 'especie': 5000.0})
+
+        self.line.unlink()
+        self.assertFalse(self.env['hr.payslip.run.total'].get_totals(self.batch, 'slip_id'))
@@ -15,3 +15,8 @@ from . import reporte_imss
 from . import wizard_isn
 from . import nomina_liquidaciones
 from . import year_repato_utilides
+from . import exportar_sua_idse
+from . import retroactivo_salario
+from . import liquidaciones_masivas
+from . import calculo_aguinaldo
+from . import recalculo_sdi
@@ -5,11 +5,6 @@ from collections import defaultdict
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from collections import defaultdict
-import io
-import xlwt
-import itertools
-from odoo.tools.misc import xlwt
-import base64
 
 class AltasYBajas(models.TransientModel):
     _name = 'altas.y.bajas'
@@ -18,9 +13,11 @@ class AltasYBajas(models.TransientModel):
     start_date = fields.Date("Fecha inicio")
     end_date = fields.Date("Fecha fin")
     tipo = fields.Selection([('altas','Altas'),('bajas','Bajas')], string='Tipo')
-    file_data = fields.Binary("File Data")
     
     def print_altas_y_bajas_report(self):
+        return self.env.ref('nomina_cfdi_extras_ee.action_altas_y_bajas_xlsx').report_action(self)
+
+    def _write_xlsx_report(self, workbook):
         domain = []
         if self.start_date:
             domain.append(('fecha','>=', self.start_date))
@@ -34,15 +31,9 @@ class AltasYBajas(models.TransientModel):
 
         incidencias = self.env['incidencias.nomina'].search(domain)
 
-        workbook = xlwt.Workbook()
-        worksheet = workbook.add_sheet('Altas y Bajas')
-        col_width = 256 * 20
-        try:
-            for i in itertools.count():
-                worksheet.col(i).width = col_width
-        except ValueError:
-            pass
-        bold = xlwt.easyxf("font: bold on;")
+        worksheet = workbook.add_worksheet('Altas y Bajas')
+        worksheet.set_column(0, 8, 20)
+        bold = workbook.add_format({'bold': True})
         
         company = self.env.user.company_id
         start_date = self.start_date and self.start_date.strftime('%d/%m/%Y') or ''
@@ -88,21 +79,6 @@ class AltasYBajas(models.TransientModel):
             worksheet.write(row, 7, seguro_social)
             worksheet.write(row, 8, curp)
             row += 1
-            
-        fp = io.BytesIO()
-        workbook.save(fp)
-        fp.seek(0)
-        data = fp.read()
-        fp.close()
-        
-        self.write({'file_data':base64.b64encode(data)})
-        action = {
-            'name': 'Altas y Bajas',
-            'type': 'ir.actions.act_url',
-            'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_data&download=true&filename=altas_y_bajas.xls",
-            'target': 'self',
-            }
-        return action
     
     
         
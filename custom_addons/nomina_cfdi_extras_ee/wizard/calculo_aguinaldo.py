@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from datetime import date
+
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+
+
+def _get_anos(self):
+    """ Año actual y los cuatro anteriores. """
+    ano = date.today().year
+    return [(str(y), str(y)) for y in range(ano, ano - 5, -1)]
+
+
+class CalculoAguinaldo(models.TransientModel):
+    _name = 'calculo.aguinaldo'
+    _description = 'Cálculo de aguinaldo'
+
+    ano = fields.Selection(_get_anos, "Año", required=True, default=lambda self: str(date.today().year))
+    fecha_corte = fields.Date(string='Fecha de corte')
+    fecha_pago = fields.Date(string='Fecha de pago')
+    payslip_run_id = fields.Many2one('hr.payslip.run', 'Procesamiento de nómina', domain=[('state', '=', 'draft')])
+    employee_ids = fields.Many2many('hr.employee', string='Empleados')
+
+    def action_aplicar(self):
+        aguinaldo = self.env['nomina.aguinaldo']
+        if self.payslip_run_id:
+            batch = self.payslip_run_id
+            errores = aguinaldo.aplicar_en_procesamiento(batch, self.ano, self.fecha_corte)
+        else:
+            if not self.fecha_pago:
+                raise UserError(_('Falta colocar una fecha para la nómina'))
+            employees = self.employee_ids or self.env['hr.contract'].search([('state', '=', 'open')]).employee_id
+            batch, errores = aguinaldo.generar_procesamiento(employees, self.ano, self.fecha_pago, self.fecha_corte)
+        if errores:
+            log = self.env['import.logs'].create({'name': '\n'.join(
+                _('%s %s: %s') % (employee.no_empleado or '', employee.name, error)
+                for employee, error in errores.items())})
+            return {
+                'name': _('Empleados sin aguinaldo'),
+                'view_mode': 'form',
+                'res_id': log.id,
+                'res_model': 'import.logs',
+                'type': 'ir.actions.act_window',
+                'target': 'new',
+            }
+        return {
+            'name': batch.name,
+            'view_mode': 'form',
+            'res_id': batch.id,
+            'res_model': 'hr.payslip.run',
+            'type': 'ir.actions.act_window',
+        }
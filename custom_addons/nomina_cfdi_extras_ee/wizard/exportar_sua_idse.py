@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import base64
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+class ExportarSuaIdse(models.TransientModel):
+    _name = 'exportar.sua.idse'
+    _description = 'Exportar SUA / IDSE'
+
+    tablas_cfdi_id = fields.Many2one('tablas.cfdi', 'Tabla CFDI', required=True,
+                                     default=lambda self: self.env['tablas.cfdi'].search([], limit=1))
+    periodo_id = fields.Many2one('tablas.periodo.bimestral', 'Bimestre', required=True,
+                                 domain="[('form_id', '=', tablas_cfdi_id)]")
+    registro_patronal_ids = fields.Many2many('registro.patronal', string='Registros patronales',
+                                             help='Vacío para todos los registros patronales.')
+    file_content = fields.Binary("Archivo")
+
+    @api.onchange('tablas_cfdi_id')
+    def _onchange_tablas_cfdi_id(self):
+        if self.periodo_id.form_id != self.tablas_cfdi_id:
+            self.periodo_id = self.tablas_cfdi_id.tabla_bimestral.filtered(
+                lambda x: x.dia_inicio and x.dia_fin and x.dia_inicio <= fields.Date.today() <= x.dia_fin)[:1]
+
+    def action_exportar(self):
+        self.ensure_one()
+        if not self.periodo_id.dia_inicio or not self.periodo_id.dia_fin:
+            raise UserError(_('El bimestre seleccionado no tiene fechas configuradas.'))
+        contenido, errores = self.env['nomina.sua'].generar(
+            self.periodo_id.dia_inicio, self.periodo_id.dia_fin, self.registro_patronal_ids or None)
+        if errores:
+            log = self.env['import.logs'].create({'name': '\n'.join(errores)})
+            return {
+                'name': _('Errores de validación SUA / IDSE'),
+                'view_mode': 'form',
+                'res_id': log.id,
+                'res_model': 'import.logs',
+                'type': 'ir.actions.act_window',
+                'target': 'new',
+            }
+        if not contenido:
+            raise UserError(_('No hay trabajadores ni movimientos en el bimestre seleccionado.'))
+        filename = 'SUA_IDSE_%s.zip' % self.periodo_id.dia_inicio.strftime('%Y%m')
+        self.write({'file_content': base64.b64encode(contenido)})
+        return {
+                'type' : 'ir.actions.act_url',
+                'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_content&download=true&filename="+filename+'&mimetype=application/zip',
+                'target':'self',
+                }
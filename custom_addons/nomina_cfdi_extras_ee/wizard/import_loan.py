@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models,api, fields
+from odoo.exceptions import UserError
 import base64
-import xlrd
-from datetime import datetime
+from . import spreadsheet_reader
+
+IMPORT_CHUNK_SIZE = 1000
 
 
 class import_loan(models.TransientModel):
@@ -14,21 +16,14 @@ class import_loan(models.TransientModel):
     csv_file = fields.Binary(string='Archivo')
     
    
-    def get_employee_id(self,name):
-        emp_id = self.env['hr.employee'].search([('name','=',name)],limit=1)
-        if emp_id:
-            return emp_id
-        else:
-            return False
-            
-   
-    def get_loan_type(self,name):
-        type_id = self.env['employee.loan.type'].search([('name','=',name)],limit=1)
-        if type_id:
-            return type_id
-        else:
-            return False
-    
+    def _get_records_by_name(self, model, names):
+        """ {nombre: registro} de los nombres dados, con una sola búsqueda. """
+        records = {}
+        names = list({name for name in names if name})
+        if names:
+            for record in self.env[model].search([('name', 'in', names)]):
+                records.setdefault(record.name, record)
+        return records
     
    
     def add_in_remark(self,remark,coment):
@@ -39,77 +34,70 @@ class import_loan(models.TransientModel):
         return remark
         
    
-    def get_check_employee_loan(self,employee_id):
-        now = datetime.now()
-        year = now.year
-        s_date = str(year)+'-01-01'
-        e_date = str(year)+'-12-01'
-        loan_ids = self.env['employee.loan'].search([('employee_id','=',employee_id.id),('date','<=',e_date),('date','>=',s_date)])
-        return len(loan_ids)
+    def _import_loan_rows(self, lines, first_line):
+        """ Valida y crea los préstamos de un bloque de filas: empleados y tipos de préstamo se
+            resuelven con una búsqueda cada uno y los préstamos del año por empleado con un
+            solo GROUP BY. Regresa los préstamos creados y los mensajes de las filas omitidas. """
+        loan_obj = self.env['employee.loan']
+        employees = self._get_records_by_name('hr.employee', [line[0] for line in lines])
+        loan_types = self._get_records_by_name('employee.loan.type', [line[3] for line in lines])
+        loan_count = loan_obj._get_loan_count_by_employee(
+            self.env['hr.employee'].concat(*employees.values()))
         
-        
-    
-   
-    def import_loan(self):
-        lines =[]
-        if self.file_type == 'csv':
-            file_data = base64.decodestring(self.csv_file)
-            csv_data = str(file_data.decode("utf-8")) 
-            csv_data = csv_data.split('\n')
-            for csv_line in csv_data:
-                if csv_line:
-                    lines.append(csv_line.split(','))
-            lines.pop(0)
-        else:
-            file_datas = base64.decodestring(self.csv_file) 
-            workbook = xlrd.open_workbook(file_contents=file_datas)
-            sheet = workbook.sheet_by_index(0)
-            lines = [[sheet.cell_value(r, c) for c in range(sheet.ncols)] for r in range(sheet.nrows)]
-            lines.pop(0)
-            
-        count = 1
-        logs = ''
-        for line in lines:
-            count += 1
-            remark =''
-            employee_id = self.get_employee_id(line[0])
+        vals_list = []
+        logs = []
+        for count, line in enumerate(lines, first_line):
+            remark = ''
+            employee_id = employees.get(line[0])
             if not employee_id:
                 remark = self.add_in_remark(remark,'Employee')
-            else:
-                emp_loan = self.get_check_employee_loan(employee_id)
-                if emp_loan >= employee_id.loan_request:
-                    remark = self.add_in_remark(remark,'Employee Can not create more then '+ str(employee_id.loan_request))+' Loans'
-                
-            manager_id = self.get_employee_id(line[1])
-            if not manager_id:
-                remark = self.add_in_remark(remark,'Departnent Manager')
+            elif loan_count.get(employee_id.id, 0) >= employee_id.loan_request:
+                remark = self.add_in_remark(remark,'Employee Can not create more then '+ str(employee_id.loan_request))+' Loans'
                 
-            loan_type_id = self.get_loan_type(line[3])
+            loan_type_id = loan_types.get(line[3])
             if not loan_type_id:
                 remark = self.add_in_remark(remark,'Loan type')
-            if not remark:
-                res ={
-                    'employee_id':employee_id.id,
-                    'manager_id':manager_id.id,
-                    'job_id':employee_id.job_id and employee_id.job_id.id or False,
-                    'department_id':employee_id.department_id and employee_id.department_id.id or False,
-                    'payment_method':'by_payslip',
-                    'loan_amount':line[2],
-                    'loan_type_id':loan_type_id.id,
-                    'start_date':line[4],
-                    'term':loan_type_id.loan_term,
-                    'interest_rate':loan_type_id.interest_rate,
-                    'interest_type':loan_type_id.interest_type,
-                    'notes':line[5],
-                }
-                self.env['employee.loan'].create(res)
-            else:
-                remark = 'Line No:'+str(count)+' '+remark+' Not Match \n'
-                logs += remark
+            if remark:
+                logs.append('Line No:'+str(count)+' '+remark+' Not Match')
+                continue
+            # las filas anteriores del mismo archivo también cuentan para el límite
+            loan_count[employee_id.id] = loan_count.get(employee_id.id, 0) + 1
+            vals_list.append({
+                'employee_id':employee_id.id,
+                'job_id':employee_id.job_id.id,
+                'department_id':employee_id.department_id.id,
+                'payment_method':'by_payslip',
+                'loan_amount':line[2],
+                'loan_type_id':loan_type_id.id,
+                'start_date':line[4],
+                'term':loan_type_id.loan_term,
+                'interest_rate':loan_type_id.interest_rate,
+                'interest_type':loan_type_id.interest_type,
+                'notes':line[5],
+            })
+        return loan_obj.create(vals_list), logs
         
+    
+   
+    def import_loan(self):
+        try:
+            lines = spreadsheet_reader.iter_rows(base64.b64decode(self.csv_file))
+        except ValueError as e:
+            raise UserError(str(e))
+            
+        loans = self.env['employee.loan']
+        logs = []
+        count = 2
+        for chunk in spreadsheet_reader.iter_chunks(lines, IMPORT_CHUNK_SIZE):
+            chunk_loans, chunk_logs = self._import_loan_rows(chunk, count)
+            loans |= chunk_loans
+            logs += chunk_logs
+            count += len(chunk)
+        # cuotas de todos los préstamos importados en una sola pasada
+        loans.compute_installment()
         
         if logs:
-            log_id=self.env['import.logs'].create({'name':logs})
+            log_id=self.env['import.logs'].create({'name':'\n'.join(logs)})
             return {
                 'view_mode': 'form',
                 'res_id': log_id.id,
@@ -119,11 +107,6 @@ class import_loan(models.TransientModel):
                 'target': 'new',
             }
                 
-                    
-                
-                
-                
-                
         
 
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
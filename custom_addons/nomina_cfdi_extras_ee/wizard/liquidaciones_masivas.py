@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+class LiquidacionesMasivas(models.TransientModel):
+    _name = 'liquidaciones.masivas'
+    _description = 'Liquidaciones masivas'
+
+    employee_ids = fields.Many2many('hr.employee', string='Empleados')
+    fecha_liquidacion = fields.Date(string='Fecha liquidacion', required=True)
+    tipo_de_baja = fields.Selection([('01','Separación voluntaria'),
+                                      ('02','Baja')], string='Tipo de baja', required=True, default='01')
+    sueldo_calculo = fields.Selection([('01','Sueldo diario'),
+                                      ('02','Sueldo diario integrado')], string='Sueldo para cálculos', default='01')
+    antiguedad = fields.Boolean("Pagar antiguedad")
+    tope_prima = fields.Selection([('01','Salario minimo'),
+                                      ('02','UMA')], string='Para calculo topado usar', default='01')
+    round_antiguedad = fields.Boolean("Redondear antiguedad")
+    indemnizacion = fields.Boolean("Pagar indemnización")
+    dias_base = fields.Float('Días base', default=90)
+    dias_x_ano = fields.Float('Días por cada año trabajado', default=20)
+    pago_separacion = fields.Float("Pago por separación")
+    estructura = fields.Many2one('hr.payroll.structure', string='Estructura ordinaria')
+    journal_id = fields.Many2one("account.journal", 'Diario')
+    payslip_run_id = fields.Many2one("hr.payslip.run", 'Procesamiento', domain=[('state', '=', 'draft')])
+    line_ids = fields.One2many('liquidaciones.masivas.line', 'wizard_id', string='Liquidaciones')
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super(LiquidacionesMasivas, self).default_get(fields_list)
+        if self._context.get('active_model') == 'hr.employee' and self._context.get('active_ids'):
+            res['employee_ids'] = [(6, 0, self._context['active_ids'])]
+        return res
+
+    def _get_opciones(self):
+        return {
+            'fecha_liquidacion': self.fecha_liquidacion,
+            'tipo_de_baja': self.tipo_de_baja,
+            'sueldo_calculo': self.sueldo_calculo,
+            'antiguedad': self.antiguedad,
+            'tope_prima': self.tope_prima,
+            'round_antiguedad': self.round_antiguedad,
+            'indemnizacion': self.indemnizacion,
+            'dias_base': self.dias_base,
+            'dias_x_ano': self.dias_x_ano,
+            'pago_separacion': self.pago_separacion,
+            'estructura': self.estructura.id,
+            'journal_id': self.journal_id.id,
+            'payslip_run_id': self.payslip_run_id.id,
+        }
+
+    def action_calcular(self):
+        if not self.employee_ids:
+            raise UserError(_('Seleccione primero a los empleados.'))
+        sin_contrato = self.employee_ids.filtered(lambda x: not x.contract_id)
+        line_fields = self.env['liquidaciones.masivas.line']._fields
+        lines = [(5, 0, 0)]
+        for calculo in self.env['nomina.liquidacion'].calcular(
+                (self.employee_ids - sin_contrato).contract_id, self._get_opciones()):
+            lines.append((0, 0, {fname: value for fname, value in calculo.items() if fname in line_fields}))
+        for employee in sin_contrato:
+            lines.append((0, 0, {'employee_id': employee.id,
+                                 'error': _('El empleado %s no tiene contrato.') % employee.name}))
+        self.line_ids = lines
+        return {
+            'name': _('Liquidaciones masivas'),
+            'view_mode': 'form',
+            'res_id': self.id,
+            'res_model': self._name,
+            'type': 'ir.actions.act_window',
+            'target': 'new',
+        }
+
+    def action_generar(self):
+        if not self.line_ids:
+            raise UserError(_('Calcule primero las liquidaciones.'))
+        line_fields = ['employee_id', 'contract_id', 'fecha_inicio', 'dias_pendientes_pagar', 'dias_aguinaldo',
+                       'dias_vacaciones', 'dias_prima_vac', 'fondo_ahorro', 'monto_prima_antiguedad',
+                       'monto_indemnizacion', 'pago_separacion', 'error']
+        calculos = [{fname: line[fname].id if fname in ('employee_id', 'contract_id') else line[fname]
+                     for fname in line_fields} for line in self.line_ids]
+        batch = self.env['nomina.liquidacion'].generar(calculos, self._get_opciones())
+        return {
+            'name': batch.name,
+            'view_mode': 'form',
+            'res_id': batch.id,
+            'res_model': 'hr.payslip.run',
+            'type': 'ir.actions.act_window',
+        }
+
+
+class LiquidacionesMasivasLine(models.TransientModel):
+    _name = 'liquidaciones.masivas.line'
+    _description = 'Liquidación por empleado'
+
+    wizard_id = fields.Many2one('liquidaciones.masivas', ondelete='cascade')
+    employee_id = fields.Many2one('hr.employee', 'Empleado', readonly=True)
+    contract_id = fields.Many2one('hr.contract', 'Contrato', readonly=True)
+    fecha_inicio = fields.Date(string='Fecha inicio último periodo')
+    antiguedad_anos = fields.Float('Antiguedad', readonly=True)
+    sueldo_calculo_monto = fields.Float('Sueldo calculo monto', readonly=True)
+    dias_pendientes_pagar = fields.Float('Días de nómina a pagar')
+    dias_aguinaldo = fields.Float('Días aguinaldo')
+    dias_vacaciones = fields.Float('Días de vacaciones')
+    dias_prima_vac = fields.Float('Días prima vacacional')
+    fondo_ahorro = fields.Float('Fondo ahorro')
+    monto_prima_antiguedad = fields.Float('Prima antiguedad')
+    monto_indemnizacion = fields.Float('Indemnizacion')
+    pago_separacion = fields.Float("Pago por separación")
+    error = fields.Char('Error', readonly=True)
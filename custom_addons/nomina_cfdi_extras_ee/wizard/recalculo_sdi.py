@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+class RecalculoSdi(models.TransientModel):
+    _name = 'recalculo.sdi'
+    _description = 'Recálculo masivo de SDI'
+
+    fecha = fields.Date(string='Fecha', required=True, default=fields.Date.context_today)
+    tablas_cfdi_id = fields.Many2one('tablas.cfdi', string='Tabla CFDI')
+    solo_cambios = fields.Boolean('Solo contratos con cambio', default=True)
+    line_ids = fields.One2many('recalculo.sdi.line', 'wizard_id', string='Contratos')
+
+    def action_calcular(self):
+        domain = [('state', '=', 'open')]
+        if self.tablas_cfdi_id:
+            domain.append(('tablas_cfdi_id', '=', self.tablas_cfdi_id.id))
+        contracts = self.env['hr.contract'].search(domain)
+        if not contracts:
+            raise UserError(_('No hay contratos en proceso para recalcular.'))
+        lines = [(5, 0, 0)]
+        for calculo in self.env['nomina.recalculo.sdi'].calcular(contracts, self.fecha):
+            if self.solo_cambios and not calculo['error'] and round(calculo['sdi'], 2) == round(calculo['sdi_anterior'], 2) \
+                    and round(calculo['sbc'], 2) == round(calculo['sbc_anterior'], 2):
+                continue
+            lines.append((0, 0, {
+                'contract_id': calculo['contract'].id,
+                'employee_id': calculo['contract'].employee_id.id,
+                'sdi_anterior': calculo['sdi_anterior'],
+                'sdi': calculo['sdi'],
+                'sbc_anterior': calculo['sbc_anterior'],
+                'sbc': calculo['sbc'],
+                'error': calculo['error'],
+            }))
+        self.line_ids = lines
+        return {
+            'name': _('Recálculo de SDI'),
+            'view_mode': 'form',
+            'res_id': self.id,
+            'res_model': self._name,
+            'type': 'ir.actions.act_window',
+            'target': 'new',
+        }
+
+    def action_aplicar(self):
+        calculos = [{'contract': line.contract_id, 'sdi_anterior': line.sdi_anterior, 'sdi': line.sdi,
+                     'sbc_anterior': line.sbc_anterior, 'sbc': line.sbc, 'error': line.error}
+                    for line in self.line_ids]
+        incidencias = self.env['nomina.recalculo.sdi'].aplicar(calculos, self.fecha)
+        return {
+            'name': _('Cambios de salario'),
+            'view_mode': 'list,form',
+            'res_model': 'incidencias.nomina',
+            'domain': [('id', 'in', incidencias.ids)],
+            'type': 'ir.actions.act_window',
+        }
+
+
+class RecalculoSdiLine(models.TransientModel):
+    _name = 'recalculo.sdi.line'
+    _description = 'Recálculo de SDI por contrato'
+
+    wizard_id = fields.Many2one('recalculo.sdi', ondelete='cascade')
+    contract_id = fields.Many2one('hr.contract', 'Contrato', readonly=True)
+    employee_id = fields.Many2one('hr.employee', 'Empleado', readonly=True)
+    sdi_anterior = fields.Float('SDI anterior', readonly=True)
+    sdi = fields.Float('SDI nuevo', readonly=True)
+    sbc_anterior = fields.Float('SBC anterior', readonly=True)
+    sbc = fields.Float('SBC nuevo', readonly=True)
+    diferencia = fields.Float('Diferencia SBC', compute='_compute_diferencia')
+    error = fields.Char('Error', readonly=True)
+
+    @api.depends('sbc', 'sbc_anterior')
+    def _compute_diferencia(self):
+        for line in self:
+            line.diferencia = line.sbc - line.sbc_anterior
@@ -1,13 +1,28 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api
-#import time
-#from datetime import datetime
-#from dateutil import relativedelta
-from collections import defaultdict
-import io
-from odoo.tools.misc import xlwt
-import base64
+
+# (campo de hr.payslip, encabezado); None deja la columna vacía entre trabajador y patrón
+IMSS_COLUMNS = [
+    ('emp_exedente_smg', 'Exedente 3 SMGDF'),
+    ('emp_prest_dinero', 'Prest. en dinero'),
+    ('emp_esp_pens', 'Gastos médicos'),
+    ('emp_invalidez_vida', 'Invalidez y Vida'),
+    ('emp_cesantia_vejez', 'Cesantia y vejez'),
+    ('emp_total', 'IMSS trabajador'),
+    (None, ''),
+    ('pat_cuota_fija_pat', 'Cuota fija patronal'),
+    ('pat_exedente_smg', 'Exedente 3 SMGDF'),
+    ('pat_prest_dinero', 'Prest. en dinero'),
+    ('pat_esp_pens', 'Gastos médicos'),
+    ('pat_riesgo_trabajo', 'Riegso de trabajo'),
+    ('pat_invalidez_vida', 'Invalidez y Vida'),
+    ('pat_guarderias', 'Guarderias y PS'),
+    ('pat_retiro', 'Retiro'),
+    ('pat_cesantia_vejez', 'Cesantia y vejez'),
+    ('pat_infonavit', 'INFONAVIT'),
+    ('pat_total', 'IMSS patron'),
+]
 
 class WizardReporteImss(models.TransientModel):
     _name = 'wizard.imss.nomina'
@@ -18,143 +33,67 @@ class WizardReporteImss(models.TransientModel):
     date_from = fields.Date(string='Fecha inicio')
     date_to = fields.Date(string='Fecha fin')
     department_id = fields.Many2one('hr.department', 'Departamento')
-    file_data = fields.Binary("File Data")
+    registro_patronal_id = fields.Many2one('registro.patronal', 'Registro patronal')
+    agrupar_por = fields.Selection([('registro_patronal', 'Registro patronal'), ('estado', 'Estado')], string='Agrupar por')
 
     def print_reporte_imss_report(self):
-        #domain=[('state','=', 'done')]
-        domain=[]
-        if self.date_from:
-            domain.append(('date_from','>=',self.date_from))
-            
-        if self.date_to:
-            domain.append(('date_to','<=',self.date_to))
-        if self.employee_id:
-            domain.append(('employee_id','=',self.employee_id.id))
-        if not self.employee_id and self.department_id:
-            employees = self.env['hr.employee'].search([('department_id', '=', self.department_id.id)])
-            domain.append(('employee_id','in',employees.ids))
+        return self.env.ref('nomina_cfdi_extras_ee.action_reporte_imss_xlsx').report_action(self)
+
+    def _get_totales(self):
+        """ Cuotas IMSS de las nóminas hechas sumadas por empleado en un solo GROUP BY
+            {employee_id: {campo: total}}. """
+        reporte_query = self.env['nomina.reporte.query']
+        domain = reporte_query.get_payslip_domain(
+            date_from=self.date_from, date_to=self.date_to, employee_ids=self.employee_id.ids,
+            department_ids=self.department_id.ids, states=['done'], date_field_to='date_to')
+        if self.registro_patronal_id:
+            domain.append(('employee_id.registro_patronal_id', '=', self.registro_patronal_id.id))
+        fnames = [fname for fname, header in IMSS_COLUMNS if fname]
+        return {employee.id: dict(zip(fnames, totals))
+                for employee, *totals in self.env['hr.payslip']._read_group(
+                    domain, ['employee_id'], ['%s:sum' % fname for fname in fnames])}
 
-        payslips = self.env['hr.payslip'].search(domain)
+    def _write_xlsx_report(self, workbook):
+        totales = self._get_totales()
 
-        workbook = xlwt.Workbook()
-        bold = xlwt.easyxf("font: bold on;")
-        worksheet = workbook.add_sheet('IMSS')
+        bold = workbook.add_format({'bold': True})
+        worksheet = workbook.add_worksheet('IMSS')
         from_to_date = 'De  %s A %s'%(self.date_from or '', self.date_to or '')
-        worksheet.write_merge(1, 1, 0, 4, 'Reporte IMSS', bold)
-        worksheet.write_merge(2, 2, 0, 4, from_to_date, bold)
+        worksheet.merge_range(1, 0, 1, 4, 'Reporte IMSS', bold)
+        worksheet.merge_range(2, 0, 2, 4, from_to_date, bold)
 
         worksheet.write(4, 0, 'Employee number', bold)
         worksheet.write(4, 1, 'Employee name', bold)
-        worksheet.write(4, 2, 'Exedente 3 SMGDF', bold)
-        worksheet.write(4, 3, 'Prest. en dinero', bold)
-        worksheet.write(4, 4, 'Gastos médicos', bold)
-        worksheet.write(4, 5, 'Invalidez y Vida', bold)
-        worksheet.write(4, 6, 'Cesantia y vejez', bold)
-        worksheet.write(4, 7, 'IMSS trabajador', bold)
-        worksheet.write(4, 8, '', bold)
-        worksheet.write(4, 9, 'Cuota fija patronal', bold)
-        worksheet.write(4, 10, 'Exedente 3 SMGDF', bold)
-        worksheet.write(4, 11, 'Prest. en dinero', bold)
-        worksheet.write(4, 12, 'Gastos médicos', bold)
-        worksheet.write(4, 13, 'Riegso de trabajo', bold)
-        worksheet.write(4, 14, 'Invalidez y Vida', bold)
-        worksheet.write(4, 15, 'Guarderias y PS', bold)
-        worksheet.write(4, 16, 'Retiro', bold)
-        worksheet.write(4, 17, 'Cesantia y vejez', bold)
-        worksheet.write(4, 18, 'INFONAVIT', bold)
-        worksheet.write(4, 19, 'IMSS patron', bold)
-
-        row_index = 5
-        col_index=0
-        
-    
-        group_by_employee_dict = {}
-        
-        for payslip in payslips:
-            if payslip.state != 'done':
-                    continue
-            
-            if payslip.employee_id.id not in group_by_employee_dict:
-                group_by_employee_dict[payslip.employee_id.id] = {}
-            
-                group_by_employee_dict[payslip.employee_id.id]['emp_no'] = payslip.employee_id.no_empleado
-                group_by_employee_dict[payslip.employee_id.id]['emp_name'] = payslip.employee_id.name
-                
-            group_by_employee_dict[payslip.employee_id.id]['emp_exedente_smg'] = group_by_employee_dict[payslip.employee_id.id].get('emp_exedente_smg',0.0) + payslip.emp_exedente_smg
-            group_by_employee_dict[payslip.employee_id.id]['emp_prest_dinero'] = group_by_employee_dict[payslip.employee_id.id].get('emp_prest_dinero',0.0) + payslip.emp_prest_dinero
-            group_by_employee_dict[payslip.employee_id.id]['emp_esp_pens'] = group_by_employee_dict[payslip.employee_id.id].get('emp_esp_pens',0.0) + payslip.emp_esp_pens
-            group_by_employee_dict[payslip.employee_id.id]['emp_invalidez_vida'] = group_by_employee_dict[payslip.employee_id.id].get('emp_invalidez_vida',0.0) + payslip.emp_invalidez_vida
-            group_by_employee_dict[payslip.employee_id.id]['emp_cesantia_vejez'] = group_by_employee_dict[payslip.employee_id.id].get('emp_cesantia_vejez',0.0) + payslip.emp_cesantia_vejez
-            group_by_employee_dict[payslip.employee_id.id]['emp_total'] = group_by_employee_dict[payslip.employee_id.id].get('emp_total',0.0) + payslip.emp_total
-            group_by_employee_dict[payslip.employee_id.id]['pat_cuota_fija_pat'] = group_by_employee_dict[payslip.employee_id.id].get('pat_cuota_fija_pat',0.0) + payslip.pat_cuota_fija_pat
-            group_by_employee_dict[payslip.employee_id.id]['pat_exedente_smg'] = group_by_employee_dict[payslip.employee_id.id].get('pat_exedente_smg',0.0) + payslip.pat_exedente_smg
-            group_by_employee_dict[payslip.employee_id.id]['pat_prest_dinero'] = group_by_employee_dict[payslip.employee_id.id].get('pat_prest_dinero',0.0) + payslip.pat_prest_dinero
-            
-            
-            group_by_employee_dict[payslip.employee_id.id]['pat_esp_pens'] = group_by_employee_dict[payslip.employee_id.id].get('pat_esp_pens',0.0) + payslip.pat_esp_pens
-            group_by_employee_dict[payslip.employee_id.id]['pat_riesgo_trabajo'] = group_by_employee_dict[payslip.employee_id.id].get('pat_riesgo_trabajo',0.0) + payslip.pat_riesgo_trabajo
-            group_by_employee_dict[payslip.employee_id.id]['pat_invalidez_vida'] = group_by_employee_dict[payslip.employee_id.id].get('pat_invalidez_vida',0.0) + payslip.pat_invalidez_vida
-            group_by_employee_dict[payslip.employee_id.id]['pat_guarderias'] = group_by_employee_dict[payslip.employee_id.id].get('pat_guarderias',0.0) + payslip.pat_guarderias
-            group_by_employee_dict[payslip.employee_id.id]['pat_retiro'] = group_by_employee_dict[payslip.employee_id.id].get('pat_retiro',0.0) + payslip.pat_retiro
-            group_by_employee_dict[payslip.employee_id.id]['pat_cesantia_vejez'] = group_by_employee_dict[payslip.employee_id.id].get('pat_cesantia_vejez',0.0) + payslip.pat_cesantia_vejez
-            
-            
-            group_by_employee_dict[payslip.employee_id.id]['pat_infonavit'] = group_by_employee_dict[payslip.employee_id.id].get('pat_infonavit',0.0) + payslip.pat_infonavit
-            group_by_employee_dict[payslip.employee_id.id]['pat_total'] = group_by_employee_dict[payslip.employee_id.id].get('pat_total',0.0) + payslip.pat_total
-             
-        for emp_id, info in group_by_employee_dict.items():        
-            worksheet.write(row_index, col_index, info.get('emp_no'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('emp_name'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('emp_exedente_smg'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('emp_prest_dinero'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('emp_esp_pens'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('emp_invalidez_vida'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('emp_cesantia_vejez'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('emp_total'))
-            col_index=col_index+2
-            worksheet.write(row_index, col_index, info.get('pat_cuota_fija_pat'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_exedente_smg'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_prest_dinero'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_esp_pens'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_riesgo_trabajo'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_invalidez_vida'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_guarderias'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_retiro'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_cesantia_vejez'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_infonavit'))
-            col_index+=1
-            worksheet.write(row_index, col_index, info.get('pat_total'))
-            row_index+=1
-            col_index=0
-
+        for col_index, (fname, header) in enumerate(IMSS_COLUMNS, 2):
+            worksheet.write(4, col_index, header, bold)
 
-        fp = io.BytesIO()
-        workbook.save(fp)
-        fp.seek(0)
-        data = fp.read()
-        fp.close()
+        def write_totales(row_index, info, style=None):
+            for col_index, (fname, header) in enumerate(IMSS_COLUMNS, 2):
+                if fname:
+                    worksheet.write(row_index, col_index, info.get(fname, 0.0), style)
 
-        self.write({'file_data':base64.b64encode(data)})
-        action = {
-            'name': 'Payslips',
-            'type': 'ir.actions.act_url',
-            'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_data&download=true&filename=Reporte_nominas.xls",
-            'target': 'self',
-            }
-        return action
+        row_index = 5
+        gran_total = {}
+        employees = self.env['hr.employee'].browse(totales).with_context(active_test=False)
+        for grupo, grupo_employees in self.env['nomina.reporte.query'].get_employee_groups(employees, self.agrupar_por):
+            if grupo:
+                row_index += 1
+                worksheet.write(row_index, 0, grupo, bold)
+                row_index += 1
+            subtotal = {}
+            for employee in grupo_employees:
+                info = totales[employee.id]
+                worksheet.write(row_index, 0, employee.no_empleado)
+                worksheet.write(row_index, 1, employee.name)
+                write_totales(row_index, info)
+                for fname, total in info.items():
+                    subtotal[fname] = subtotal.get(fname, 0.0) + total
+                    gran_total[fname] = gran_total.get(fname, 0.0) + total
+                row_index += 1
+            if grupo:
+                worksheet.write(row_index, 1, 'Total %s' % grupo, bold)
+                write_totales(row_index, subtotal, bold)
+                row_index += 1
+        row_index += 1
+        worksheet.write(row_index, 1, 'Total', bold)
+        write_totales(row_index, gran_total, bold)
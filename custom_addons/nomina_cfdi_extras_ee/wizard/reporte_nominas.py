@@ -5,9 +5,6 @@ from odoo import models, fields, api
 #from datetime import datetime
 #from dateutil import relativedelta
 from collections import defaultdict
-import io
-from odoo.tools.misc import xlwt
-import base64
 
 class WizardReporteNominas(models.TransientModel):
     _name = 'wizard.reporte.nomina'
@@ -18,30 +15,24 @@ class WizardReporteNominas(models.TransientModel):
     date_from = fields.Date(string='Fecha inicio')
     date_to = fields.Date(string='Fecha fin')
     department_id = fields.Many2one('hr.department', 'Departamento')
-    file_data = fields.Binary("File Data")
 
     def print_reporte_nominas_report(self):
-        #domain=[('state','=', 'done')]
-        domain=[]
-        if self.date_from:
-            domain.append(('date_from','>=',self.date_from))
-            
-        if self.date_to:
-            domain.append(('date_from','<=',self.date_to))
-        if self.employee_id:
-            domain.append(('employee_id','=',self.employee_id.id))
-        if not self.employee_id and self.department_id:
-            employees = self.env['hr.employee'].search([('department_id', '=', self.department_id.id)])
-            domain.append(('employee_id','in',employees.ids))
+        return self.env.ref('nomina_cfdi_extras_ee.action_reporte_nominas_xlsx').report_action(self)
 
+    def _write_xlsx_report(self, workbook):
+        reporte_query = self.env['nomina.reporte.query']
+        domain = reporte_query.get_payslip_domain(
+            date_from=self.date_from, date_to=self.date_to,
+            employee_ids=self.employee_id.ids, department_ids=self.department_id.ids)
         payslips = self.env['hr.payslip'].search(domain)
+        totals = reporte_query.get_totals(domain, group_by='slip', codes=[
+            'ISR2', 'D060', 'O007', 'P001', 'P005', 'SUB', 'O001', 'ISR', 'O005'])
 
-        workbook = xlwt.Workbook()
-        bold = xlwt.easyxf("font: bold on;")
-        worksheet = workbook.add_sheet('Nomina')
+        bold = workbook.add_format({'bold': True})
+        worksheet = workbook.add_worksheet('Nomina')
         from_to_date = 'De  %s A %s'%(self.date_from or '', self.date_to or '')
-        worksheet.write_merge(1, 1, 0, 4, 'Reporte de nominas', bold)
-        worksheet.write_merge(2, 2, 0, 4, from_to_date, bold)
+        worksheet.merge_range(1, 0, 1, 4, 'Reporte de nominas', bold)
+        worksheet.merge_range(2, 0, 2, 4, from_to_date, bold)
 
         worksheet.write(4, 0, 'Procesamiento', bold)
         worksheet.write(4, 1, 'Periodo', bold)
@@ -79,31 +70,15 @@ class WizardReporteNominas(models.TransientModel):
             worksheet.write(row, 10, payslip.fecha_certificacion)
             worksheet.write(row, 11, payslip.state)
 
-            acum_isr = 0
-            acum_dev_isr = 0
-            acum_salario = 0
-            acum_sept = 0
-            acum_sub_aplicado = 0
-            acum_sub_empleo = 0
-            acum_isr_antes = 0
-            acum_isr_retener = 0
-            for line in payslip.line_ids:
-                if line.code == 'ISR2' or line.code == 'D060':
-                    acum_isr += line.total
-                if line.code == 'O007':
-                    acum_dev_isr += line.total
-                if line.code == 'P001':
-                    acum_salario += line.total
-                if line.code == 'P005':
-                    acum_sept += line.total
-                if line.code == 'SUB':
-                    acum_sub_aplicado += line.total
-                if line.code == 'O001':
-                    acum_sub_empleo += line.total
-                if line.code == 'ISR':
-                    acum_isr_antes += line.total
-                if line.code == 'O005':
-                    acum_isr_retener += line.total
+            amounts = totals.get(payslip.id, {})
+            acum_isr = amounts.get('ISR2', 0.0) + amounts.get('D060', 0.0)
+            acum_dev_isr = amounts.get('O007', 0.0)
+            acum_salario = amounts.get('P001', 0.0)
+            acum_sept = amounts.get('P005', 0.0)
+            acum_sub_aplicado = amounts.get('SUB', 0.0)
+            acum_sub_empleo = amounts.get('O001', 0.0)
+            acum_isr_antes = amounts.get('ISR', 0.0)
+            acum_isr_retener = amounts.get('O005', 0.0)
 
             worksheet.write(row, 12, round(acum_isr - acum_dev_isr,2))
             worksheet.write(row, 13, round(acum_salario,2))
@@ -114,18 +89,3 @@ class WizardReporteNominas(models.TransientModel):
             worksheet.write(row, 18, round(acum_isr_retener,2))
 
             row +=1
-
-        fp = io.BytesIO()
-        workbook.save(fp)
-        fp.seek(0)
-        data = fp.read()
-        fp.close()
-        
-        self.write({'file_data':base64.b64encode(data)})
-        action = {
-            'name': 'Payslips',
-            'type': 'ir.actions.act_url',
-            'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_data&download=true&filename=Reporte_nominas.xls",
-            'target': 'self',
-            }
-        return action
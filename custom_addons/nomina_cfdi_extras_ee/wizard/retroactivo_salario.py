@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+
+class RetroactivoSalario(models.TransientModel):
+    _name = 'retroactivo.salario'
+    _description = 'Retroactivo por cambio de salario'
+
+    incidencia_ids = fields.Many2many('incidencias.nomina', string='Cambios de salario',
+                                      domain=[('tipo_de_incidencia', '=', 'Cambio salario'), ('state', '=', 'done')])
+    payslip_run_id = fields.Many2one('hr.payslip.run', 'Procesamiento', required=True, domain=[('state', '=', 'draft')])
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super(RetroactivoSalario, self).default_get(fields_list)
+        if self._context.get('active_model') == 'incidencias.nomina' and self._context.get('active_ids'):
+            res['incidencia_ids'] = [(6, 0, self._context['active_ids'])]
+        return res
+
+    def action_aplicar(self):
+        no_aplicadas = self.env['nomina.retroactivo'].aplicar_en_procesamiento(self.incidencia_ids, self.payslip_run_id)
+        if no_aplicadas:
+            log = self.env['import.logs'].create({'name': '\n'.join(
+                _('%s %s: %s') % (employee.no_empleado or '', employee.name, motivo)
+                for employee, motivo in no_aplicadas.items())})
+            return {
+                'name': _('Retroactivo no aplicado'),
+                'view_mode': 'form',
+                'res_id': log.id,
+                'res_model': 'import.logs',
+                'type': 'ir.actions.act_window',
+                'target': 'new',
+            }
+        return True
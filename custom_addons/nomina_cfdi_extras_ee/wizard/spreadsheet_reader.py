@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+""" Lectura por streaming de hojas de cálculo para los wizards de importación.
+
+    iter_rows() detecta el tipo de archivo por su contenido (XLSX, XLS, ODS o CSV) y
+    regresa un generador de filas de la primera hoja, sin cargar el archivo completo
+    en memoria: XLSX con openpyxl en modo read_only, ODS con iterparse sobre content.xml
+    y CSV con el lector de csv (UTF-8 o cp1252 y separador detectado). Los valores se
+    normalizan: números enteros como int, fechas sin hora como date, textos sin espacios
+    a los lados y celdas vacías como None.
+    Las filas vacías se omiten y las demás se completan al ancho del encabezado; con
+    row_numbers cada fila va con su número de renglón en la hoja.
+"""
+
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from itertools import islice
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# tipo: (módulo requerido, nombre del paquete)
+FILE_TYPES = {
+    'xlsx': (openpyxl, 'openpyxl'),
+    'xls': (xlrd, 'xlrd'),
+    'ods': (etree, 'lxml'),
+    'csv': (csv, 'csv'),
+}
+
+CSV_DELIMITERS = ',;\t|'
+CSV_SNIFF_SIZE = 4096
+
+ODS_MIMETYPE = b'application/vnd.oasis.opendocument.spreadsheet'
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+NS_TABLE = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+NS_OFFICE = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+NS_TEXT = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+ODS_TABLE = '{%s}table' % NS_TABLE
+ODS_ROW = '{%s}table-row' % NS_TABLE
+ODS_CELLS = ('{%s}table-cell' % NS_TABLE, '{%s}covered-table-cell' % NS_TABLE)
+ODS_PARAGRAPH = '{%s}p' % NS_TEXT
+
+
+def guess_file_type(content, file_name=None):
+    """ Tipo de archivo ('xlsx', 'xls', 'ods' o 'csv') según su contenido; la extensión
+        del nombre solo se usa si el contenido no es concluyente. """
+    if content[:8] == OLE_SIGNATURE:
+        return 'xls'
+    if content[:2] == b'PK':
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            names = set(archive.namelist())
+            if 'mimetype' in names and archive.read('mimetype').strip() == ODS_MIMETYPE:
+                return 'ods'
+            if 'xl/workbook.xml' in names:
+                return 'xlsx'
+    extension = (file_name or '').rsplit('.', 1)[-1].lower()
+    if extension in FILE_TYPES:
+        return extension
+    return 'csv'
+
+
+def iter_rows(content, file_name=None, skip_header=True, row_numbers=False):
+    """ Generador de filas (listas) de la primera hoja del archivo; con row_numbers
+        genera (no. de renglón en la hoja, fila), contando el encabezado y las filas vacías.
+        Lanza ValueError si falta la librería para leer el tipo de archivo detectado. """
+    file_type = guess_file_type(content, file_name)
+    module, package = FILE_TYPES[file_type]
+    if module is None:
+        raise ValueError('No se puede leer el archivo "%s": se requiere el módulo de Python "%s"'
+                         % (file_type, package))
+    return _iter_padded(_READERS[file_type](content), skip_header, row_numbers)
+
+
+def _iter_padded(rows, skip_header, row_numbers=False):
+    """ Omite las filas vacías y completa con None cada fila hasta el ancho de la
+        primera (el encabezado), para poder leer las columnas por posición. Los lectores
+        regresan las filas vacías como [], así el número de renglón es el de la hoja. """
+    width = None
+    for row_no, row in enumerate(rows, 1):
+        if not row:
+            continue
+        if width is None:
+            width = len(row)
+            if skip_header:
+                continue
+        if len(row) < width:
+            row = row + [None] * (width - len(row))
+        yield (row_no, row) if row_numbers else row
+
+
+def iter_chunks(rows, size=1000):
+    """ Agrupa un iterador de filas en listas de a lo más size filas. """
+    rows = iter(rows)
+    chunk = list(islice(rows, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, size))
+
+
+def normalize_value(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, datetime) and value == datetime.combine(value.date(), datetime.min.time()):
+        return value.date()
+    return value
+
+
+def _trim(row):
+    row = [normalize_value(value) for value in row]
+    while row and row[-1] is None:
+        row.pop()
+    return row
+
+
+def _read_xlsx(content):
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield _trim(row)
+    finally:
+        workbook.close()
+
+
+def _read_xls(content):
+    book = xlrd.open_workbook(file_contents=content, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for row_index in range(sheet.nrows):
+            values = []
+            for cell in sheet.row(row_index):
+                if cell.ctype == xlrd.XL_CELL_DATE:
+                    values.append(xlrd.xldate.xldate_as_datetime(cell.value, book.datemode))
+                elif cell.ctype == xlrd.XL_CELL_BOOLEAN:
+                    values.append(bool(cell.value))
+                elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                    values.append(None)
+                else:
+                    values.append(cell.value)
+            yield _trim(values)
+    finally:
+        book.release_resources()
+
+
+def _decode_csv(content):
+    """ Texto del CSV en UTF-8 o, si no lo es, en cp1252 (exportación de Excel en
+        español). """
+    try:
+        return content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return content.decode('cp1252', errors='replace')
+
+
+def _read_csv(content):
+    """ El separador (coma, punto y coma, tabulador o barra) se detecta con csv.Sniffer
+        sobre el inicio del archivo; si no se puede detectar se usa la coma. """
+    text = _decode_csv(content)
+    try:
+        dialect = csv.Sniffer().sniff(text[:CSV_SNIFF_SIZE], delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel
+    for row in csv.reader(io.StringIO(text, newline=''), dialect):
+        yield _trim(row)
+
+
+def _ods_cell_value(cell):
+    value_type = cell.get('{%s}value-type' % NS_OFFICE)
+    if value_type in ('float', 'percentage', 'currency'):
+        return float(cell.get('{%s}value' % NS_OFFICE))
+    if value_type == 'date':
+        value = cell.get('{%s}date-value' % NS_OFFICE)
+        return datetime.fromisoformat(value) if 'T' in value else date.fromisoformat(value)
+    if value_type == 'boolean':
+        return cell.get('{%s}boolean-value' % NS_OFFICE) == 'true'
+    paragraphs = cell.findall(ODS_PARAGRAPH)
+    if not paragraphs:
+        return None
+    return '\n'.join(''.join(paragraph.itertext()) for paragraph in paragraphs)
+
+
+def _read_ods(content):
+    """ Recorre content.xml con iterparse y libera cada fila al terminar de leerla.
+        Las celdas y filas repetidas (number-*-repeated) se expanden salvo las vacías del
+        final, que LibreOffice escribe hasta el límite de la hoja. """
+    with zipfile.ZipFile(io.BytesIO(content)) as archive, archive.open('content.xml') as xml:
+        for event, element in etree.iterparse(xml, events=('end',), tag=(ODS_ROW, ODS_TABLE)):
+            if element.tag == ODS_TABLE:
+                # solo la primera hoja
+                return
+            row = []
+            empty = 0
+            for cell in element.iterchildren(*ODS_CELLS):
+                repeat = int(cell.get('{%s}number-columns-repeated' % NS_TABLE, 1))
+                value = normalize_value(_ods_cell_value(cell))
+                if value is None:
+                    # las celdas vacías solo se agregan si después hay un valor
+                    empty += repeat
+                    continue
+                row.extend([None] * empty + [value] * repeat)
+                empty = 0
+            repeat = int(element.get('{%s}number-rows-repeated' % NS_TABLE, 1)) if row else 1
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            for i in range(repeat):
+                yield list(row)
+
+
+_READERS = {
+    'xlsx': _read_xlsx,
+    'xls': _read_xls,
+    'ods': _read_ods,
+    'csv': _read_csv,
+}
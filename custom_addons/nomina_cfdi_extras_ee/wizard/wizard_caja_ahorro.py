@@ -2,9 +2,6 @@
 
 from odoo import models, fields, api
 from collections import defaultdict
-import io
-from odoo.tools.misc import xlwt
-import base64
 import logging
 _logger = logging.getLogger(__name__)
 
@@ -17,10 +14,12 @@ class WizardCajaAhorro(models.TransientModel):
     date_from = fields.Date(string='Fecha inicio', required=True)
     date_to = fields.Date(string='Fecha fin', required=True)
     department_id = fields.Many2one('hr.department', 'Departamento')
-    file_data = fields.Binary("File Data")
     archivados = fields.Boolean("Incluir empleados archivados")
 
     def print_reglas_salariales_report(self):
+        return self.env.ref('nomina_cfdi_extras_ee.action_caja_ahorro_xlsx').report_action(self)
+
+    def _write_xlsx_report(self, workbook):
         domain=[('state','=', 'done')]
         domain_employee=[]
         if self.date_from:
@@ -39,15 +38,14 @@ class WizardCajaAhorro(models.TransientModel):
         employee_ids = self.env['hr.employee'].search(domain_employee)
         _logger.info('empleados %s', employee_ids)
 
-        workbook = xlwt.Workbook()
-        bold = xlwt.easyxf("font: bold on;")
+        bold = workbook.add_format({'bold': True})
         
-        worksheet = workbook.add_sheet('Caja de ahorro')
+        worksheet = workbook.add_worksheet('Caja de ahorro')
         
         from_to_date = 'De  %s A %s'%(self.date_from or '', self.date_to or '')
         
-        worksheet.write_merge(1, 1, 0, 4, 'Reporte de caja de ahorro', bold)
-        worksheet.write_merge(2, 2, 0, 4, from_to_date, bold)
+        worksheet.merge_range(1, 0, 1, 4, 'Reporte de caja de ahorro', bold)
+        worksheet.merge_range(2, 0, 2, 4, from_to_date, bold)
 
         worksheet.write(4, 0, 'Departamento', bold)
         worksheet.write(4, 1, 'No. Empleado', bold)
@@ -58,71 +56,61 @@ class WizardCajaAhorro(models.TransientModel):
         worksheet.write(4, 6, 'Retiro', bold)
         col = 4
         row = 5
+        caja = self.env['caja.ahorro.saldo']
+        movimientos = caja.get_movimientos(employee_ids, self.date_from, self.date_to)
         for empleado in employee_ids:
              total = 0
              if empleado.contract_ids:
-                ############ Abono ###################
-                rule = self.env['hr.salary.rule'].search([('id', '=', empleado.contract_ids[0].tablas_cfdi_id.caja_ahorro_abono.id)])
-                payslips = self.env['hr.payslip'].search([('employee_id', '=', empleado.id), ('state','=', 'done'), ('date_from','>=',self.date_from), ('date_to','<=',self.date_to)])
-                payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id == rule.id)
                 worksheet.write(row, 0, empleado.department_id.name)
                 worksheet.write(row, 1, empleado.no_empleado)
                 worksheet.write(row, 2, empleado.name)
-                for line in payslip_lines:
-                   worksheet.write(row, 3, line.slip_id.name)
-                   worksheet.write(row, 4, line.slip_id.date_from)
-                   worksheet.write(row, 5, line.total)
-                   total += line.total
-                   row +=1
-
-                ############ Retiro ###################
-                rule = self.env['hr.salary.rule'].search([('id', '=', empleado.contract_ids[0].tablas_cfdi_id.caja_ahorro_retiro.id)])
-                payslips = self.env['hr.payslip'].search([('employee_id', '=', empleado.id), ('state','=', 'done'), ('date_from','>=',self.date_from), ('date_to','<=',self.date_to)])
-                payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id == rule.id)
-                for line in payslip_lines:
-                   worksheet.write(row, 3, line.slip_id.name)
-                   worksheet.write(row, 4, line.slip_id.date_from)
-                   worksheet.write(row, 6, line.total)
-                   total -= line.total
+                for slip, tipo, importe in movimientos.get(empleado.id, []):
+                   worksheet.write(row, 3, slip.name)
+                   worksheet.write(row, 4, slip.date_from)
+                   if tipo == 'abono':
+                      worksheet.write(row, 5, importe)
+                      total += importe
+                   else:
+                      worksheet.write(row, 6, importe)
+                      total -= importe
                    row +=1
              worksheet.write(row, 4, 'Total')
              worksheet.write(row, 5, total)
              row +=2
 
         #Buscar en empleados archivados
-        employees_extras = []
         archive_ids = self.env['hr.employee'].search([('active', '=', False)])
-        for archive in  archive_ids:
-            if self.env['caja.nomina'].search([('state','=', 'done'),('employee_id','=',archive.id)]):
-               employees_extras.append(archive.id)
+        retiros_archivados = self.env['caja.nomina'].search([('state','=', 'done'),('employee_id','in',archive_ids.ids)])
+        employees_extras = archive_ids.filtered(lambda x: x in retiros_archivados.employee_id)
 
         if self.archivados:
            worksheet.write(row, 0, 'Archivados')
            row +=2
-           for extra in employees_extras:
+           con_contrato = self.env['hr.contract'].search([('employee_id','in', employees_extras.ids)]).employee_id
+           movimientos = caja.get_movimientos(employees_extras, self.date_from, self.date_to)
+           domain_retiro=[('state','=', 'done'),('employee_id','in',employees_extras.ids)]
+           if self.date_from:
+               domain_retiro.append(('fecha_aplicacion','>=',self.date_from))
+           if self.date_to:
+               domain_retiro.append(('fecha_aplicacion','<=',self.date_to))
+           retiros_por_empleado = {}
+           for retiro in self.env['caja.nomina'].search(domain_retiro):
+               retiros_por_empleado.setdefault(retiro.employee_id.id, []).append(retiro)
+           for empleado in employees_extras:
                 total = 0
-                empleado = self.env['hr.employee'].search([('id','=', extra),('active', '=', False)])
-                contrato = self.env['hr.contract'].search([('employee_id','=', extra)])
-                if contrato:
-                   rule = self.env['hr.salary.rule'].search([('id', '=', contrato.tablas_cfdi_id.caja_ahorro_abono.id)])
-                   payslips = self.env['hr.payslip'].search([('employee_id', '=', extra), ('state','=', 'done'), ('date_from','>=',self.date_from), ('date_to','<=',self.date_to)])
-                   payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id == rule.id)
+                if empleado in con_contrato:
                    worksheet.write(row, 0, empleado.department_id.name)
                    worksheet.write(row, 1, empleado.no_empleado)
                    worksheet.write(row, 2, empleado.name)
-                   for line in payslip_lines:
-                      worksheet.write(row, 3, line.slip_id.name)
-                      worksheet.write(row, 4, line.slip_id.date_from)
-                      worksheet.write(row, 5, line.total)
-                      total += line.total
+                   for slip, tipo, importe in movimientos.get(empleado.id, []):
+                      if tipo != 'abono':
+                         continue
+                      worksheet.write(row, 3, slip.name)
+                      worksheet.write(row, 4, slip.date_from)
+                      worksheet.write(row, 5, importe)
+                      total += importe
                       row +=1
-                domain_retiro=[('state','=', 'done'),('employee_id','=',extra)]
-                if self.date_from:
-                    domain_retiro.append(('fecha_aplicacion','>=',self.date_from))
-                if self.date_to:
-                    domain_retiro.append(('fecha_aplicacion','<=',self.date_to))
-                retiros = self.env['caja.nomina'].search(domain_retiro) #falta fecha
-                for line in retiros:
+                for line in retiros_por_empleado.get(empleado.id, []):
                       worksheet.write(row, 6, line.name)
                       worksheet.write(row, 7, line.fecha_aplicacion)
                       worksheet.write(row, 8, line.importe)
@@ -131,18 +119,3 @@ class WizardCajaAhorro(models.TransientModel):
                 worksheet.write(row, 4, 'Total')
                 worksheet.write(row, 5, total)
                 row +=2
-
-        fp = io.BytesIO()
-        workbook.save(fp)
-        fp.seek(0)
-        data = fp.read()
-        fp.close()
-        
-        self.write({'file_data':base64.b64encode(data)})
-        action = {
-            'name': 'Payslips',
-            'type': 'ir.actions.act_url',
-            'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_data&download=true&filename=Caja_ahorro.xls",
-            'target': 'self',
-            }
-        return action
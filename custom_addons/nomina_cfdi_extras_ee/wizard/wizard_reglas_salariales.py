@@ -5,9 +5,6 @@ from odoo import models, fields, api
 #from datetime import datetime
 #from dateutil import relativedelta
 from collections import defaultdict
-import io
-from odoo.tools.misc import xlwt
-import base64
 
 class WizardReglasSalariales(models.TransientModel):
     _name = 'wizard.regalas.salarieles'
@@ -19,10 +16,12 @@ class WizardReglasSalariales(models.TransientModel):
     date_to = fields.Date(string='Fecha fin')
     department_id = fields.Many2one('hr.department', 'Departamento')
     rule_ids = fields.Many2many('hr.salary.rule', 'hr_salary_rule_regalas_salarieles_rel','wizard_id','rule_id', string='Conceptos')
-    file_data = fields.Binary("File Data")
     
    
     def print_reglas_salariales_report(self):
+        return self.env.ref('nomina_cfdi_extras_ee.action_reglas_salariales_xlsx').report_action(self)
+
+    def _write_xlsx_report(self, workbook):
         domain=[('state','=', 'done')]
         if self.date_from:
             domain.append(('date_from','>=',self.date_from))
@@ -39,16 +38,15 @@ class WizardReglasSalariales(models.TransientModel):
         rules = self.rule_ids
         payslip_lines = payslips.mapped('line_ids').filtered(lambda x: x.salary_rule_id.id in rules.ids) #.sorted(key=lambda x: x.slip_id.employee_id)
         
-        workbook = xlwt.Workbook()
-        bold = xlwt.easyxf("font: bold on;")
+        bold = workbook.add_format({'bold': True})
         
-        worksheet = workbook.add_sheet('Nomina')
+        worksheet = workbook.add_worksheet('Nomina')
         
         from_to_date = 'De  %s A %s'%(self.date_from or '', self.date_to or '')
         concepto = 'Concepto:  %s'%(self.date_from)
         
-        worksheet.write_merge(1, 1, 0, 4, 'Reporte de acumulados de conceptos', bold)
-        worksheet.write_merge(2, 2, 0, 4, from_to_date, bold)
+        worksheet.merge_range(1, 0, 1, 4, 'Reporte de acumulados de conceptos', bold)
+        worksheet.merge_range(2, 0, 2, 4, from_to_date, bold)
         #worksheet.write_merge(3, 3, 0, 4, concepto, bold)
         
         worksheet.write(4, 0, 'No.Empleado', bold)
@@ -95,21 +93,6 @@ class WizardReglasSalariales(models.TransientModel):
             for rule_id, total in total_by_rule.items():
                 worksheet.write(row, rule_index.get(rule_id), total)
             row +=1
-                
-        fp = io.BytesIO()
-        workbook.save(fp)
-        fp.seek(0)
-        data = fp.read()
-        fp.close()
-        
-        self.write({'file_data':base64.b64encode(data)})
-        action = {
-            'name': 'Payslips',
-            'type': 'ir.actions.act_url',
-            'url': "/web/content/?model="+self._name+"&id=" + str(self.id) + "&field=file_data&download=true&filename=Reglas_salariales.xls",
-            'target': 'self',
-            }
-        return action
         
     
     
\ No newline at end of file